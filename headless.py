@@ -0,0 +1,306 @@
+"""
+Headless parking and vehicle detection for servers without a display
+
+Runs the same parking pipeline (preprocessing, motion gating, vectorized slot
+counting) and line-crossing vehicle counter as the detection view, without
+Tk, matplotlib or any drawing, and writes one record per analyzed frame as
+JSON lines or CSV. Run one process per feed to scale across machines.
+
+Usage:
+    python headless.py media/videos/carPark.mp4 --reference carParkImg.png --ref-size 1280x720
+    python headless.py 0 --reference videoImg.png --mode both --format csv --output logs/cam0.csv
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from models.occupancy_engine import OccupancyEngine
+from models.change_detector import SlotChangeDetector
+from models.motion_engine import MOTION_BACKENDS, create_motion_engine
+from models.centroid_tracker import CentroidTracker
+from utils.frame_grabber import FrameGrabber, SamplingPlan
+from utils.image_processor import ParkingPreprocessor, detect_vehicles_traditional
+from utils.resource_manager import load_parking_positions
+from utils.result_cache import DEFAULT_CACHE_PATH, ResultCache, layout_key, parking_settings
+from utils.slot_geometry import scale_slot
+
+CSV_FIELDS = ("frame", "time", "free", "occupied", "total", "occupied_slots",
+              "vehicles", "parking_ms", "vehicle_ms")
+
+
+class HeadlessDetector:
+    """
+    Per-frame parking and vehicle analysis of one feed, without any UI
+    """
+
+    def __init__(self, pos_list, mode="parking", threshold=500, reference_size=None,
+                 processing_scale=1.0, motion_gating=True, roi_preprocessing=True,
+                 line_height=400, min_contour_width=40, min_contour_height=40, offset=10,
+                 cache=None, video_path=None, motion_backend=None):
+        """
+        Args:
+            pos_list: Slot positions (rectangles or polygons) at reference_size
+            mode: "parking", "vehicle" or "both"
+            threshold: Pixel count below which a slot is free
+            reference_size: (width, height) the positions were drawn at; None means
+                they already match the feed
+            processing_scale: Resolution of the parking pipeline relative to the frame
+            motion_gating: Re-evaluate only slots whose pixels changed
+            roi_preprocessing: Filter only the regions around the slots
+            line_height, min_contour_width, min_contour_height, offset: Vehicle counter settings
+            cache: Optional ResultCache serving slot states of frames analyzed before
+            video_path: Video file the cache entries belong to (files only)
+            motion_backend: Vehicle motion source (see MOTION_BACKENDS); None differences frames
+        """
+        self.pos_list = list(pos_list)
+        self.mode = mode
+        self.threshold = threshold
+        self.reference_size = reference_size
+        self.roi_preprocessing = roi_preprocessing
+        self.line_height = line_height
+        self.min_contour_width = min_contour_width
+        self.min_contour_height = min_contour_height
+        self.offset = offset
+        self.cache = cache if video_path else None
+        self.video_path = video_path
+        self.processing_scale = processing_scale
+        self.motion_gating = motion_gating
+
+        self.engine = OccupancyEngine(scale=processing_scale)
+        self.detector = SlotChangeDetector() if motion_gating else None
+        self.preprocessor = ParkingPreprocessor(erode=True)
+        self.occupancy = None
+        self.positions = None  # pos_list scaled to the feed, set on the first frame
+
+        self.motion = create_motion_engine(motion_backend)
+        self.prev_frame = None
+        self.matches = CentroidTracker()
+        self.vehicle_counter = 0
+
+    def _scaled_positions(self, frame_shape):
+        """Positions scaled from the reference size to the frame size"""
+        height, width = frame_shape[:2]
+        if not self.reference_size or tuple(self.reference_size) == (width, height):
+            return self.pos_list
+
+        width_scale = width / self.reference_size[0]
+        height_scale = height / self.reference_size[1]
+        return [scale_slot(pos, width_scale, height_scale) for pos in self.pos_list]
+
+    def analyze(self, img, frame_index=None):
+        """
+        Analyze one frame
+
+        Args:
+            img: BGR frame
+            frame_index: Position of the frame in a video file (used by the cache)
+
+        Returns:
+            dict: Occupancy, vehicle count and timings of this frame
+        """
+        record = {}
+
+        if self.mode in ("parking", "both"):
+            start_time = time.perf_counter()
+            occupancy = self._evaluate_parking(img, frame_index)
+            record['free'] = occupancy.free_spaces
+            record['occupied'] = occupancy.occupied_spaces
+            record['total'] = occupancy.total_spaces
+            record['occupied_slots'] = [int(i) for i in (occupancy.valid & occupancy.occupied).nonzero()[0]]
+            record['parking_ms'] = round((time.perf_counter() - start_time) * 1000, 2)
+
+        if self.mode in ("vehicle", "both"):
+            start_time = time.perf_counter()
+            if self.prev_frame is not None or self.motion is not None:
+                _, self.matches, self.vehicle_counter = detect_vehicles_traditional(
+                    img, self.prev_frame, self.line_height, self.min_contour_width,
+                    self.min_contour_height, self.offset, self.matches, self.vehicle_counter,
+                    motion=self.motion)
+            self.prev_frame = img if self.motion is None else None
+            record['vehicles'] = self.vehicle_counter
+            record['vehicle_ms'] = round((time.perf_counter() - start_time) * 1000, 2)
+
+        return record
+
+    def _evaluate_parking(self, img, frame_index=None):
+        """Slot occupancy of a frame, re-deciding only the slots that changed"""
+        if self.positions is None:
+            self.positions = self._scaled_positions(img.shape)
+            if self.cache is not None:
+                self.cache.bind(self.video_path, parking_settings(
+                    self.threshold, layout_key(self.positions), self.processing_scale, self.motion_gating))
+        positions = self.positions
+
+        # Frames analyzed before come from the cache
+        use_cache = self.cache is not None and frame_index is not None
+        if use_cache:
+            cached = self.cache.get_slots(frame_index, len(positions))
+            if cached is not None:
+                self.occupancy = self.engine.restore(positions, img.shape, cached[0], cached[1], self.threshold)
+                return self.occupancy
+
+        changed = None
+        if self.detector is not None:
+            slots, valid = self.engine.layout(positions, img.shape)
+            changed = self.detector.changed_slots(img, slots, valid, self.engine.layout_version)
+
+        if changed is not None and not changed.any() and self.engine.is_current(self.occupancy, self.threshold):
+            self.occupancy = self.engine.carry_forward(self.occupancy)
+        else:
+            tiles = None
+            if self.roi_preprocessing:
+                slot_mask = changed if self.engine.is_current(self.occupancy, self.threshold) else None
+                tiles = self.engine.roi_tiles(positions, img.shape, slot_mask)
+            img_pro = self.preprocessor.process(self.engine.prepare_frame(img), tiles=tiles)
+            self.occupancy = self.engine.evaluate(img_pro, positions, self.threshold, changed=changed,
+                                                  previous=self.occupancy, frame_shape=img.shape)
+
+        if use_cache:
+            self.cache.put_slots(frame_index, self.occupancy.counts, self.occupancy.free)
+        return self.occupancy
+
+
+class RecordWriter:
+    """
+    Writes detection records as JSON lines or CSV
+    """
+
+    def __init__(self, stream, fmt="jsonl"):
+        self.stream = stream
+        self.fmt = fmt
+        self._csv = None
+        if fmt == "csv":
+            self._csv = csv.DictWriter(stream, fieldnames=CSV_FIELDS, extrasaction='ignore')
+            self._csv.writeheader()
+
+    def write(self, record):
+        if self._csv is not None:
+            row = dict(record)
+            if 'occupied_slots' in row:
+                row['occupied_slots'] = ";".join(str(i) for i in row['occupied_slots'])
+            self._csv.writerow(row)
+        else:
+            self.stream.write(json.dumps(record) + "\n")
+
+    def flush(self):
+        self.stream.flush()
+
+
+def _parse_source(text):
+    """Camera index for digits, otherwise a path or stream URL"""
+    return int(text) if text.isdigit() else text
+
+
+def _parse_size(text):
+    """Parse a WIDTHxHEIGHT string"""
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def run(source, detector, writer, step=1, max_frames=None, flush_every=25):
+    """
+    Analyze a feed until it ends, max_frames records are written or Ctrl+C
+
+    Returns:
+        tuple: (records written, elapsed seconds)
+    """
+    # Frames between the sampled ones are grabbed but never decoded
+    grabber = FrameGrabber(source, plan=SamplingPlan(step, step))
+    if not grabber.isOpened():
+        raise IOError(f"Failed to open video source: {source}")
+
+    written = 0
+    start_time = time.time()
+    try:
+        grabber.start()
+        while max_frames is None or written < max_frames:
+            ret, img = grabber.read(timeout=1.0)
+            if not ret:
+                if grabber.ended:
+                    break
+                continue
+
+            record = {'frame': grabber.frame_index,
+                      'time': round(grabber.frame_time, 3) if grabber.frame_time is not None else None}
+            record.update(detector.analyze(img, None if grabber.live else grabber.frame_index))
+            writer.write(record)
+            written += 1
+
+            if written % flush_every == 0:
+                writer.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        grabber.release()
+        writer.flush()
+
+    return written, time.time() - start_time
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless parking and vehicle detection")
+    parser.add_argument("source", help="Video file, stream URL or camera index")
+    parser.add_argument("--reference", help="Reference image the slots were drawn on (required for parking)")
+    parser.add_argument("--ref-size", type=_parse_size, default=None,
+                        help="Reference image size as WIDTHxHEIGHT (slots are scaled to the feed)")
+    parser.add_argument("--config-dir", default="config")
+    parser.add_argument("--mode", choices=("parking", "vehicle", "both"), default="parking")
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+    parser.add_argument("--output", default="-", help="Output file ('-' for stdout)")
+    parser.add_argument("--threshold", type=int, default=500)
+    parser.add_argument("--scale", type=float, default=1.0, help="Processing scale")
+    parser.add_argument("--step", type=int, default=1, help="Analyze every n-th frame")
+    parser.add_argument("--max-frames", type=int, default=None, help="Stop after this many records")
+    parser.add_argument("--no-gating", action="store_true", help="Re-evaluate every slot on every frame")
+    parser.add_argument("--no-roi", action="store_true", help="Preprocess the full frame")
+    parser.add_argument("--line-height", type=int, default=400)
+    parser.add_argument("--min-contour", type=int, default=40)
+    parser.add_argument("--offset", type=int, default=10)
+    parser.add_argument("--motion", choices=MOTION_BACKENDS, default=MOTION_BACKENDS[0],
+                        help="Motion source of the vehicle counter")
+    parser.add_argument("--cache", nargs="?", const=DEFAULT_CACHE_PATH, default=None,
+                        help="Reuse and store per-frame results in this result cache (video files only)")
+    args = parser.parse_args(argv)
+
+    positions = []
+    if args.mode != "vehicle":
+        if not args.reference:
+            parser.error("--reference is required for parking detection")
+        positions = load_parking_positions(args.config_dir, args.reference)
+        if not positions:
+            print(f"No parking positions found for {args.reference}", file=sys.stderr)
+            return 1
+
+    source = _parse_source(args.source)
+    cache = ResultCache(args.cache) if args.cache and isinstance(source, str) and os.path.isfile(source) else None
+
+    detector = HeadlessDetector(
+        positions, mode=args.mode, threshold=args.threshold, reference_size=args.ref_size,
+        processing_scale=args.scale, motion_gating=not args.no_gating, roi_preprocessing=not args.no_roi,
+        line_height=args.line_height, min_contour_width=args.min_contour,
+        min_contour_height=args.min_contour, offset=args.offset,
+        cache=cache, video_path=source if cache else None, motion_backend=args.motion
+    )
+
+    stream = sys.stdout if args.output == "-" else open(args.output, 'w', newline='')
+    try:
+        written, elapsed = run(source, detector, RecordWriter(stream, args.format),
+                               step=max(1, args.step), max_frames=args.max_frames)
+    except IOError as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 1
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+        if cache is not None:
+            cache.close()
+
+    print(f"Analyzed {written} frames in {elapsed:.1f} s ({written / max(elapsed, 1e-6):.0f} fps)",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -5,6 +5,7 @@ import xgboost as xgb
 import pickle
 import os
 import threading
+from models.slot_table import SECTION_NAMES
 
 
 class ParkingAllocationEngine:
@@ -128,6 +129,29 @@ class ParkingAllocationEngine:
                     'occupancy_rate': occupancy_rate
                 }
 
+    def update_section_stats(self, table):
+        """
+        Update load balancing statistics from a SlotTable without parsing space IDs
+
+        Args:
+            table: SlotTable with the current slot state
+
+        Returns:
+            np.ndarray: Occupancy rate per section code
+        """
+        total, occupied = table.section_counts()
+        rates = np.divide(occupied, total, out=np.zeros(len(total)), where=total > 0)
+
+        with self.lock:
+            for code, section in enumerate(SECTION_NAMES):
+                self.parking_stats[section] = {
+                    'total': int(total[code]),
+                    'occupied': int(occupied[code]),
+                    'occupancy_rate': float(rates[code])
+                }
+
+        return rates
+
     def get_section_from_space_id(self, space_id):
         """Extract section from space ID"""
         parts = space_id.split('-')
@@ -232,6 +256,105 @@ class ParkingAllocationEngine:
 
         return best_space_id, best_score
 
+    def allocate_from_table(self, table, vehicle_size=1, preferred_section=None, groups=None):
+        """
+        Find the optimal parking space in a SlotTable (vectorized allocate_parking)
+
+        Args:
+            table: SlotTable with the current slot state
+            vehicle_size: Size of vehicle (1=small, 2=medium, 3=large)
+            preferred_section: Optional preferred parking section
+            groups: Optional group_data dict; free groups compete with the slots
+                like they did in allocate_parking
+
+        Returns:
+            best: Slot index, or group ID for a group, of the optimal parking space
+                (None if no space is free)
+            allocation_score: The confidence score of the allocation
+        """
+        # Snapshot the columns needed for scoring
+        with table.lock:
+            free_idx = table.free_indices()
+            distance = table.data['distance'][free_idx].astype(np.float64)
+            last_change = table.data['last_change'][free_idx]
+            sections = table.data['section'][free_idx]
+
+        free_groups = [(group_id, data) for group_id, data in (groups or {}).items()
+                       if data.get('is_group', False) and not data['occupied']]
+
+        if len(free_idx) == 0 and not free_groups:
+            return None, 0  # No available spaces
+
+        # Section occupancy for load balancing
+        section_rates = self.update_section_stats(table)
+
+        # Features in the order the model expects
+        current_time = datetime.now()
+        features = np.column_stack((
+            distance,
+            (current_time.timestamp() - last_change) / 60,  # Minutes since last state change
+            np.full(len(free_idx), vehicle_size, dtype=np.float64)
+        ))
+
+        # Groups are appended after the slots, scored from their dict entries
+        if free_groups:
+            group_features = np.array([
+                [data['distance_to_entrance'],
+                 (current_time - data['last_state_change']).total_seconds() / 60,
+                 vehicle_size]
+                for _, data in free_groups], dtype=np.float64)
+            features = np.vstack((features, group_features))
+
+        # Only lock for the actual model prediction to minimize lock time
+        with self.lock:
+            X_pred = pd.DataFrame(features, columns=[
+                'distance_to_entrance',
+                'time_since_last_occupied',
+                'vehicle_size'
+            ])
+            prediction_scores = self.model.predict_proba(X_pred)[:, 1]
+
+        # Load balancing and section preference for all candidates at once
+        load_balance_scores = 1.0 - section_rates[sections]
+        section_preference = np.ones(len(free_idx))
+        if preferred_section in SECTION_NAMES:
+            section_preference[sections == SECTION_NAMES.index(preferred_section)] = 1.2
+
+        if free_groups:
+            # Group sections are not tracked; use the same defaults as allocate_parking
+            group_sections = [self.get_section_from_space_id(group_id) for group_id, _ in free_groups]
+            group_rates = [self.parking_stats.get(section, {}).get('occupancy_rate', 0.5)
+                           for section in group_sections]
+            load_balance_scores = np.concatenate((load_balance_scores, 1.0 - np.array(group_rates)))
+            section_preference = np.concatenate((section_preference, [
+                1.2 if preferred_section and section == preferred_section else 1.0
+                for section in group_sections]))
+
+        balanced_scores = (
+                                  (1 - self.load_balancing_weight) * prediction_scores +
+                                  self.load_balancing_weight * load_balance_scores
+                          ) * section_preference
+
+        best = int(np.argmax(balanced_scores))
+        if best < len(free_idx):
+            best_index = int(free_idx[best])
+            space_id = table.space_id(best_index)
+        else:
+            best_index = space_id = free_groups[best - len(free_idx)][0]
+        best_score = float(balanced_scores[best])
+
+        # Log the allocation for model improvement
+        allocation = {
+            'timestamp': current_time,
+            'space_id': space_id,
+            'vehicle_size': vehicle_size,
+            'score': best_score,
+            'features': features[best].tolist()
+        }
+        self.allocation_history.append(allocation)
+
+        return best_index, best_score
+
     def add_feedback(self, space_id, vehicle_size, successful):
         """
         Add user feedback about allocation quality for model improvement
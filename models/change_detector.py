@@ -0,0 +1,93 @@
+import cv2
+import numpy as np
+
+
+class SlotChangeDetector:
+    """
+    Per-slot change detection on a downsampled grayscale frame.
+
+    Keeps a reduced grayscale reference of what every slot looked like when it
+    was last evaluated and reads the mean absolute difference of each slot from
+    one integral image. Only slots that changed beyond the tolerance need their
+    occupancy re-decided; the rest carry their previous state forward.
+    """
+
+    def __init__(self, scale=0.25, tolerance=8.0, refresh_interval=300):
+        self.scale = scale  # Downsampling factor for the reference frame
+        self.tolerance = tolerance  # Mean absolute gray-level difference that counts as change
+        self.refresh_interval = refresh_interval  # Frames between forced full re-evaluations
+
+        self.reference = None
+        self.frames_since_refresh = 0
+        self._layout_key = None
+
+        # Slot rectangles in reference-frame coordinates
+        self._x0 = self._y0 = self._x1 = self._y1 = np.empty(0, dtype=np.intp)
+        self._area = np.empty(0, dtype=np.float64)
+
+    def reset(self):
+        """Drop the reference so the next frame re-evaluates every slot"""
+        self.reference = None
+
+    def _downsample(self, img):
+        """Grayscale, reduced-size copy of a frame"""
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        return cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+
+    def _set_layout(self, slots, small_shape):
+        """Map slot rectangles onto the downsampled frame"""
+        height, width = small_shape[:2]
+        x0 = np.floor(slots[:, 0] * self.scale).astype(np.intp)
+        y0 = np.floor(slots[:, 1] * self.scale).astype(np.intp)
+        x1 = np.ceil((slots[:, 0] + slots[:, 2]) * self.scale).astype(np.intp)
+        y1 = np.ceil((slots[:, 1] + slots[:, 3]) * self.scale).astype(np.intp)
+
+        # Clip to the frame and keep at least one pixel per slot
+        self._x0 = np.clip(x0, 0, width - 1)
+        self._y0 = np.clip(y0, 0, height - 1)
+        self._x1 = np.clip(np.maximum(x1, self._x0 + 1), 1, width)
+        self._y1 = np.clip(np.maximum(y1, self._y0 + 1), 1, height)
+        self._area = ((self._x1 - self._x0) * (self._y1 - self._y0)).astype(np.float64)
+
+    def changed_slots(self, img, slots, valid, layout_version):
+        """
+        Find the slots whose pixels changed since they were last evaluated
+
+        Args:
+            img: BGR frame
+            slots: (N, 4) array of x, y, w, h (OccupancyEngine.layout)
+            valid: Boolean mask of slots inside the frame
+            layout_version: OccupancyEngine.layout_version the slots belong to
+
+        Returns:
+            np.ndarray: Boolean mask of slots to re-evaluate
+        """
+        small = self._downsample(img)
+
+        layout_key = (layout_version, small.shape)
+        if layout_key != self._layout_key:
+            self._set_layout(slots, small.shape)
+            self._layout_key = layout_key
+            self.reference = None
+
+        # First frame, new layout or periodic refresh: everything is re-evaluated
+        self.frames_since_refresh += 1
+        if self.reference is None or self.frames_since_refresh >= self.refresh_interval:
+            self.reference = small
+            self.frames_since_refresh = 0
+            return valid.copy()
+
+        # Mean absolute difference per slot from one integral image
+        diff = cv2.absdiff(small, self.reference)
+        integral = cv2.integral(diff, sdepth=cv2.CV_32S)
+        sums = (integral[self._y1, self._x1] - integral[self._y0, self._x1] -
+                integral[self._y1, self._x0] + integral[self._y0, self._x0])
+        changed = valid & (sums / self._area > self.tolerance)
+
+        # Move the reference forward only where slots are re-evaluated, so slow
+        # changes keep accumulating against the last evaluated state
+        for i in np.flatnonzero(changed):
+            y0, y1, x0, x1 = self._y0[i], self._y1[i], self._x0[i], self._x1[i]
+            self.reference[y0:y1, x0:x1] = small[y0:y1, x0:x1]
+
+        return changed
@@ -0,0 +1,183 @@
+import threading
+import time
+import numpy as np
+
+
+class DetectionLane:
+    """
+    One long-lived worker thread with a single-entry input slot and output slot.
+
+    submit() copies the frames into the lane's pending buffers and returns at
+    once; the worker swaps the pending and working buffers and runs the lane
+    function on the working copy, so the caller can reuse its frame and the
+    next frame can be queued while the current one is analyzed. A newer
+    submission replaces a pending one that has not been started yet. Results
+    are tagged with the frame id they belong to.
+    """
+
+    def __init__(self, name, work):
+        """
+        Args:
+            name: Thread name
+            work: Callable taking the submitted frames and returning the lane result
+        """
+        self.name = name
+        self.work = work
+
+        self._cond = threading.Condition()
+        self._pending = None  # Buffers the next frames are copied into
+        self._working = None  # Buffers the worker is reading
+        self._pending_id = None
+        self._pending_count = 0
+        self._stop = False
+        self._thread = None
+
+        # Output slot
+        self.result_id = -1
+        self.result = None
+        self.error = None
+
+        # Counters
+        self.processed = 0
+        self.replaced = 0  # Submissions overwritten before the worker took them
+        self.last_ms = 0.0
+
+    def start(self):
+        if self._thread is None:
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, frame_id, *frames):
+        """Queue frames for analysis, replacing any that are still waiting"""
+        with self._cond:
+            if self._pending_id is not None:
+                self.replaced += 1
+
+            # (Re)allocate the buffers only when the frame layout changes
+            if self._pending is None or not _same_layout(self._pending, frames):
+                self._pending = [np.empty_like(f) for f in frames]
+                if self._working is None or not _same_layout(self._working, frames):
+                    self._working = [np.empty_like(f) for f in frames]
+
+            for buffer, frame in zip(self._pending, frames):
+                np.copyto(buffer, frame)
+            self._pending_id = frame_id
+            self._pending_count = len(frames)
+            self._cond.notify_all()
+
+    def _run(self):
+        """Worker loop: take the pending frames, analyze them, publish the result"""
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._stop or self._pending_id is not None)
+                if self._stop:
+                    return
+
+                frame_id, self._pending_id = self._pending_id, None
+                self._pending, self._working = self._working, self._pending
+                frames = self._working[:self._pending_count]
+
+            start_time = time.perf_counter()
+            try:
+                result = self.work(*frames)
+            except Exception as e:
+                print(f"Error in {self.name}: {str(e)}")
+                result = None
+                self.error = e
+            self.last_ms = (time.perf_counter() - start_time) * 1000
+
+            with self._cond:
+                self.result_id = frame_id
+                self.result = result
+                self.processed += 1
+                self._cond.notify_all()
+
+    def latest(self, min_id=None, timeout=None):
+        """
+        Return the newest result as (frame_id, result)
+
+        Args:
+            min_id: Wait until a result for this frame id or a later one exists
+            timeout: Maximum seconds to wait for it
+        """
+        with self._cond:
+            if min_id is not None and self.result_id < min_id:
+                self._cond.wait_for(lambda: self._stop or self.result_id >= min_id, timeout)
+            return self.result_id, self.result
+
+    def stop(self, timeout=2.0):
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+def _same_layout(buffers, frames):
+    """True if preallocated buffers can hold the given frames"""
+    return len(buffers) >= len(frames) and all(
+        b.shape == f.shape and b.dtype == f.dtype for b, f in zip(buffers, frames))
+
+
+class DetectionLanes:
+    """
+    Persistent parking and vehicle lanes for simultaneous detection.
+
+    Frame n is submitted to both lanes while they may still be working on
+    frame n-1, so the two detectors run pipelined across frames instead of
+    being started and joined per frame. The merged view uses the newest
+    result of each lane, at most max_lag frames behind the submitted frame.
+    """
+
+    def __init__(self, parking_work, vehicle_work, max_lag=1, wait_timeout=0.5):
+        """
+        Args:
+            parking_work: Callable(frame) returning the parking lane result
+            vehicle_work: Callable(frame, prev_frame) returning the vehicle lane result
+            max_lag: Frames a lane result may trail the submitted frame before merging waits
+            wait_timeout: Maximum seconds to wait for a lagging lane
+        """
+        self.parking = DetectionLane("ParkingLane", parking_work).start()
+        self.vehicle = DetectionLane("VehicleLane", vehicle_work).start()
+        self.max_lag = max(0, int(max_lag))
+        self.wait_timeout = wait_timeout
+        self.frame_id = -1
+
+    def submit(self, frame, prev_frame=None):
+        """
+        Hand a frame to both lanes
+
+        Returns:
+            int: Frame id the lane results are tagged with
+        """
+        self.frame_id += 1
+        self.parking.submit(self.frame_id, frame)
+        if prev_frame is not None:
+            self.vehicle.submit(self.frame_id, frame, prev_frame)
+        return self.frame_id
+
+    def results(self, vehicle=True):
+        """
+        Newest results of both lanes, waiting for a lane that lags too far
+
+        Returns:
+            tuple: (parking_id, parking_result, vehicle_id, vehicle_result)
+        """
+        min_id = self.frame_id - self.max_lag
+        parking_id, parking_result = self.parking.latest(min_id, self.wait_timeout)
+        vehicle_id, vehicle_result = -1, None
+        if vehicle:
+            vehicle_id, vehicle_result = self.vehicle.latest(min_id, self.wait_timeout)
+        return parking_id, parking_result, vehicle_id, vehicle_result
+
+    def describe(self):
+        """Short lane timing text for the UI"""
+        return (f"parking {self.parking.last_ms:.1f} ms, vehicle {self.vehicle.last_ms:.1f} ms, "
+                f"replaced {self.parking.replaced + self.vehicle.replaced}")
+
+    def stop(self):
+        self.parking.stop()
+        self.vehicle.stop()
@@ -0,0 +1,172 @@
+import queue
+import threading
+import time
+
+
+class FrameAnalyzer:
+    """
+    Runs frame analysis on a worker thread between a frame source and the UI.
+
+    Capture (e.g. a FrameGrabber), analysis and rendering are connected by
+    queues: the worker takes frames from the source, calls analyze(frame) and
+    posts the finished frame to a small result queue. The UI thread only polls
+    for the newest result and log messages, so it stays responsive however long
+    the analysis takes. OpenCV and torch release the GIL while they work.
+    Analysis is stateful (previous occupancy, trackers), so frames are analyzed
+    in order on a single worker.
+    """
+
+    def __init__(self, source, analyze, max_pending=2, scheduler=None):
+        """
+        Args:
+            source: Object with read(timeout) -> (ret, frame), an ended flag and,
+                when a scheduler is used, the frame_time of the last frame read
+            analyze: Callable taking a frame and returning the frame to display
+                (or None to show nothing for this frame)
+            max_pending: Finished frames kept for the UI; older ones are dropped
+            scheduler: Optional DeadlineScheduler pacing the analysis to the source
+        """
+        self.source = source
+        self.analyze = analyze
+        self.scheduler = scheduler
+
+        self._results = queue.Queue(maxsize=max(1, max_pending))
+        self._messages = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+        self._exit_lock = threading.Lock()
+        self._exited = True  # No worker thread is running
+        self._on_exit = None  # Callback left by stop() for a worker that was still busy
+
+        # Status for the UI
+        self.analyzed = 0
+        self.dropped = 0  # Finished frames the UI never displayed
+        self.last_analysis_ms = 0.0
+        self.finished = False  # Source ended
+        self.error = None  # Exception that stopped the worker
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the analysis thread"""
+        if self._thread is None:
+            self._stop.clear()
+            self._exited = False
+            self._thread = threading.Thread(target=self._run, name="FrameAnalyzer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0, on_exit=None):
+        """
+        Stop the analysis thread and wait for the current frame to finish
+
+        Args:
+            timeout: Seconds to wait for the worker
+            on_exit: Optional callable (e.g. releasing the frame source) run once the
+                worker has exited: right away if it has, otherwise by the worker itself
+                when its current frame is done
+
+        Returns:
+            bool: True if the worker has exited; False if it is still busy
+        """
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+        with self._exit_lock:
+            exited = self._exited
+            if not exited and on_exit is not None:
+                self._on_exit = on_exit
+        if exited:
+            self._thread = None
+            if on_exit is not None:
+                on_exit()
+        return exited
+
+    def _run(self):
+        """Worker loop: read, analyze, hand over"""
+        try:
+            self._loop()
+        finally:
+            with self._exit_lock:
+                self._exited = True
+                on_exit, self._on_exit = self._on_exit, None
+            if on_exit is not None:
+                try:
+                    on_exit()
+                except Exception as e:
+                    print(f"Error releasing frame source: {str(e)}")
+
+    def _loop(self):
+        while not self._stop.is_set():
+            ret, frame = self.source.read(timeout=0.1)
+            if not ret:
+                if self.source.ended:
+                    self.finished = True
+                    break
+                continue
+
+            # Wait for the frame's deadline, or skip it if the loop is behind
+            if self.scheduler is not None:
+                delay = self.scheduler.delay(self.source.frame_time)
+                if delay is None:
+                    continue
+                if delay > 0 and self._stop.wait(delay):
+                    break
+
+            start_time = time.perf_counter()
+            try:
+                result = self.analyze(frame)
+            except Exception as e:
+                self.error = e
+                break
+            latency = time.perf_counter() - start_time
+            self.last_analysis_ms = latency * 1000
+            self.analyzed += 1
+            if self.scheduler is not None:
+                self.scheduler.record(latency)
+
+            if result is not None:
+                self._put_latest(result)
+
+    def _put_latest(self, result):
+        """Queue a finished frame, dropping the oldest if the UI is behind"""
+        while True:
+            try:
+                self._results.put_nowait(result)
+                return
+            except queue.Full:
+                try:
+                    self._results.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get_latest(self):
+        """Return the newest finished frame, or None (UI thread, non-blocking)"""
+        latest = None
+        while True:
+            try:
+                result = self._results.get_nowait()
+            except queue.Empty:
+                return latest
+
+            if latest is not None:
+                self.dropped += 1
+            latest = result
+
+    def post_message(self, message):
+        """Queue a log message for the UI thread (safe from the worker)"""
+        self._messages.put(message)
+
+    def pop_messages(self):
+        """Drain queued log messages (UI thread)"""
+        messages = []
+        while True:
+            try:
+                messages.append(self._messages.get_nowait())
+            except queue.Empty:
+                return messages
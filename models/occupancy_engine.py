@@ -0,0 +1,417 @@
+import itertools
+import time
+import cv2
+import numpy as np
+from scipy import sparse
+from utils.slot_geometry import is_polygon, layout_bounds, same_layout, scale_slot, slot_points
+
+# Pixels the parking filter chain reads around each output pixel:
+# GaussianBlur 3x3 (1) + adaptiveThreshold block 25 (12) + medianBlur 5 (2)
+# + dilate 3x3 (1) + erode 3x3 (1)
+PARKING_FILTER_MARGIN = 17
+
+# Above this share of the frame, ROI tiles cost more than one full-frame pass
+MAX_ROI_COVERAGE = 0.75
+
+# Layout versions are unique across engines so results never match a foreign layout
+_layout_versions = itertools.count(1)
+
+
+def compute_slot_tiles(slots, valid, frame_shape, margin=PARKING_FILTER_MARGIN):
+    """
+    Merge the padded slot rectangles into processing tiles
+
+    Args:
+        slots: (N, 4) array of x, y, w, h
+        valid: Boolean mask of slots inside the frame
+        frame_shape: Shape of the frame the slots belong to
+        margin: Filter-chain radius each slot is padded by
+
+    Returns:
+        list: (tile, core) box pairs as (x0, y0, x1, y1). The filter chain is
+        run on the tile and only the core, where the tile covers the whole
+        filter footprint, is copied to the output. Returns None when the tiles
+        would cover most of the frame and a full-frame pass is cheaper.
+    """
+    height, width = frame_shape[:2]
+    mask = np.zeros((height, width), dtype=np.uint8)
+
+    for x, y, w, h in slots[valid]:
+        mask[max(0, y - margin):min(height, y + h + margin),
+             max(0, x - margin):min(width, x + w + margin)] = 1
+
+    count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=4)
+
+    tiles = []
+    covered = 0
+    for label in range(1, count):
+        x0, y0, w, h = (int(v) for v in stats[label, :4])
+        x1, y1 = x0 + w, y0 + h
+        covered += w * h
+
+        # Shrink by the margin except where the tile already reaches the frame edge,
+        # where border handling is identical to the full-frame pass
+        core = (x0 + margin if x0 > 0 else 0,
+                y0 + margin if y0 > 0 else 0,
+                x1 - margin if x1 < width else width,
+                y1 - margin if y1 < height else height)
+        if core[0] < core[2] and core[1] < core[3]:
+            tiles.append(((x0, y0, x1, y1), core))
+
+    if covered > MAX_ROI_COVERAGE * height * width:
+        return None
+
+    return tiles
+
+
+class OccupancyResult:
+    """
+    Slot occupancy for one frame, computed once and shared by every consumer
+    (overlay drawing, allocation data, group status and statistics).
+    """
+
+    def __init__(self, slots, valid, counts, free, frame_shape, timestamp=None,
+                 threshold=None, layout_version=None, evaluated=None, polygons=None):
+        self.slots = slots  # (N, 4) array of x, y, w, h (bounding box for polygon slots)
+        self.polygons = polygons if polygons is not None else {}  # Slot index -> outline points
+        self.valid = valid  # Slots fully inside the frame
+        self.counts = counts  # Non-zero pixel count per slot, -1 if invalid
+        self.free = free  # Boolean free mask
+        self.frame_shape = tuple(frame_shape[:2])
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.threshold = threshold  # Threshold the decisions were made with
+        self.layout_version = layout_version  # OccupancyEngine layout the result belongs to
+        self.evaluated = valid if evaluated is None else evaluated  # Slots re-decided this frame
+
+    @property
+    def occupied(self):
+        """Boolean mask of occupied slots (slots outside the frame count as occupied)"""
+        return ~self.free
+
+    @property
+    def total_spaces(self):
+        return len(self.counts)
+
+    @property
+    def free_spaces(self):
+        return int(np.count_nonzero(self.free))
+
+    @property
+    def occupied_spaces(self):
+        return self.total_spaces - self.free_spaces
+
+
+class OccupancyEngine:
+    """
+    Vectorized parking slot occupancy counting.
+
+    Builds one integral image of the binarized frame and reads the non-zero
+    count of every slot with a four-corner lookup, so the per-frame cost is
+    O(frame) + O(slots) with no per-slot Python work. Polygon slots use pixel
+    masks precomputed per layout and are counted together with one sparse
+    matrix-vector product over the flattened frame.
+
+    With a processing scale below 1 the binarized frame is expected at the
+    reduced size (see prepare_frame); slots are scaled to match and the
+    threshold is scaled by area, while results stay in full-resolution
+    coordinates and count units.
+    """
+
+    def __init__(self, scale=1.0):
+        # Processing scale relative to the full-resolution frame
+        self.scale = scale
+
+        # Cached layout (rebuilt only when the slot list, frame size or scale changes)
+        self._layout_ref = None
+        self._layout_len = -1
+        self._layout_items = None  # Snapshot of the slots, to catch in-place edits of the list
+        self._frame_shape = None
+        self._proc_shape = None
+
+        # Slot coordinates as an (N, 4) int array of x, y, w, h (full resolution)
+        self.slots = np.empty((0, 4), dtype=np.int32)
+
+        # Slot coordinates in the processing frame
+        self._proc_slots = self.slots
+
+        # Polygon slots: outlines by slot index, and one mask row per valid polygon
+        self.polygons = {}
+        self._poly_idx = np.empty(0, dtype=np.intp)
+        self._poly_masks = None
+
+        # Slots fully inside the frame (same rule as the old per-slot loop)
+        self.valid = np.empty(0, dtype=bool)
+
+        # Corner indices into the integral image, precomputed per layout
+        self._y0 = self._y1 = self._x0 = self._x1 = np.empty(0, dtype=np.intp)
+
+        # Preprocessing tiles around the slots, computed on first use per layout
+        self._tiles = None
+        self._tiles_ready = False
+        self._slot_tile = np.empty(0, dtype=np.intp)  # Tile index per slot, -1 if none
+
+        # Changes whenever the layout is rebuilt
+        self.layout_version = 0
+
+    def invalidate(self):
+        """Force the slot layout to be rebuilt on the next frame"""
+        self._layout_ref = None
+
+    def set_scale(self, scale):
+        """Change the processing scale (the layout is rebuilt on the next frame)"""
+        if scale != self.scale:
+            self.scale = scale
+            self.invalidate()
+
+    def processing_shape(self, frame_shape):
+        """Size (height, width) of the processing frame for a full-resolution frame"""
+        height, width = frame_shape[:2]
+        if self.scale == 1.0:
+            return height, width
+        return max(1, int(round(height * self.scale))), max(1, int(round(width * self.scale)))
+
+    def prepare_frame(self, img):
+        """Downscale a full-resolution frame to the processing size (no-op at scale 1)"""
+        if self.scale == 1.0:
+            return img
+
+        proc_height, proc_width = self.processing_shape(img.shape)
+        return cv2.resize(img, (proc_width, proc_height), interpolation=cv2.INTER_AREA)
+
+    def set_layout(self, pos_list, frame_shape):
+        """Precompute slot coordinates and integral-image corners for a layout"""
+        height, width = frame_shape[:2]
+        proc_height, proc_width = self.processing_shape(frame_shape)
+
+        # Bounding boxes (exact rectangles for rectangular slots)
+        slots = layout_bounds(pos_list)
+
+        # Slots in processing-frame coordinates
+        proc_list = pos_list
+        proc_slots = slots
+        if self.scale != 1.0:
+            proc_list = [scale_slot(pos, self.scale, self.scale) for pos in pos_list]
+            proc_slots = layout_bounds(proc_list)
+
+        x, y, w, h = proc_slots[:, 0], proc_slots[:, 1], proc_slots[:, 2], proc_slots[:, 3]
+        valid = (y >= 0) & (y + h < proc_height) & (x >= 0) & (x + w < proc_width)
+
+        # Full-resolution outlines for drawing, masks at processing resolution
+        self.polygons = {i: slot_points(slot) for i, slot in enumerate(pos_list) if is_polygon(slot)}
+        self._build_polygon_masks(proc_list, proc_slots, valid, (proc_height, proc_width))
+
+        # Invalid slots point at the origin so the lookup stays in bounds
+        self._x0 = np.where(valid, x, 0).astype(np.intp)
+        self._y0 = np.where(valid, y, 0).astype(np.intp)
+        self._x1 = np.where(valid, x + w, 0).astype(np.intp)
+        self._y1 = np.where(valid, y + h, 0).astype(np.intp)
+
+        self.slots = slots
+        self._proc_slots = proc_slots
+        self.valid = valid
+        self._tiles = None
+        self._tiles_ready = False
+        self._slot_tile = np.full(len(slots), -1, dtype=np.intp)
+        self.layout_version = next(_layout_versions)
+        self._layout_ref = pos_list
+        self._layout_len = len(pos_list)
+        self._layout_items = list(pos_list)
+        self._frame_shape = (height, width)
+        self._proc_shape = (proc_height, proc_width)
+
+    def _build_polygon_masks(self, pos_list, slots, valid, frame_size):
+        """
+        Precompute the pixel masks of polygon slots as a sparse matrix over the integral image
+
+        Each polygon is rasterized once and split into horizontal pixel runs. A
+        run's count is four integral-image lookups, so every polygon becomes a
+        row of +1/-1 weights and all polygons are counted with one sparse
+        mat-vec per frame, at about the cost of the rectangle lookups.
+        """
+        height, width = frame_size
+        outlines = {i: slot_points(slot) for i, slot in enumerate(pos_list) if is_polygon(slot)}
+        poly_idx = [i for i in outlines if valid[i]]
+
+        self._poly_idx = np.array(poly_idx, dtype=np.intp)
+        self._poly_masks = None
+        if not poly_idx:
+            return
+
+        stride = width + 1  # Row length of the integral image
+        rows = []
+        cols = []
+        weights = []
+        for row, i in enumerate(poly_idx):
+            x, y, w, h = (int(v) for v in slots[i])
+
+            # Fill the polygon inside its bounding box
+            local = np.zeros((h, w), dtype=np.uint8)
+            cv2.fillPoly(local, [(outlines[i] - (x, y)).reshape(-1, 1, 2)], 1)
+
+            # Horizontal runs [start, end) of filled pixels, in row-major order
+            edges = np.diff(np.pad(local, ((0, 0), (1, 1))).astype(np.int8), axis=1)
+            run_y, run_start = np.nonzero(edges == 1)
+            _, run_end = np.nonzero(edges == -1)
+
+            top = (run_y + y).astype(np.int64) * stride
+            bottom = top + stride
+            x_start = run_start + x
+            x_end = run_end + x
+
+            # Run count = I[y+1, end] - I[y, end] - I[y+1, start] + I[y, start]
+            cols.append(np.concatenate((bottom + x_end, top + x_end, bottom + x_start, top + x_start)))
+            weights.append(np.repeat(np.array([1, -1, -1, 1], dtype=np.int32), len(run_y)))
+            rows.append(np.full(4 * len(run_y), row, dtype=np.int32))
+
+        self._poly_masks = sparse.csr_matrix(
+            (np.concatenate(weights), (np.concatenate(rows), np.concatenate(cols))),
+            shape=(len(poly_idx), (height + 1) * stride)
+        )
+
+    def _ensure_layout(self, pos_list, frame_shape):
+        """Rebuild the cached layout if the slot list, its contents or the frame size changed"""
+        if (pos_list is not self._layout_ref or
+                len(pos_list) != self._layout_len or
+                tuple(frame_shape[:2]) != self._frame_shape or
+                not same_layout(pos_list, self._layout_items)):
+            self.set_layout(pos_list, frame_shape)
+
+    def layout(self, pos_list, frame_shape):
+        """Return the (slots, valid) arrays for a layout, rebuilding them if needed"""
+        self._ensure_layout(pos_list, frame_shape)
+        return self.slots, self.valid
+
+    def roi_tiles(self, pos_list, frame_shape, slot_mask=None):
+        """
+        Return the cached preprocessing tiles for a layout (None means full frame)
+
+        Tiles are in processing-frame coordinates. If slot_mask is given, only the
+        tiles containing those slots are returned.
+        """
+        self._ensure_layout(pos_list, frame_shape)
+
+        if not self._tiles_ready:
+            self._tiles = compute_slot_tiles(self._proc_slots, self.valid, self._proc_shape)
+            self._slot_tile = self._map_slots_to_tiles(self._tiles)
+            self._tiles_ready = True
+
+        if self._tiles is None or slot_mask is None:
+            return self._tiles
+
+        tile_idx = self._slot_tile[np.asarray(slot_mask, dtype=bool) & (self._slot_tile >= 0)]
+        return [self._tiles[i] for i in np.unique(tile_idx)]
+
+    def _map_slots_to_tiles(self, tiles):
+        """Find the tile whose core holds each slot"""
+        slot_tile = np.full(len(self._proc_slots), -1, dtype=np.intp)
+        if not tiles:
+            return slot_tile
+
+        cores = np.array([core for _, core in tiles], dtype=np.int64)
+        x, y, w, h = (self._proc_slots[:, i:i + 1].astype(np.int64) for i in range(4))
+        inside = ((x >= cores[:, 0]) & (y >= cores[:, 1]) &
+                  (x + w <= cores[:, 2]) & (y + h <= cores[:, 3]))
+
+        found = self.valid & inside.any(axis=1)
+        slot_tile[found] = np.argmax(inside[found], axis=1)
+        return slot_tile
+
+    def is_current(self, result, threshold):
+        """Check whether a previous result can be carried forward for this layout and threshold"""
+        return (result is not None and
+                result.layout_version == self.layout_version and
+                result.threshold == threshold)
+
+    def carry_forward(self, previous):
+        """Reuse the previous decisions for a frame in which no slot changed"""
+        return OccupancyResult(previous.slots, previous.valid, previous.counts, previous.free,
+                               previous.frame_shape, threshold=previous.threshold,
+                               layout_version=previous.layout_version,
+                               evaluated=np.zeros_like(previous.valid), polygons=previous.polygons)
+
+    def restore(self, pos_list, frame_shape, counts, free, threshold):
+        """Rebuild the result of a frame from stored counts and decisions (see ResultCache)"""
+        self._ensure_layout(pos_list, frame_shape)
+        return OccupancyResult(self.slots, self.valid, counts, free & self.valid, frame_shape,
+                               threshold=threshold, layout_version=self.layout_version,
+                               polygons=self.polygons)
+
+    def _full_shape(self, proc_shape):
+        """Full-resolution frame shape for a processing-frame shape"""
+        if self.scale == 1.0:
+            return tuple(proc_shape[:2])
+        if self._proc_shape == tuple(proc_shape[:2]):
+            return self._frame_shape
+        return int(round(proc_shape[0] / self.scale)), int(round(proc_shape[1] / self.scale))
+
+    def count(self, img_pro, pos_list, frame_shape=None):
+        """
+        Count non-zero pixels inside every parking slot
+
+        Args:
+            img_pro: Binarized (preprocessed) frame at processing resolution
+            pos_list: List of (x, y, w, h) rectangles or polygon point tuples
+            frame_shape: Full-resolution frame shape (only needed when scale != 1)
+
+        Returns:
+            np.ndarray: Non-zero count per slot at processing resolution, -1 for
+            slots outside the frame
+        """
+        if frame_shape is None:
+            frame_shape = self._full_shape(img_pro.shape)
+        self._ensure_layout(pos_list, frame_shape)
+
+        if len(self.slots) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        # Integral image of the 0/1 mask, one pass over the frame
+        _, binary = cv2.threshold(img_pro, 0, 1, cv2.THRESH_BINARY)
+        integral = cv2.integral(binary, sdepth=cv2.CV_32S)
+
+        counts = (integral[self._y1, self._x1] - integral[self._y0, self._x1] -
+                  integral[self._y1, self._x0] + integral[self._y0, self._x0]).astype(np.int64)
+
+        # Polygon slots: one sparse mat-vec over the flattened integral image
+        if self._poly_masks is not None:
+            counts[self._poly_idx] = self._poly_masks @ integral.reshape(-1)
+
+        counts[~self.valid] = -1
+
+        return counts
+
+    def free_mask(self, counts, threshold):
+        """Return a boolean mask of free slots for the given counts"""
+        return self.valid & (counts < threshold)
+
+    def evaluate(self, img_pro, pos_list, threshold, changed=None, previous=None, frame_shape=None):
+        """
+        Count every slot and decide occupancy, returning an OccupancyResult
+
+        Args:
+            img_pro: Binarized (preprocessed) frame at processing resolution
+            pos_list: List of (x, y, w, h) slot positions
+            threshold: Full-resolution pixel count below which a slot is free
+            changed: Optional mask of slots to re-decide; the other slots keep
+                their state from previous (img_pro only has to be valid for changed slots)
+            previous: OccupancyResult of the last evaluated frame
+            frame_shape: Full-resolution frame shape (only needed when scale != 1)
+        """
+        if frame_shape is None:
+            frame_shape = self._full_shape(img_pro.shape)
+        counts = self.count(img_pro, pos_list, frame_shape)
+
+        # Scale the threshold by area and report counts in full-resolution units
+        area_scale = self.scale * self.scale
+        free = self.free_mask(counts, threshold * area_scale)
+        if self.scale != 1.0:
+            counts = np.where(self.valid, np.rint(counts / area_scale), -1).astype(np.int64)
+        evaluated = self.valid
+
+        if changed is not None and self.is_current(previous, threshold):
+            evaluated = self.valid & changed
+            counts = np.where(evaluated, counts, previous.counts)
+            free = np.where(evaluated, free, previous.free)
+
+        return OccupancyResult(self.slots, self.valid, counts, free, frame_shape,
+                               threshold=threshold, layout_version=self.layout_version,
+                               evaluated=evaluated, polygons=self.polygons)
@@ -0,0 +1,361 @@
+"""
+Headless occupancy analysis of recorded video files
+
+Splits a video into frame-range chunks, evaluates them in parallel worker
+processes with the same preprocessing and slot counting as the live detection
+view, and merges the per-chunk state changes into a per-slot occupancy timeline.
+
+Usage:
+    python -m models.offline_analyzer carPark.mp4 --reference carParkImg.png --ref-size 1280x720
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from datetime import datetime
+import cv2
+import numpy as np
+from models.occupancy_engine import OccupancyEngine
+from models.change_detector import SlotChangeDetector
+from utils.image_processor import ParkingPreprocessor
+from utils.resource_manager import load_parking_positions
+from utils.slot_geometry import scale_slot
+
+# Frames per chunk when none is given (a few minutes of 25 fps footage)
+DEFAULT_CHUNK_FRAMES = 5000
+
+
+def plan_chunks(frame_count, chunk_frames, frame_step=1):
+    """
+    Split [0, frame_count) into frame ranges whose starts are aligned to frame_step
+
+    Returns:
+        list: (start, end) frame ranges
+    """
+    chunk_frames = max(frame_step, (chunk_frames // frame_step) * frame_step)
+    return [(start, min(start + chunk_frames, frame_count))
+            for start in range(0, frame_count, chunk_frames)]
+
+
+def _analyze_chunk(task):
+    """
+    Worker entry point: evaluate one frame range of a video
+
+    Returns a dict with the occupancy of the first sampled frame and the
+    (frame, slot, occupied) state changes after it, so only transitions cross
+    the process boundary.
+    """
+    (video_path, start, end, pos_list, threshold, frame_step,
+     processing_scale, motion_gating) = task
+
+    result = {'start': start, 'end': start, 'stop': end, 'frames': 0, 'initial': None,
+              'valid': None, 'events': np.empty((0, 3), dtype=np.int64), 'error': None}
+
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if not cap.isOpened():
+            result['error'] = f"Failed to open video: {video_path}"
+            return result
+
+        if start > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+        engine = OccupancyEngine(scale=processing_scale)
+        detector = SlotChangeDetector() if motion_gating else None
+        preprocessor = ParkingPreprocessor(erode=True)
+        occupancy = None
+        events = []
+
+        frame_idx = start
+        while frame_idx < end:
+            # Decode only the sampled frames
+            if (frame_idx - start) % frame_step:
+                if not cap.grab():
+                    break
+                frame_idx += 1
+                continue
+
+            ret, img = cap.read()
+            if not ret:
+                break
+
+            changed = None
+            if detector is not None:
+                slots, valid = engine.layout(pos_list, img.shape)
+                changed = detector.changed_slots(img, slots, valid, engine.layout_version)
+
+            if changed is not None and not changed.any() and engine.is_current(occupancy, threshold):
+                occupancy = engine.carry_forward(occupancy)
+            else:
+                slot_mask = changed if engine.is_current(occupancy, threshold) else None
+                tiles = engine.roi_tiles(pos_list, img.shape, slot_mask)
+                img_pro = preprocessor.process(engine.prepare_frame(img), tiles=tiles)
+
+                previous = occupancy
+                occupancy = engine.evaluate(img_pro, pos_list, threshold, changed=changed,
+                                            previous=previous, frame_shape=img.shape)
+
+                # Record the slots whose state flipped
+                if previous is None:
+                    result['initial'] = occupancy.occupied.copy()
+                    result['valid'] = occupancy.valid.copy()
+                else:
+                    flipped = np.flatnonzero(occupancy.occupied != previous.occupied)
+                    for slot in flipped:
+                        events.append((frame_idx, slot, occupancy.occupied[slot]))
+
+            result['frames'] += 1
+            frame_idx += 1
+
+        result['end'] = frame_idx
+        if events:
+            result['events'] = np.array(events, dtype=np.int64)
+
+    except Exception as e:
+        result['error'] = f"Frames {start}-{end}: {str(e)}"
+    finally:
+        cap.release()
+
+    return result
+
+
+class OfflineOccupancyAnalyzer:
+    """
+    Batch occupancy analysis of a whole video file on a process pool
+    """
+
+    def __init__(self, video_path, pos_list, threshold=500, reference_size=None, workers=None,
+                 chunk_frames=DEFAULT_CHUNK_FRAMES, frame_step=1, processing_scale=1.0,
+                 motion_gating=True):
+        """
+        Args:
+            video_path: Path of the video file
+            pos_list: Slot positions (rectangles or polygons) at reference_size
+            threshold: Pixel count below which a slot is free (same as the live view)
+            reference_size: (width, height) the positions were drawn at; None means
+                they already match the video
+            workers: Number of worker processes (defaults to the CPU count)
+            chunk_frames: Frames per work item
+            frame_step: Evaluate every n-th frame
+            processing_scale: Resolution of the parking pipeline relative to the frame
+            motion_gating: Re-evaluate only slots whose pixels changed within a chunk
+        """
+        self.video_path = video_path
+        self.pos_list = list(pos_list)
+        self.threshold = threshold
+        self.reference_size = reference_size
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_frames = chunk_frames
+        self.frame_step = max(1, int(frame_step))
+        self.processing_scale = processing_scale
+        self.motion_gating = motion_gating
+
+        self.fps = 0.0
+        self.frame_count = 0
+        self.frame_size = None
+        self.errors = []
+
+    def _probe(self):
+        """Read frame count, fps and size of the video"""
+        cap = cv2.VideoCapture(self.video_path)
+        try:
+            if not cap.isOpened():
+                raise IOError(f"Failed to open video: {self.video_path}")
+
+            self.fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+            self.frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            self.frame_size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                               int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        finally:
+            cap.release()
+
+        if self.frame_count <= 0:
+            raise IOError(f"Video reports no frames: {self.video_path}")
+
+    def _scaled_positions(self):
+        """Positions scaled from the reference size to the video frame size"""
+        if not self.reference_size or tuple(self.reference_size) == self.frame_size:
+            return self.pos_list
+
+        width_scale = self.frame_size[0] / self.reference_size[0]
+        height_scale = self.frame_size[1] / self.reference_size[1]
+        return [scale_slot(pos, width_scale, height_scale) for pos in self.pos_list]
+
+    def run(self, progress_callback=None):
+        """
+        Analyze the whole video
+
+        Args:
+            progress_callback: Optional callable(done_chunks, total_chunks)
+
+        Returns:
+            list: Occupancy intervals as (slot, occupied, start_frame, end_frame) tuples;
+                occupied is None for frames of chunks that failed
+        """
+        self._probe()
+        positions = self._scaled_positions()
+        chunks = plan_chunks(self.frame_count, self.chunk_frames, self.frame_step)
+        tasks = [(self.video_path, start, end, positions, self.threshold, self.frame_step,
+                  self.processing_scale, self.motion_gating) for start, end in chunks]
+
+        results = []
+        workers = min(self.workers, len(tasks))
+        if workers <= 1:
+            for task in tasks:
+                results.append(_analyze_chunk(task))
+                if progress_callback:
+                    progress_callback(len(results), len(tasks))
+        else:
+            with multiprocessing.Pool(workers) as pool:
+                for result in pool.imap_unordered(_analyze_chunk, tasks):
+                    results.append(result)
+                    if progress_callback:
+                        progress_callback(len(results), len(tasks))
+
+        results.sort(key=lambda r: r['start'])
+        self.errors = [r['error'] for r in results if r['error']]
+        return self._merge(results, len(positions))
+
+    def _merge(self, results, slot_count):
+        """
+        Stitch the chunk results into per-slot occupancy intervals
+
+        Frames not covered by a successful chunk (failed chunks, or chunks that
+        stopped early) become "unknown" intervals; the state before such a gap
+        is closed at its start and restarts from the next successful chunk.
+        """
+        state = None
+        valid = None
+        since = np.zeros(slot_count, dtype=np.int64)
+        intervals = []
+        end_frame = 0
+        unknown_from = None  # Start of frames not covered since the last successful chunk
+
+        for result in results:
+            if result['error'] or result['initial'] is None:
+                # Chunks past the real end of the video read nothing and report no error
+                if result['error'] and unknown_from is None:
+                    unknown_from = end_frame
+                continue
+
+            gap_start = end_frame if unknown_from is None else unknown_from
+            if result['start'] > gap_start or (state is None and result['start'] > 0):
+                unknown_from = gap_start
+
+            if state is None or unknown_from is not None:
+                if state is not None:
+                    # Close the intervals before the gap
+                    for slot in np.flatnonzero(valid):
+                        intervals.append((int(slot), bool(state[slot]), int(since[slot]), unknown_from))
+                valid = result['valid'] if valid is None else valid | result['valid']
+                if unknown_from is not None:
+                    for slot in np.flatnonzero(valid):
+                        intervals.append((int(slot), None, unknown_from, result['start']))
+                state = result['initial'].copy()
+                since[:] = result['start']
+                unknown_from = None
+            else:
+                # State changes that happened across the chunk boundary
+                for slot in np.flatnonzero(result['initial'] != state):
+                    intervals.append((int(slot), bool(state[slot]), int(since[slot]), result['start']))
+                    state[slot] = result['initial'][slot]
+                    since[slot] = result['start']
+
+            for frame, slot, occupied in result['events']:
+                intervals.append((int(slot), bool(state[slot]), int(since[slot]), int(frame)))
+                state[slot] = bool(occupied)
+                since[slot] = frame
+
+            end_frame = result['end']
+
+        # Close the open interval of every slot at the end of the video
+        if state is not None:
+            for slot in np.flatnonzero(valid):
+                intervals.append((int(slot), bool(state[slot]), int(since[slot]), end_frame))
+
+            # Failed chunks at the end of the video
+            if unknown_from is not None:
+                stop = max(r['stop'] for r in results if r['error'])
+                for slot in np.flatnonzero(valid):
+                    intervals.append((int(slot), None, unknown_from, stop))
+
+        intervals.sort(key=lambda row: (row[0], row[2]))
+        return intervals
+
+    def export_timeline(self, intervals, log_dir):
+        """
+        Write the occupancy timeline to a CSV file
+
+        Returns:
+            str: Path of the written file, or None on error
+        """
+        try:
+            os.makedirs(log_dir, exist_ok=True)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            video_name = os.path.splitext(os.path.basename(str(self.video_path)))[0]
+            filename = os.path.join(log_dir, f"occupancy_timeline_{video_name}_{timestamp}.csv")
+
+            with open(filename, 'w') as f:
+                f.write("Slot,State,Start Frame,End Frame,Start (s),End (s),Duration (s)\n")
+
+                for slot, occupied, start, end in intervals:
+                    state = "unknown" if occupied is None else ("occupied" if occupied else "free")
+                    start_s = start / self.fps
+                    end_s = end / self.fps
+                    f.write(f"{slot},{state},{start},{end},{start_s:.2f},{end_s:.2f},{end_s - start_s:.2f}\n")
+
+            return filename
+        except Exception as e:
+            print(f"Error exporting occupancy timeline: {str(e)}")
+            return None
+
+
+def _parse_size(text):
+    """Parse a WIDTHxHEIGHT string"""
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline parking occupancy analysis of a video file")
+    parser.add_argument("video", help="Video file to analyze")
+    parser.add_argument("--reference", required=True, help="Reference image the slots were drawn on")
+    parser.add_argument("--ref-size", type=_parse_size, default=None,
+                        help="Reference image size as WIDTHxHEIGHT (slots are scaled to the video)")
+    parser.add_argument("--config-dir", default="config")
+    parser.add_argument("--log-dir", default="logs")
+    parser.add_argument("--threshold", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-frames", type=int, default=DEFAULT_CHUNK_FRAMES)
+    parser.add_argument("--step", type=int, default=1, help="Evaluate every n-th frame")
+    parser.add_argument("--scale", type=float, default=1.0, help="Processing scale")
+    parser.add_argument("--no-gating", action="store_true", help="Re-evaluate every slot on every frame")
+    args = parser.parse_args(argv)
+
+    positions = load_parking_positions(args.config_dir, args.reference)
+    if not positions:
+        print(f"No parking positions found for {args.reference}")
+        return 1
+
+    analyzer = OfflineOccupancyAnalyzer(
+        args.video, positions, threshold=args.threshold, reference_size=args.ref_size,
+        workers=args.workers, chunk_frames=args.chunk_frames, frame_step=args.step,
+        processing_scale=args.scale, motion_gating=not args.no_gating
+    )
+
+    start_time = time.time()
+    intervals = analyzer.run(
+        progress_callback=lambda done, total: print(f"Chunks done: {done}/{total}", flush=True))
+    elapsed = time.time() - start_time
+
+    for error in analyzer.errors:
+        print(f"Error: {error}")
+
+    filename = analyzer.export_timeline(intervals, args.log_dir)
+    print(f"Analyzed {analyzer.frame_count} frames in {elapsed:.1f} s "
+          f"({analyzer.frame_count / max(elapsed, 1e-6):.0f} fps), timeline: {filename}")
+    return 0 if filename else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,7 +4,12 @@ import threading
 import time
 import os
 import pickle
-from datetime import datetime
+from models.centroid_tracker import CentroidTracker
+from models.detection_lanes import DetectionLanes
+from models.occupancy_engine import OccupancyEngine
+from models.slot_table import SlotTable
+from utils.image_processor import ParkingPreprocessor
+from utils.slot_geometry import is_valid_slot, scale_slot, slot_points
 
 
 class ParkingManager:
@@ -28,7 +33,7 @@ class ParkingManager:
         self.free_spaces = 0
         self.occupied_spaces = 0
         self.vehicle_counter = 0
-        self.matches = []
+        self.matches = CentroidTracker()  # Vehicles in view of the counting line
 
         # Detection parameters
         self.parking_threshold = self.DEFAULT_THRESHOLD
@@ -37,6 +42,7 @@ class ParkingManager:
         self.min_contour_width = self.MIN_CONTOUR_SIZE
         self.min_contour_height = self.MIN_CONTOUR_SIZE
         self.offset = self.DEFAULT_OFFSET
+        self.motion_engine = None  # Optional MotionEngine; None differences consecutive frames
 
         # Video/image references
         self.video_reference_map = {}
@@ -56,14 +62,23 @@ class ParkingManager:
 
         # For the parking allocation system
         self.parking_visualizer = None
-        self.parking_data = {}
+
+        # Per-slot state for detection and allocation, plus grouped spaces by group ID
+        self.slot_table = SlotTable()
+        self.group_data = {}
+
+        # Vectorized slot occupancy counting and the latest per-frame result
+        self.occupancy_engine = OccupancyEngine()
+        self.occupancy_result = None
+        self.roi_preprocessing = True  # Filter only the regions around parking slots
+        self.parking_preprocessor = ParkingPreprocessor()  # Reused buffers, one parking pass at a time
 
         # For simultaneous detection
         self.simultaneous_mode = False
         self.vehicle_detection_result = None
-        self.vehicle_detection_thread = None
         self.parking_detection_result = None
-        self.parking_detection_thread = None
+        self.detection_lanes = None  # Persistent parking/vehicle worker threads, started on first use
+        self._merge_buffer = None  # Reused output frame of the simultaneous merge
 
     def _ensure_directories_exist(self):
         """Ensure necessary directories exist"""
@@ -114,21 +129,18 @@ class ParkingManager:
 
                     # Validate each position entry
                     for pos in loaded_data:
-                        # Check if position is a tuple of 4 numbers
-                        if (isinstance(pos, tuple) and len(pos) == 4 and
-                                all(isinstance(coord, (int, float)) for coord in pos)):
-                            # Verify coordinates are positive
-                            x, y, w, h = pos
-                            if x >= 0 and y >= 0 and w > 0 and h > 0:
+                        # Check if position is (x, y, w, h) or a polygon with non-negative values
+                        if isinstance(pos, tuple) and len(pos) > 0:
+                            if is_valid_slot(pos):
                                 self.posList.append(pos)
                             else:
-                                print(f"Skipped invalid position with negative values: {pos}")
+                                print(f"Skipped invalid position: {pos}")
 
                     # Remove any duplicates
                     seen = set()
                     unique_positions = []
                     for pos in self.posList:
-                        pos_tuple = tuple(map(int, pos))  # Convert to integers for comparison
+                        pos_tuple = tuple(slot_points(pos).ravel())  # Convert to integers for comparison
                         if pos_tuple not in seen:
                             seen.add(pos_tuple)
                             unique_positions.append(pos)
@@ -164,43 +176,51 @@ class ParkingManager:
             self.total_spaces = 0
             self.free_spaces = 0
             self.occupied_spaces = 0
-            self.parking_data = {}  # Clear parking data dictionary
+            self.slot_table.clear()  # Clear per-slot allocation state
+            self.group_data = {}
             print("All parking positions cleared")
         return True
 
+    @property
+    def parking_data(self):
+        """Legacy dict view of every space and group, keyed by space ID (for display)"""
+        parking_data = self.slot_table.to_parking_data()
+        parking_data.update(self.group_data)
+        return parking_data
+
     def check_parking_space(self, img_pro, img):
         """Process frame to check parking spaces"""
-        space_counter = 0
-        for i, (x, y, w, h) in enumerate(self.posList):
-            # Ensure coordinates are within image bounds
-            if (y >= 0 and y + h < img_pro.shape[0] and
-                    x >= 0 and x + w < img_pro.shape[1]):
-
-                # Get crop of parking space
-                img_crop = img_pro[y:y + h, x:x + w]
-                count = cv2.countNonZero(img_crop)
-
-                if count < self.parking_threshold:
-                    color = (0, 255, 0)  # Green for free
-                    space_counter += 1
-                else:
-                    color = (0, 0, 255)  # Red for occupied
+        # Count all slots once; the result is reused by the allocation update
+        result = self.occupancy_engine.evaluate(img_pro, self.posList, self.parking_threshold)
+        self.occupancy_result = result
+
+        for i in np.flatnonzero(result.valid):
+            x, y, w, h = (int(v) for v in result.slots[i])
+            count = int(result.counts[i])
 
+            if result.free[i]:
+                color = (0, 255, 0)  # Green for free
+            else:
+                color = (0, 0, 255)  # Red for occupied
+
+            if i in result.polygons:
+                cv2.polylines(img, [result.polygons[i].reshape(-1, 1, 2)], True, color, 2)
+            else:
                 cv2.rectangle(img, (x, y), (x + w, y + h), color, 2)
 
-                # Add count text
-                text_scale = 0.6
-                text_thickness = 2
-                (text_width, text_height), _ = cv2.getTextSize(
-                    str(count), cv2.FONT_HERSHEY_SIMPLEX, text_scale, text_thickness
-                )
-                text_x = x + (w - text_width) // 2
-                text_y = y + h - 5
-                cv2.putText(img, str(count), (text_x, text_y),
-                            cv2.FONT_HERSHEY_SIMPLEX, text_scale, (255, 255, 255), text_thickness)
+            # Add count text
+            text_scale = 0.6
+            text_thickness = 2
+            (text_width, text_height), _ = cv2.getTextSize(
+                str(count), cv2.FONT_HERSHEY_SIMPLEX, text_scale, text_thickness
+            )
+            text_x = x + (w - text_width) // 2
+            text_y = y + h - 5
+            cv2.putText(img, str(count), (text_x, text_y),
+                        cv2.FONT_HERSHEY_SIMPLEX, text_scale, (255, 255, 255), text_thickness)
 
         # Update counters
-        self.free_spaces = space_counter
+        self.free_spaces = result.free_spaces
         self.occupied_spaces = self.total_spaces - self.free_spaces
 
         return img
@@ -210,47 +230,16 @@ class ParkingManager:
         """Update both the original parking status and the allocation system"""
         # First, process with the existing method to determine which spaces are free/occupied
         img = self.check_parking_space(img_pro, img)
+        result = self.occupancy_result
 
-        # Then update the allocation system
-        space_ids = []
-        statuses = []
-
-        # Create parking_data dictionary if it doesn't exist
-        if not hasattr(self, 'parking_data'):
-            self.parking_data = {}
-
-        for i, (x, y, w, h) in enumerate(self.posList):
-            space_id = f"S{i + 1}"
-            section = "A" if x < img.shape[1] / 2 else "B"
-            section += "1" if y < img.shape[0] / 2 else "2"
-            full_space_id = f"{space_id}-{section}"
-
-            # Get status from existing system
-            img_crop = img_pro[y:y + h, x:x + w]
-            count = cv2.countNonZero(img_crop)
-            is_occupied = count >= self.parking_threshold
-
-            space_ids.append(space_id)
-            statuses.append(is_occupied)
-
-            # Update the parking_data dictionary used by allocation engine
-            if full_space_id not in self.parking_data:
-                self.parking_data[full_space_id] = {
-                    'position': (x, y, w, h),
-                    'occupied': True,  # Set to TRUE by default for new spaces
-                    'vehicle_id': None,
-                    'last_state_change': datetime.now(),
-                    'distance_to_entrance': x + y,  # Simple distance estimation
-                    'section': section
-                }
-            else:
-                # Only update existing entries based on detection
-                self.parking_data[full_space_id]['occupied'] = is_occupied
+        # Then update the slot table used by the allocation engine
+        self.slot_table.sync(self.posList, img.shape)
+        changed = self.slot_table.update_occupancy(result.occupied)
 
-        # Update the allocation system if available
+        # Update the allocation system if available (only slots that changed)
         if self.parking_visualizer:
-            self.parking_visualizer.update_parking_status(space_ids, statuses)
-            self.process_group_status(img_pro, img)
+            self.parking_visualizer.update_from_table(self.slot_table, changed)
+            self.process_group_status(result, img)
 
         return img
 
@@ -258,10 +247,13 @@ class ParkingManager:
         """Calculate centroid of a rectangle"""
         return x + w // 2, y + h // 2
 
-    def detect_vehicles(self, frame1, frame2):
-        """Process frames to detect and count vehicles"""
+    def _motion_boxes(self, current_frame, prev_frame):
+        """Bounding boxes of moving regions, from the motion engine or a frame difference"""
+        if self.motion_engine is not None:
+            return self.motion_engine.blobs(current_frame, self.min_contour_width, self.min_contour_height)
+
         # Get difference between frames
-        d = cv2.absdiff(frame1, frame2)
+        d = cv2.absdiff(prev_frame, current_frame)
         grey = cv2.cvtColor(d, cv2.COLOR_BGR2GRAY)
 
         blur = cv2.GaussianBlur(grey, (5, 5), 0)
@@ -272,6 +264,11 @@ class ParkingManager:
 
         closing = cv2.morphologyEx(dilated, cv2.MORPH_CLOSE, kernel)
         contours, _ = cv2.findContours(closing, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+        return [cv2.boundingRect(c) for c in contours]
+
+    def detect_vehicles(self, frame1, frame2):
+        """Process frames to detect and count vehicles"""
+        boxes = self._motion_boxes(frame1, frame2)
 
         # Draw detection line
         line_y = self.line_height
@@ -279,9 +276,9 @@ class ParkingManager:
             line_y = frame1.shape[0] - 50
         cv2.line(frame1, (0, line_y), (frame1.shape[1], line_y), (0, 255, 0), 2)
 
-        # Process contours
-        for (i, c) in enumerate(contours):
-            (x, y, w, h) = cv2.boundingRect(c)
+        # Process moving regions
+        centroids = []
+        for (x, y, w, h) in boxes:
             contour_valid = (w >= self.min_contour_width) and (h >= self.min_contour_height)
 
             if not contour_valid:
@@ -290,18 +287,12 @@ class ParkingManager:
             cv2.rectangle(frame1, (x - 10, y - 10), (x + w + 10, y + h + 10), (255, 0, 0), 2)
 
             centroid = self.get_centroid(x, y, w, h)
-            self.matches.append(centroid)
+            centroids.append(centroid)
             cv2.circle(frame1, centroid, 5, (0, 255, 0), -1)
 
         # Check for vehicles crossing the line
-        new_matches = []
-        for (x, y) in self.matches:
-            if (line_y - self.offset) < y < (line_y + self.offset):
-                self.vehicle_counter += 1
-            else:
-                new_matches.append((x, y))
-
-        self.matches = new_matches
+        with self.data_lock:
+            self.vehicle_counter += self.matches.update(centroids, line_y, self.offset)
 
         # Display count
         cv2.putText(frame1, f"Vehicle Count: {self.vehicle_counter}", (10, 30),
@@ -315,16 +306,8 @@ class ParkingManager:
         width_scale = new_width / orig_width
         height_scale = new_height / orig_height
 
-        # Scale all positions
-        scaled_positions = []
-        for x, y, w, h in self.posList:
-            new_x = int(x * width_scale)
-            new_y = int(y * height_scale)
-            new_w = int(w * width_scale)
-            new_h = int(h * height_scale)
-            scaled_positions.append((new_x, new_y, new_w, new_h))
-
-        self.posList = scaled_positions
+        # Scale all positions (rectangles and polygons)
+        self.posList = [scale_slot(pos, width_scale, height_scale) for pos in self.posList]
 
     def cleanup(self):
         """Clean up resources"""
@@ -332,46 +315,51 @@ class ParkingManager:
             if hasattr(self, 'ml_detector') and self.ml_detector:
                 del self.ml_detector
 
+            self.stop_detection_lanes()
+
             # Clean up any other resources here
             import gc
             gc.collect()
 
     # New methods for simultaneous detection
 
-    def process_frame_simultaneous(self, current_frame, prev_frame=None):
-        """Process a frame using both parking and vehicle detection simultaneously"""
-        if self.simultaneous_mode:
-            # Create copies of the frame for each detection method
-            parking_frame = current_frame.copy()
-            vehicle_frame = current_frame.copy() if prev_frame is not None else None
-
-            # Start threads for parallel processing
-            self.parking_detection_thread = threading.Thread(
-                target=self._process_parking_detection,
-                args=(parking_frame,)
-            )
-            self.parking_detection_thread.start()
+    def start_detection_lanes(self):
+        """Start the persistent parking and vehicle lanes if they are not running"""
+        if self.detection_lanes is None:
+            self.detection_lanes = DetectionLanes(self._process_parking_detection,
+                                                  self._process_vehicle_detection)
+        return self.detection_lanes
 
-            if prev_frame is not None and vehicle_frame is not None:
-                self.vehicle_detection_thread = threading.Thread(
-                    target=self._process_vehicle_detection,
-                    args=(vehicle_frame, prev_frame)
-                )
-                self.vehicle_detection_thread.start()
+    def stop_detection_lanes(self):
+        """Stop the lane threads (they are restarted on the next simultaneous frame)"""
+        if self.detection_lanes is not None:
+            self.detection_lanes.stop()
+            self.detection_lanes = None
 
-            # Wait for threads to complete
-            if self.parking_detection_thread:
-                self.parking_detection_thread.join()
-
-            if prev_frame is not None and self.vehicle_detection_thread:
-                self.vehicle_detection_thread.join()
+    def process_frame_simultaneous(self, current_frame, prev_frame=None):
+        """
+        Process a frame using both parking and vehicle detection simultaneously
+
+        In simultaneous mode the frame is handed to the persistent lanes, which
+        work on it while the caller moves on; the overlay uses the newest lane
+        results (at most one frame behind) and is drawn into a buffer that is
+        reused by the next call.
+        """
+        if self.simultaneous_mode:
+            # Queue the frame on both lanes and collect their newest results
+            lanes = self.start_detection_lanes()
+            lanes.submit(current_frame, prev_frame)
+            _, parking_result, _, vehicle_result = lanes.results(vehicle=prev_frame is not None)
 
             # Merge results into one frame
-            result_frame = current_frame.copy()
+            if self._merge_buffer is None or self._merge_buffer.shape != current_frame.shape:
+                self._merge_buffer = np.empty_like(current_frame)
+            result_frame = self._merge_buffer
+            np.copyto(result_frame, current_frame)
 
             # If we have parking results, draw parking spaces
-            if self.parking_detection_result is not None:
-                for i, (x, y, w, h, is_free) in enumerate(self.parking_detection_result):
+            if parking_result is not None:
+                for i, (x, y, w, h, is_free) in enumerate(parking_result):
                     color = (0, 255, 0) if is_free else (0, 0, 255)  # Green for free, Red for occupied
                     cv2.rectangle(result_frame, (x, y), (x + w, y + h), color, 2)
 
@@ -380,7 +368,7 @@ class ParkingManager:
                                 cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
 
             # If we have vehicle detection results, draw vehicles and count
-            if self.vehicle_detection_result is not None and prev_frame is not None:
+            if vehicle_result is not None and prev_frame is not None:
                 # Draw detection line
                 line_y = self.line_height
                 if line_y >= result_frame.shape[0]:
@@ -392,7 +380,7 @@ class ParkingManager:
                             cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 200, 0), 2)
 
                 # Draw rectangles for detected vehicles
-                for rect in self.vehicle_detection_result:
+                for rect in vehicle_result:
                     x, y, w, h = rect
                     cv2.rectangle(result_frame, (x - 10, y - 10), (x + w + 10, y + h + 10), (255, 0, 0), 2)
 
@@ -405,80 +393,56 @@ class ParkingManager:
             # Use standard detection based on current mode
             if self.detection_mode == "parking":
                 # Preprocess the frame for parking detection
-                imgGray = cv2.cvtColor(current_frame, cv2.COLOR_BGR2GRAY)
-                imgBlur = cv2.GaussianBlur(imgGray, (3, 3), 1)
-                imgThreshold = cv2.adaptiveThreshold(imgBlur, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                                     cv2.THRESH_BINARY_INV, 25, 16)
-                imgProcessed = cv2.medianBlur(imgThreshold, 5)
-                kernel = np.ones((3, 3), np.uint8)
-                imgProcessed = cv2.dilate(imgProcessed, kernel, iterations=1)
+                imgProcessed = self.parking_preprocessor.process(
+                    current_frame, tiles=self._roi_tiles(current_frame))
 
                 return self.check_parking_space(imgProcessed, current_frame.copy())
-            elif prev_frame is not None:
+            elif prev_frame is not None or self.motion_engine is not None:
                 return self.detect_vehicles(current_frame.copy(), prev_frame)
             else:
                 return current_frame.copy()
 
+    def _roi_tiles(self, frame):
+        """Get the preprocessing tiles for the current layout, or None for a full-frame pass"""
+        if not self.roi_preprocessing:
+            return None
+
+        with self.data_lock:
+            return self.occupancy_engine.roi_tiles(self.posList, frame.shape)
+
     def _process_parking_detection(self, frame):
-        """Process parking detection in a separate thread"""
+        """Process parking detection on the parking lane"""
         # Preprocess the frame
-        imgGray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        imgBlur = cv2.GaussianBlur(imgGray, (3, 3), 1)
-        imgThreshold = cv2.adaptiveThreshold(imgBlur, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                             cv2.THRESH_BINARY_INV, 25, 16)
-        imgProcessed = cv2.medianBlur(imgThreshold, 5)
-        kernel = np.ones((3, 3), np.uint8)
-        imgProcessed = cv2.dilate(imgProcessed, kernel, iterations=1)
-
-        # Process each parking space
-        parking_results = []
-        space_counter = 0
+        imgProcessed = self.parking_preprocessor.process(frame, tiles=self._roi_tiles(frame))
 
+        # Count every parking space in one pass
         with self.data_lock:
-            for i, (x, y, w, h) in enumerate(self.posList):
-                # Ensure coordinates are within image bounds
-                if (y >= 0 and y + h < imgProcessed.shape[0] and x >= 0 and x + w < imgProcessed.shape[1]):
-                    # Get crop of parking space
-                    img_crop = imgProcessed[y:y + h, x:x + w]
-                    count = cv2.countNonZero(img_crop)
-                    is_free = count < self.parking_threshold
-
-                    if is_free:
-                        space_counter += 1
+            result = self.occupancy_engine.evaluate(imgProcessed, self.posList, self.parking_threshold)
+            self.occupancy_result = result
 
-                    # Store results
-                    parking_results.append((x, y, w, h, is_free))
+            parking_results = []
+            for i in np.flatnonzero(result.valid):
+                x, y, w, h = (int(v) for v in result.slots[i])
+                parking_results.append((x, y, w, h, bool(result.free[i])))
 
-            self.free_spaces = space_counter
+            self.free_spaces = result.free_spaces
             self.total_spaces = len(self.posList)
             self.occupied_spaces = self.total_spaces - self.free_spaces
             self.parking_detection_result = parking_results
 
-    def _process_vehicle_detection(self, current_frame, prev_frame):
-        """Process vehicle detection in a separate thread"""
-        # Get difference between frames
-        d = cv2.absdiff(prev_frame, current_frame)
-        grey = cv2.cvtColor(d, cv2.COLOR_BGR2GRAY)
-        blur = cv2.GaussianBlur(grey, (5, 5), 0)
-        _, th = cv2.threshold(blur, 20, 255, cv2.THRESH_BINARY)
-        dilated = cv2.dilate(th, np.ones((3, 3)))
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2, 2))
-        closing = cv2.morphologyEx(dilated, cv2.MORPH_CLOSE, kernel)
+        return parking_results
 
-        # Find contours
-        contours, _ = cv2.findContours(closing, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    def _process_vehicle_detection(self, current_frame, prev_frame):
+        """Process vehicle detection on the vehicle lane"""
+        boxes = self._motion_boxes(current_frame, prev_frame)
 
         # Process contours and update vehicle detection
         vehicle_results = []
         line_y = self.line_height
 
-        # Make a copy of matches to work with
-        with self.data_lock:
-            matches_copy = self.matches.copy()
-
-        # Process each contour
-        for (i, c) in enumerate(contours):
-            (x, y, w, h) = cv2.boundingRect(c)
+        # Process each moving region
+        centroids = []
+        for (x, y, w, h) in boxes:
             contour_valid = (w >= self.min_contour_width) and (h >= self.min_contour_height)
 
             if not contour_valid:
@@ -488,34 +452,23 @@ class ParkingManager:
             vehicle_results.append((x, y, w, h))
 
             # Add centroid
-            centroid = self.get_centroid(x, y, w, h)
-            matches_copy.append(centroid)
-
-        # Check for vehicles crossing the line
-        new_matches = []
-        new_counter = self.vehicle_counter
+            centroids.append(self.get_centroid(x, y, w, h))
 
-        for (x, y) in matches_copy:
-            if (line_y - self.offset) < y < (line_y + self.offset):
-                new_counter += 1
-            else:
-                new_matches.append((x, y))
-
-        # Update vehicle data
+        # Check for vehicles crossing the line and update vehicle data
         with self.data_lock:
-            self.matches = new_matches
-            self.vehicle_counter = new_counter
+            self.vehicle_counter += self.matches.update(centroids, line_y, self.offset)
             self.vehicle_detection_result = vehicle_results
 
+        return vehicle_results
+
     # Add these methods to the ParkingManager class
 
-    def process_group_status(self, img_pro, img):
-        """Process the status of grouped parking spaces"""
-        if not hasattr(self, 'parking_data'):
-            return
+    def process_group_status(self, result, img):
+        """Process the status of grouped parking spaces from this frame's OccupancyResult"""
+        occupied = result.valid & result.occupied
 
-        # Find all entries that are groups
-        for space_id, data in list(self.parking_data.items()):
+        # Update every group of spaces
+        for space_id, data in list(self.group_data.items()):
             if data.get('is_group', False) and 'member_spaces' in data:
                 member_spaces = data['member_spaces']
                 total_members = len(member_spaces)
@@ -524,22 +477,9 @@ class ParkingManager:
                     continue
 
                 # Count occupied spaces in this group
-                occupied_count = 0
-                for i in member_spaces:
-                    if i < len(self.posList):
-                        # Get data for this space
-                        x, y, w, h = self.posList[i]
-
-                        # Check if space is within image bounds
-                        if (y >= 0 and y + h < img_pro.shape[0] and
-                                x >= 0 and x + w < img_pro.shape[1]):
-
-                            # Get crop of parking space
-                            img_crop = img_pro[y:y + h, x:x + w]
-                            count = cv2.countNonZero(img_crop)
-
-                            if count >= self.parking_threshold:
-                                occupied_count += 1
+                members = np.asarray(member_spaces, dtype=np.intp)
+                members = members[members < len(occupied)]
+                occupied_count = int(np.count_nonzero(occupied[members]))
 
                 # Determine if group is occupied (more than 50% of spaces occupied)
                 is_group_occupied = occupied_count > (total_members / 2)
@@ -554,4 +494,4 @@ class ParkingManager:
 
                 # Add group label
                 cv2.putText(img, f"{space_id}: {occupied_count}/{total_members}",
-                            (x + 5, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
\ No newline at end of file
+                            (x + 5, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
@@ -7,6 +7,7 @@ import pandas as pd
 from datetime import datetime
 import pickle
 import os
+from utils.slot_geometry import slot_bounds
 
 
 class ParkingVisualizer:
@@ -24,6 +25,7 @@ class ParkingVisualizer:
         # Parking data
         self.parking_data = {}
         self.allocation_history = []
+        self._table_version = -1  # SlotTable layout last synced from
 
         # For visualization
         self.plot_width = 800
@@ -124,8 +126,9 @@ class ParkingVisualizer:
         """Initialize parking space data structure from positions list"""
         self.parking_data = {}
 
-        for i, (x, y, w, h) in enumerate(positions):
+        for i, pos in enumerate(positions):
             space_id = f"S{i + 1}"
+            x, y, w, h = slot_bounds(pos)
 
             # Calculate distance from entrance (simplified: using position as proxy)
             distance = x + y  # Simple proxy for distance
@@ -166,6 +169,22 @@ class ParkingVisualizer:
                 if not is_occupied:
                     self.parking_data[space_id]['vehicle_id'] = None
 
+    def update_from_table(self, table, changed):
+        """
+        Update the occupancy status from a SlotTable
+
+        Args:
+            table: SlotTable with the current slot state
+            changed: Indices of slots whose occupancy changed this frame
+        """
+        # Resync every space after a layout change, otherwise only the changed slots
+        if table.version != self._table_version:
+            self._table_version = table.version
+            changed = np.arange(len(table))
+
+        statuses = table.occupied[changed].tolist()
+        self.update_parking_status([f"S{i + 1}" for i in changed], statuses)
+
     def allocate_parking(self, vehicle_id, vehicle_size=1):
         """
         Allocate a vehicle to the optimal parking space using XGBoost model
@@ -0,0 +1,221 @@
+import threading
+import time
+from datetime import datetime
+import numpy as np
+from utils.slot_geometry import layout_bounds, same_layout
+
+# Section codes, in the order produced by section_codes()
+SECTION_NAMES = ("A1", "A2", "B1", "B2")
+
+# Marker for a slot without an allocated vehicle
+NO_VEHICLE = -1
+
+# One record per slot (34 bytes instead of a dict of dicts per slot)
+SLOT_DTYPE = np.dtype([
+    ('rect', np.int32, (4,)),  # x, y, w, h (bounding box for polygon slots)
+    ('section', np.uint8),  # Index into SECTION_NAMES
+    ('distance', np.float32),  # Distance to entrance estimate
+    ('occupied', np.bool_),
+    ('last_change', np.float64),  # Epoch seconds of the last state change
+    ('vehicle_id', np.int32),  # Allocated vehicle number, NO_VEHICLE if none
+])
+
+
+def section_codes(x, y, frame_width, frame_height):
+    """Vectorized section lookup (A/B by frame half horizontally, 1/2 vertically)"""
+    return ((np.asarray(x) >= frame_width / 2).astype(np.uint8) * 2 +
+            (np.asarray(y) >= frame_height / 2).astype(np.uint8))
+
+
+class SlotTable:
+    """
+    Columnar per-slot state for the whole lot.
+
+    Holds coordinates, section, distance, occupancy, last state change and the
+    allocated vehicle for every slot in one NumPy structured array, so the
+    detection loop, allocation engine and visualizer work on indexed column
+    views instead of string-keyed dicts. Space IDs such as "S12-B2" are only
+    formatted at the UI boundary.
+    """
+
+    def __init__(self):
+        self.data = np.zeros(0, dtype=SLOT_DTYPE)
+        self.lock = threading.RLock()
+
+        # Bumped whenever the slot layout is rebuilt
+        self.version = 0
+
+        # Cached layout reference (same rule as OccupancyEngine)
+        self._layout_ref = None
+        self._layout_len = -1
+        self._layout_items = None  # Snapshot of the slots, to catch in-place edits of the list
+        self._frame_shape = None
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def rects(self):
+        return self.data['rect']
+
+    @property
+    def sections(self):
+        return self.data['section']
+
+    @property
+    def occupied(self):
+        return self.data['occupied']
+
+    def invalidate(self):
+        """Force the layout to be rebuilt on the next sync"""
+        self._layout_ref = None
+
+    def clear(self):
+        """Remove every slot"""
+        with self.lock:
+            self.data = np.zeros(0, dtype=SLOT_DTYPE)
+            self._layout_ref = None
+            self._layout_len = 0
+            self.version += 1
+
+    def sync(self, pos_list, frame_shape):
+        """
+        Make the table match a slot layout, keeping state for unchanged slots
+
+        Args:
+            pos_list: List of (x, y, w, h) slot positions
+            frame_shape: (height, width, ...) of the frame the positions refer to
+
+        Returns:
+            bool: True if the layout was rebuilt
+        """
+        with self.lock:
+            if (pos_list is self._layout_ref and
+                    len(pos_list) == self._layout_len and
+                    tuple(frame_shape[:2]) == self._frame_shape and
+                    same_layout(pos_list, self._layout_items)):
+                return False
+
+            self._rebuild(pos_list, frame_shape, keep_state=True)
+            return True
+
+    def reset(self, pos_list, frame_shape):
+        """Rebuild the table from scratch with every slot marked occupied"""
+        with self.lock:
+            self._rebuild(pos_list, frame_shape, keep_state=False)
+
+    def _rebuild(self, pos_list, frame_shape, keep_state):
+        """Build a new record array for the layout"""
+        height, width = frame_shape[:2]
+        data = np.zeros(len(pos_list), dtype=SLOT_DTYPE)
+
+        if len(pos_list) > 0:
+            rects = layout_bounds(pos_list)  # Bounding box for polygon slots
+            data['rect'] = rects
+            data['section'] = section_codes(rects[:, 0], rects[:, 1], width, height)
+            data['distance'] = rects[:, 0] + rects[:, 1]  # Simple distance estimation
+
+        # New slots are occupied until detection says otherwise
+        data['occupied'] = True
+        data['last_change'] = time.time()
+        data['vehicle_id'] = NO_VEHICLE
+
+        if keep_state and len(self.data) > 0:
+            # Carry over state for slots whose position did not change
+            common = min(len(data), len(self.data))
+            same = np.all(data['rect'][:common] == self.data['rect'][:common], axis=1)
+            for field in ('occupied', 'last_change', 'vehicle_id'):
+                data[field][:common][same] = self.data[field][:common][same]
+
+        self.data = data
+        self._layout_ref = pos_list
+        self._layout_len = len(pos_list)
+        self._layout_items = list(pos_list)
+        self._frame_shape = (height, width)
+        self.version += 1
+
+    def update_occupancy(self, occupied, where=None, now=None):
+        """
+        Apply a frame's occupancy and return the indices of slots that changed
+
+        Args:
+            occupied: Boolean occupied mask, one entry per slot
+            where: Optional boolean mask of slots to update (e.g. slots inside the frame)
+            now: Epoch timestamp of the change (defaults to time.time())
+        """
+        with self.lock:
+            occupied = np.asarray(occupied, dtype=bool)[:len(self.data)]
+            changed = self.data['occupied'][:len(occupied)] != occupied
+            if where is not None:
+                changed &= np.asarray(where, dtype=bool)[:len(occupied)]
+
+            changed_idx = np.flatnonzero(changed)
+            if len(changed_idx) > 0:
+                self.data['occupied'][changed_idx] = occupied[changed_idx]
+                self.data['last_change'][changed_idx] = time.time() if now is None else now
+
+                # A slot that became free no longer holds its vehicle
+                freed = changed_idx[~occupied[changed_idx]]
+                self.data['vehicle_id'][freed] = NO_VEHICLE
+
+            return changed_idx
+
+    def assign_vehicle(self, index, vehicle_id, now=None):
+        """Mark a slot occupied by an allocated vehicle"""
+        with self.lock:
+            self.data['occupied'][index] = True
+            self.data['vehicle_id'][index] = vehicle_id
+            self.data['last_change'][index] = time.time() if now is None else now
+
+    def release(self, index, now=None):
+        """Free a slot and drop its vehicle"""
+        with self.lock:
+            self.data['occupied'][index] = False
+            self.data['vehicle_id'][index] = NO_VEHICLE
+            self.data['last_change'][index] = time.time() if now is None else now
+
+    def release_all(self):
+        """Free every slot"""
+        with self.lock:
+            self.data['occupied'] = False
+            self.data['vehicle_id'] = NO_VEHICLE
+            self.data['last_change'] = time.time()
+
+    def free_indices(self):
+        """Indices of free slots"""
+        return np.flatnonzero(~self.data['occupied'])
+
+    def section_counts(self):
+        """Return (total, occupied) slot counts per section code"""
+        sections = self.data['section']
+        total = np.bincount(sections, minlength=len(SECTION_NAMES))
+        occupied = np.bincount(sections, weights=self.data['occupied'], minlength=len(SECTION_NAMES))
+        return total, occupied.astype(np.int64)
+
+    def space_id(self, index):
+        """Format the legacy space ID (e.g. "S12-B2") of a slot"""
+        return f"S{index + 1}-{SECTION_NAMES[self.data['section'][index]]}"
+
+    def index_of(self, space_id):
+        """Parse a legacy space ID back to its slot index, or None"""
+        try:
+            index = int(space_id.split('-')[0][1:]) - 1
+        except (ValueError, IndexError):
+            return None
+        return index if 0 <= index < len(self.data) else None
+
+    def to_parking_data(self):
+        """Build the legacy dict-of-dicts view (UI display only, not for the hot path)"""
+        with self.lock:
+            parking_data = {}
+            for i, record in enumerate(self.data):
+                vehicle_id = int(record['vehicle_id'])
+                parking_data[self.space_id(i)] = {
+                    'position': tuple(int(v) for v in record['rect']),
+                    'occupied': bool(record['occupied']),
+                    'vehicle_id': f"V{vehicle_id}" if vehicle_id != NO_VEHICLE else None,
+                    'last_state_change': datetime.fromtimestamp(record['last_change']),
+                    'distance_to_entrance': float(record['distance']),
+                    'section': SECTION_NAMES[record['section']]
+                }
+            return parking_data
@@ -15,6 +15,15 @@ from models.parking_visualizer import ParkingVisualizer
 from models.allocation_engine import ParkingAllocationEngine
 from ui.parking_allocation_tab import ParkingAllocationTab
 from models.vehicle_detector import VehicleDetector
+from models.occupancy_engine import OccupancyEngine
+from models.change_detector import SlotChangeDetector
+from models.motion_engine import FRAME_DIFFERENCE, create_motion_engine
+from models.centroid_tracker import CentroidTracker
+from utils.frame_scheduler import ActivityRateController
+from utils.image_processor import ParkingPreprocessor
+from utils.result_cache import ResultCache
+from utils.overlay import SlotOverlayCompositor
+from utils.slot_geometry import scale_slot
 from utils.resource_manager import ensure_directories_exist, load_parking_positions
 from utils.media_paths import list_available_videos
 
@@ -41,7 +50,7 @@ class ParkingManagementSystem:
         self.video_capture = None
         self.current_video = None
         self.vehicle_counter = 0
-        self.matches = []  # For vehicle counting
+        self.matches = CentroidTracker()  # Vehicles in view of the counting line
         self.line_height = self.DEFAULT_LINE_HEIGHT
         self.min_contour_width = self.MIN_CONTOUR_SIZE
         self.min_contour_height = self.MIN_CONTOUR_SIZE
@@ -52,6 +61,14 @@ class ParkingManagementSystem:
         self.use_ml_detection = False
         self.ml_detector = None
         self.ml_confidence = self.DEFAULT_CONFIDENCE
+        self.roi_preprocessing = True  # Filter only the regions around parking slots
+        self.motion_gating = True  # Re-evaluate only slots whose pixels changed
+        self.adaptive_sampling = True  # Evaluate occupancy less often while the lot is quiet
+        self.processing_scale = 1.0  # Resolution of the parking pipeline relative to the frame
+        self.display_fps = None  # Frames shown per second, None shows every source frame
+        self.result_caching = True  # Replay recorded videos from cached per-frame results
+        self.canvas_overlays = False  # Draw slot annotations as canvas items instead of into the frame
+        self.motion_backend = FRAME_DIFFERENCE  # Motion source of the traditional vehicle counter
         self._cleanup_lock = threading.Lock()
         self.data_lock = threading.Lock()
         self.video_lock = threading.Lock()
@@ -82,6 +99,17 @@ class ParkingManagementSystem:
         self.parking_visualizer = ParkingVisualizer(config_dir=self.config_dir, logs_dir=self.log_dir)
         self.allocation_engine = ParkingAllocationEngine(config_dir=self.config_dir)
 
+        # Vectorized slot occupancy counting shared by the detection views,
+        # and the latest per-frame OccupancyResult read by the other tabs
+        self.occupancy_engine = OccupancyEngine(scale=self.processing_scale)
+        self.occupancy_result = None
+        self.change_detector = SlotChangeDetector()
+        self.rate_controller = ActivityRateController()
+        self.parking_preprocessor = ParkingPreprocessor(erode=True)
+        self.result_cache = ResultCache()  # Opened on first use
+        self.slot_overlay = SlotOverlayCompositor()  # Cached slot annotations of the detection view
+        self.motion_engine = create_motion_engine(self.motion_backend)  # None for frame differencing
+
         # Setup UI components
         self.setup_ui()
 
@@ -238,12 +266,8 @@ class ParkingManagementSystem:
         while True:
             # Record stats every hour if detection is running
             if self.running and hasattr(self, 'stats_tab'):
-                self.stats_tab.record_current_stats(
-                    self.total_spaces,
-                    self.free_spaces,
-                    self.occupied_spaces,
-                    self.vehicle_counter
-                )
+                # Space counts come from the latest shared OccupancyResult
+                self.stats_tab.record_current_stats(vehicle_counter=self.vehicle_counter)
 
             # Sleep for an hour (3600 seconds)
             time.sleep(3600)
@@ -276,13 +300,7 @@ class ParkingManagementSystem:
             height_scale = self.image_height / ref_height
 
             # Scale from original positions to avoid cumulative scaling errors
-            scaled_positions = []
-            for x, y, w, h in self.original_posList:
-                new_x = int(x * width_scale)
-                new_y = int(y * height_scale)
-                new_w = int(w * width_scale)
-                new_h = int(h * height_scale)
-                scaled_positions.append((new_x, new_y, new_w, new_h))
+            scaled_positions = [scale_slot(pos, width_scale, height_scale) for pos in self.original_posList]
 
             # Replace current positions with scaled positions
             self.posList = scaled_positions
@@ -311,25 +329,12 @@ class ParkingManagementSystem:
             # Initialize parking spaces in the visualizer
             self.parking_visualizer.initialize_parking_spaces(self.posList)
 
-            # Create a compatible data structure for the allocation engine
-            spaces_data = {}
-            for i, (x, y, w, h) in enumerate(self.posList):
-                space_id = f"S{i + 1}"
-                # Split spaces into sections based on position
-                section = "A" if x < self.image_width / 2 else "B"
-                section += "1" if y < self.image_height / 2 else "2"
-
-                spaces_data[f"{space_id}-{section}"] = {
-                    'position': (x, y, w, h),
-                    'occupied': True,  # Default to occupied until detected as free
-                    'vehicle_id': None,
-                    'last_state_change': datetime.now(),
-                    'distance_to_entrance': x + y,  # Simple distance estimation
-                    'section': section
-                }
-
-            # Update the allocation engine's data structure
-            self.allocation_engine.initialize_parking_spaces(spaces_data)
+            # Build the slot table shared with the allocation engine
+            slot_table = self.parking_manager.slot_table
+            slot_table.sync(self.posList, (self.image_height, self.image_width))
+
+            # Update the allocation engine's section statistics
+            self.allocation_engine.update_section_stats(slot_table)
             self.log_event(f"Connected {len(self.posList)} parking spaces to allocation system")
 
     def on_closing(self):
@@ -338,6 +343,7 @@ class ParkingManagementSystem:
             self.running = False
             if hasattr(self, 'video_capture') and self.video_capture:
                 self.video_capture.release()
+            self.result_cache.close()
             self.master.destroy()
 
     def adjust_for_screen_size(self):
@@ -385,25 +391,9 @@ class ParkingManagementSystem:
                 # Make sure the allocation tab has access to the parking manager's data
                 self.allocation_tab.app = self
 
-                # Create the parking data structure if it doesn't exist
-                if not hasattr(self.parking_manager, 'parking_data'):
-                    self.parking_manager.parking_data = {}
-
-                    # Initialize with parking spaces
-                    for i, (x, y, w, h) in enumerate(self.posList):
-                        # Generate section based on position
-                        section = "A" if x < self.image_width / 2 else "B"
-                        section += "1" if y < self.image_height / 2 else "2"
-
-                        space_id = f"S{i + 1}-{section}"
-                        self.parking_manager.parking_data[space_id] = {
-                            'position': (x, y, w, h),
-                            'occupied': True,  # Default to occupied until detected
-                            'vehicle_id': None,
-                            'last_state_change': datetime.now(),
-                            'distance_to_entrance': x + y,  # Simple distance estimation
-                            'section': section
-                        }
+                # Build the slot table from the positions if it is still empty
+                if len(self.parking_manager.slot_table) == 0:
+                    self.parking_manager.slot_table.sync(self.posList, (self.image_height, self.image_width))
 
                 # Update allocation tab's UI
                 self.allocation_tab.update_visualization()
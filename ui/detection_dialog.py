@@ -1,12 +1,20 @@
 from tkinter import *
 from tkinter import ttk, messagebox
-from PIL import Image, ImageTk
-import cv2
-import numpy as np
 import time
 from datetime import datetime
-from utils.image_processor import process_parking_spaces, detect_vehicles_traditional, process_ml_detections
+from utils.image_processor import process_parking_spaces, detect_vehicles_traditional, process_ml_detections, \
+    ParkingPreprocessor
 from utils.tracker_integration import process_ml_detections_with_tracking
+from models.occupancy_engine import OccupancyEngine
+from models.change_detector import SlotChangeDetector
+from models.motion_engine import create_motion_engine
+from models.centroid_tracker import CentroidTracker
+from utils.frame_grabber import FrameGrabber, SamplingPlan
+from models.frame_analyzer import FrameAnalyzer
+from utils.frame_scheduler import DeadlineScheduler
+from utils.camera_workers import CameraWorker
+from utils.display_surface import DisplaySurface
+from utils.overlay import SlotOverlayCompositor
 
 
 class DetectionDialog:
@@ -14,7 +22,7 @@ class DetectionDialog:
     Dialog for running either parking or vehicle detection on a separate video source
     """
 
-    def __init__(self, parent, app, detection_type, video_source):
+    def __init__(self, parent, app, detection_type, video_source, use_process=False):
         """
         Initialize a detection dialog window
 
@@ -23,11 +31,13 @@ class DetectionDialog:
             app: Main application reference
             detection_type: "parking" or "vehicle"
             video_source: Path to video or camera index
+            use_process: Capture and analyze the feed in a CameraWorker process
         """
         self.parent = parent
         self.app = app
         self.detection_type = detection_type
         self.video_source = video_source
+        self.use_process = use_process
 
         # Create dialog window
         self.dialog = Toplevel(parent)
@@ -46,6 +56,9 @@ class DetectionDialog:
         self.video_canvas = Canvas(self.video_frame, bg="black")
         self.video_canvas.pack(fill=BOTH, expand=True)
 
+        # One PhotoImage on the canvas, updated in place and scaled to fit it
+        self.display_surface = DisplaySurface(self.video_canvas)
+
         # Status frame
         self.status_frame = ttk.LabelFrame(self.main_frame, text="Status")
         self.status_frame.pack(fill=X, padx=5, pady=5)
@@ -72,11 +85,23 @@ class DetectionDialog:
         # Initialize video settings
         self.running = False
         self.video_capture = None
+        self.frame_analyzer = None
+        self.frame_scheduler = None
+        self.camera_worker = None
         self.prev_frame = None
         self.frame_count = 0
         self.frame_skip = 2
         self.last_processing_time = 0
 
+        # Each dialog owns its own slot layout cache
+        self.occupancy_engine = OccupancyEngine()
+        self.occupancy_result = None
+        self.change_detector = SlotChangeDetector()
+        self.preprocessor = ParkingPreprocessor(erode=True)
+        self.motion_engine = create_motion_engine(getattr(self.app, 'motion_backend', None))
+        self.vehicle_tracks = CentroidTracker()  # Vehicles in view of this dialog's counting line
+        self.slot_overlay = SlotOverlayCompositor()
+
         # Start the detection
         self.start_detection()
 
@@ -89,42 +114,125 @@ class DetectionDialog:
             if video_source == "Webcam":
                 video_source = 0
 
-            # Open video capture
-            self.video_capture = cv2.VideoCapture(video_source)
+            # For parking detection, load positions if needed
+            if self.detection_type == "parking":
+                if isinstance(video_source, str) and video_source in self.app.video_reference_map:
+                    ref_image = self.app.video_reference_map[video_source]
+                    if ref_image != self.app.current_reference_image:
+                        self.app.current_reference_image = ref_image
+                        self.app.load_parking_positions(ref_image)
+
+            if self.use_process:
+                self.start_camera_worker(video_source)
+                return
+
+            # Open video capture, decoded on a reader thread into a small buffer;
+            # frames beyond the display rate are skipped without decoding
+            plan = SamplingPlan()
+            self.video_capture = FrameGrabber(video_source, plan=plan)
+            plan.set_display_rate(getattr(self.app, 'display_fps', None), self.video_capture.fps)
+            plan.analysis_every = plan.display_every
 
             # Check if opened successfully
             if not self.video_capture.isOpened():
                 messagebox.showerror("Error", f"Failed to open video source: {video_source}")
                 self.close_dialog()
                 return
+            self.video_capture.start()
 
             # Update running state
             self.running = True
 
-            # Start frame processing
-            self.process_frame()
-
-            # For parking detection, load positions if needed
-            if self.detection_type == "parking":
-                if isinstance(video_source, str) and video_source in self.app.video_reference_map:
-                    ref_image = self.app.video_reference_map[video_source]
-                    if ref_image != self.app.current_reference_image:
-                        self.app.current_reference_image = ref_image
-                        self.app.load_parking_positions(ref_image)
+            # Analyze frames on a worker thread and poll for finished ones
+            self.frame_scheduler = DeadlineScheduler(self.video_capture.fps)
+            self.frame_analyzer = FrameAnalyzer(self.video_capture, self.analyze_frame,
+                                                scheduler=self.frame_scheduler).start()
+            self.poll_analysis()
 
         except Exception as e:
             self.app.log_event(f"Error starting {self.detection_type} detection dialog: {str(e)}")
             messagebox.showerror("Error", f"Failed to start detection: {str(e)}")
             self.close_dialog()
 
+    def start_camera_worker(self, video_source):
+        """Run capture and analysis of the feed in its own process"""
+        settings = {
+            'threshold': int(self.app.parking_threshold),
+            'processing_scale': getattr(self.app, 'processing_scale', 1.0),
+            'roi_preprocessing': getattr(self.app, 'roi_preprocessing', True),
+            'motion_gating': getattr(self.app, 'motion_gating', True),
+            'line_height': self.app.line_height,
+            'min_contour_width': self.app.min_contour_width,
+            'min_contour_height': self.app.min_contour_height,
+            'offset': self.app.offset,
+            'motion_backend': getattr(self.app, 'motion_backend', None)
+        }
+        pos_list = self.app.posList if self.detection_type == "parking" else []
+
+        self.camera_worker = CameraWorker(self.detection_type, video_source, self.detection_type,
+                                          pos_list, settings).start()
+        self.running = True
+        self.poll_camera_worker()
+
+    def poll_camera_worker(self):
+        """Show the newest frame published by the camera worker (Tk thread only)"""
+        worker = self.camera_worker
+        if not self.running or worker is None:
+            return
+
+        try:
+            start_time = time.time()
+            latest = worker.latest()
+
+            if worker.error is not None:
+                raise RuntimeError(worker.error)
+
+            if latest is None:
+                if worker.ended:
+                    self.app.log_event(f"End of video reached in {self.detection_type} dialog")
+                    self.close_dialog()
+                    return
+            else:
+                frame, info = latest
+                if self.detection_type == "parking":
+                    self.app.free_spaces = info['free']
+                    self.app.occupied_spaces = info['occupied']
+                    self.app.total_spaces = info['total']
+                else:
+                    self.app.vehicle_counter = info['vehicles']
+
+                self.render_frame(frame)
+
+                # Time spent mapping and displaying the frame in this process
+                processing_time = (time.time() - start_time) * 1000
+                self.processing_time_label.config(
+                    text=f"Display: {processing_time:.1f} ms (frame {info['frame_index']}, worker process)")
+
+            self.dialog.after(15, self.poll_camera_worker)
+
+        except Exception as e:
+            self.app.log_event(f"Error in {self.detection_type} camera worker: {str(e)}")
+            messagebox.showerror("Error", f"Error processing video frame: {str(e)}")
+            self.close_dialog()
+
     def close_dialog(self):
         """Close the dialog and release resources"""
         self.running = False
 
-        # Release video capture
-        if self.video_capture:
-            self.video_capture.release()
-            self.video_capture = None
+        # Stop the camera worker process
+        if self.camera_worker is not None:
+            self.camera_worker.stop()
+            self.camera_worker = None
+
+        # Stop the analysis thread before its frame source goes away; a worker still
+        # busy with a frame releases the source itself once it is done
+        capture, self.video_capture = self.video_capture, None
+        if self.frame_analyzer is not None:
+            if not self.frame_analyzer.stop(on_exit=capture.release if capture else None):
+                print("Analysis thread still finishing a frame; the video is released when it is done")
+            self.frame_analyzer = None
+        elif capture is not None:
+            capture.release()
 
         # Destroy dialog
         self.dialog.destroy()
@@ -138,133 +246,151 @@ class DetectionDialog:
         else:
             self.vehicles_label.config(text=f"Vehicles: {vehicle_count}")
 
-    def process_frame(self):
-        """Process a video frame"""
-        if not self.running or not self.video_capture:
-            return
-
-        try:
-            start_time = time.time()
-
-            # Read frame from video
-            ret, img = self.video_capture.read()
+    def analyze_frame(self, img):
+        """Analyze one frame on the FrameAnalyzer worker thread (no Tk calls)"""
+        # Process the frame based on detection type
+        processed_img = None
 
-            # Check if frame was read successfully
-            if not ret:
-                # For video files, this means end of video
-                if isinstance(self.video_source, str) and not self.video_source == "Webcam":
-                    self.app.log_event(f"End of video reached in {self.detection_type} dialog")
-                    self.close_dialog()
-                else:
-                    # For webcam, this could be a temporary error
-                    self.dialog.after(100, self.process_frame)
-                return
-
-            # Process the frame based on detection type
-            processed_img = None
-
-            if self.detection_type == "parking":
-                # Convert to grayscale and blur for processing
-                imgGray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-                imgBlur = cv2.GaussianBlur(imgGray, (3, 3), 1)
-                imgThreshold = cv2.adaptiveThreshold(imgBlur, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                                     cv2.THRESH_BINARY_INV, 25, 16)
-                imgProcessed = cv2.medianBlur(imgThreshold, 5)
-
-                # Apply dilation and erosion to clean up
-                kernel = np.ones((3, 3), np.uint8)
-                imgProcessed = cv2.dilate(imgProcessed, kernel, iterations=1)
-                imgProcessed = cv2.erode(imgProcessed, kernel, iterations=1)
-
-                # Get scaled positions for current frame size
-                scaled_positions = self.app.posList.copy()
-
-                # Process with scaled positions and threshold
-                debug_mode = False
-                processed_small_img, free_spaces, occupied_spaces, total_spaces = process_parking_spaces(
-                    imgProcessed, img.copy(), scaled_positions,
-                    int(self.app.parking_threshold), debug=debug_mode
-                )
-
-                processed_img = processed_small_img
-
-                # Update app state
-                self.app.free_spaces = free_spaces
-                self.app.occupied_spaces = occupied_spaces
-                self.app.total_spaces = total_spaces
-
-                # Update status display
-                self.update_status_info(
-                    total_spaces,
-                    free_spaces,
-                    occupied_spaces
-                )
-
-            elif self.detection_type == "vehicle":
-                # Initialize the frame if needed
-                if self.prev_frame is None or self.frame_count == 0:
-                    self.prev_frame = img.copy()
-                    self.frame_count = 1
-
-                    # Schedule next frame and return
-                    self.dialog.after(30, self.process_frame)
-                    return
+        if self.detection_type == "parking":
+            # Get scaled positions for current frame size
+            scaled_positions = self.app.posList
+            threshold = int(self.app.parking_threshold)
+            engine = self.occupancy_engine
+            engine.set_scale(getattr(self.app, 'processing_scale', 1.0))
+            previous = self.occupancy_result
+
+            # Find the slots whose pixels changed since they were last evaluated
+            changed = None
+            if getattr(self.app, 'motion_gating', True):
+                slots, valid = engine.layout(scaled_positions, img.shape)
+                changed = self.change_detector.changed_slots(img, slots, valid, engine.layout_version)
+
+            if changed is not None and not changed.any() and engine.is_current(previous, threshold):
+                # Static lot: carry every slot forward without preprocessing
+                imgProcessed = None
+                occupancy = engine.carry_forward(previous)
+            else:
+                # Filter only the regions around the (changed) slots unless disabled
+                tiles = None
+                if getattr(self.app, 'roi_preprocessing', True):
+                    slot_mask = changed if engine.is_current(previous, threshold) else None
+                    tiles = engine.roi_tiles(scaled_positions, img.shape, slot_mask)
+
+                # Downscale to the processing resolution (no-op at scale 1.0)
+                small_img = engine.prepare_frame(img)
+
+                # Grayscale, blur, threshold, dilate and erode
+                imgProcessed = self.preprocessor.process(small_img, tiles=tiles)
+
+                # Re-decide the changed slots, carry the others forward
+                occupancy = engine.evaluate(imgProcessed, scaled_positions, threshold,
+                                            changed=changed, previous=previous,
+                                            frame_shape=img.shape)
+            self.occupancy_result = occupancy
+            self.app.occupancy_result = occupancy
+
+            # Process with scaled positions and threshold
+            debug_mode = False
+            processed_small_img, free_spaces, occupied_spaces, total_spaces = process_parking_spaces(
+                imgProcessed, img.copy(), scaled_positions,
+                int(self.app.parking_threshold), debug=debug_mode,
+                result=occupancy, overlay=self.slot_overlay
+            )
+
+            processed_img = processed_small_img
+
+            # Update app state
+            self.app.free_spaces = free_spaces
+            self.app.occupied_spaces = occupied_spaces
+            self.app.total_spaces = total_spaces
+
+        elif self.detection_type == "vehicle":
+            # Initialize the frame if needed (a motion engine keeps its own background instead)
+            if self.motion_engine is None and (self.prev_frame is None or self.frame_count == 0):
+                self.prev_frame = img.copy()
+                self.frame_count = 1
+
+                # Nothing to compare against yet
+                return None
+
+            self.frame_count += 1
+
+            # Use traditional vehicle detection
+            processed_img, new_matches, new_vehicle_counter = detect_vehicles_traditional(
+                img.copy(),
+                self.prev_frame,
+                self.app.line_height,
+                self.app.min_contour_width,
+                self.app.min_contour_height,
+                self.app.offset,
+                self.vehicle_tracks,
+                self.app.vehicle_counter,
+                motion=self.motion_engine
+            )
+
+            # Update app state
+            self.vehicle_tracks = new_matches
+            self.app.vehicle_counter = new_vehicle_counter
+
+            # Update the previous frame for the next iteration (only frame differencing needs it)
+            if self.motion_engine is None:
+                self.prev_frame = img.copy()
 
-                self.frame_count += 1
+        # Use the original image if no processing was done
+        if processed_img is None:
+            processed_img = img.copy()
 
-                # Use traditional vehicle detection
-                processed_img, new_matches, new_vehicle_counter = detect_vehicles_traditional(
-                    img.copy(),
-                    self.prev_frame,
-                    self.app.line_height,
-                    self.app.min_contour_width,
-                    self.app.min_contour_height,
-                    self.app.offset,
-                    self.app.matches.copy() if hasattr(self.app, 'matches') else [],
-                    self.app.vehicle_counter
-                )
+        return processed_img
 
-                # Update app state
-                self.app.matches = new_matches
-                self.app.vehicle_counter = new_vehicle_counter
+    def poll_analysis(self):
+        """Show finished frames from the analysis thread (Tk thread only)"""
+        analyzer = self.frame_analyzer
+        if not self.running or analyzer is None:
+            return
 
-                # Update status display
-                self.update_status_info(vehicle_count=new_vehicle_counter)
+        try:
+            for message in analyzer.pop_messages():
+                self.app.log_event(message)
 
-                # Update the previous frame for the next iteration
-                self.prev_frame = img.copy()
+            if analyzer.error is not None:
+                raise analyzer.error
 
-            # Use the original image if no processing was done
+            processed_img = analyzer.get_latest()
             if processed_img is None:
-                processed_img = img.copy()
+                if analyzer.finished:
+                    # For video files, this means end of video
+                    self.app.log_event(f"End of video reached in {self.detection_type} dialog")
+                    self.close_dialog()
+                    return
+            else:
+                self.render_frame(processed_img)
 
-            # Convert to RGB for display
-            img_rgb = cv2.cvtColor(processed_img, cv2.COLOR_BGR2RGB)
+            self.dialog.after(15, self.poll_analysis)
 
-            # Convert to PIL format
-            img_pil = Image.fromarray(img_rgb)
+        except Exception as e:
+            self.app.log_event(f"Error processing frame in {self.detection_type} dialog: {str(e)}")
+            messagebox.showerror("Error", f"Error processing video frame: {str(e)}")
+            self.close_dialog()
 
-            # Create a new PhotoImage
-            img_tk = ImageTk.PhotoImage(image=img_pil)
+    def render_frame(self, processed_img):
+        """Display a finished frame and refresh the status labels"""
+        # Nothing to draw while the dialog is minimized or above the display rate
+        if not self.display_surface.ready(getattr(self.app, 'display_fps', None)):
+            return
 
-            # Display the image
-            if hasattr(self, 'image_label'):
-                self.image_label.configure(image=img_tk)
-                self.image_label.image = img_tk
-            else:
-                self.image_label = Label(self.video_canvas, image=img_tk)
-                self.image_label.pack(fill=BOTH, expand=True)
-                self.image_label.image = img_tk
+        if self.detection_type == "parking":
+            self.update_status_info(self.app.total_spaces, self.app.free_spaces, self.app.occupied_spaces)
+        else:
+            self.update_status_info(vehicle_count=self.app.vehicle_counter)
 
-            # Calculate and display processing time
-            processing_time = (time.time() - start_time) * 1000  # Convert to ms
-            self.last_processing_time = processing_time
-            self.processing_time_label.config(text=f"Processing: {processing_time:.1f} ms")
+        # Blit into the reused PhotoImage
+        self.display_surface.show(processed_img)
 
-            # Schedule next frame processing
-            self.dialog.after(30, self.process_frame)
+        if self.frame_analyzer is None:
+            return
 
-        except Exception as e:
-            self.app.log_event(f"Error processing frame in {self.detection_type} dialog: {str(e)}")
-            messagebox.showerror("Error", f"Error processing video frame: {str(e)}")
-            self.close_dialog()
\ No newline at end of file
+        # Display the analysis time of the last frame
+        processing_time = self.frame_analyzer.last_analysis_ms
+        self.last_processing_time = processing_time
+        self.processing_time_label.config(
+            text=f"Processing: {processing_time:.1f} ms, {self.frame_scheduler.describe()}")
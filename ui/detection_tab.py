@@ -1,11 +1,17 @@
 from tkinter import *
 from tkinter import ttk, filedialog, messagebox
-from PIL import Image, ImageTk
 import cv2
-import numpy as np
-import time
-from datetime import datetime
+import os
 from utils.video_utils import list_available_videos
+from utils.frame_grabber import FrameGrabber, SamplingPlan
+from models.frame_analyzer import FrameAnalyzer
+from utils.frame_scheduler import DeadlineScheduler
+from utils.video_index import VideoIndexLoader
+from utils.result_cache import layout_key, parking_settings, detector_settings
+from utils.display_surface import DisplaySurface
+from utils.canvas_overlay import CanvasSlotOverlay
+from utils.slot_geometry import same_layout
+from models.motion_engine import MOTION_BACKENDS, create_motion_engine
 from utils.image_processor import process_parking_spaces, detect_vehicles_traditional, process_ml_detections
 from utils.tracker_integration import initialize_tracker, process_ml_detections_with_tracking
 
@@ -32,9 +38,27 @@ class DetectionTab:
         self.video_frame.grid_rowconfigure(0, weight=1)
         self.video_frame.grid_columnconfigure(0, weight=1)
 
+        # Seek bar for recorded videos (enabled once the video index is ready)
+        self.seek_frame = ttk.Frame(self.video_frame)
+        self.seek_frame.pack(side=BOTTOM, fill=X)
+
+        self.seek_var = DoubleVar(value=0.0)
+        self.seek_scale = ttk.Scale(self.seek_frame, from_=0.0, to=1.0, orient=HORIZONTAL,
+                                    variable=self.seek_var, command=self.on_seek_drag)
+        self.seek_scale.pack(side=LEFT, fill=X, expand=True, padx=5, pady=2)
+        self.seek_scale.bind("<ButtonRelease-1>", self.on_seek_release)
+        self.seek_scale.state(["disabled"])
+
+        self.seek_time_label = ttk.Label(self.seek_frame, text="--:-- / --:--")
+        self.seek_time_label.pack(side=RIGHT, padx=5)
+
         self.video_canvas = Canvas(self.video_frame, bg="black")
         self.video_canvas.pack(fill=BOTH, expand=True)
 
+        # One PhotoImage on the canvas, updated in place and scaled to fit it
+        self.display_surface = DisplaySurface(self.video_canvas)
+        self.canvas_overlay = CanvasSlotOverlay(self.video_canvas)
+
         # Settings panel frame
         self.settings_frame = ttk.Frame(self.main_frame)
         self.settings_frame.grid(row=0, column=1, sticky=NSEW, padx=5, pady=5)
@@ -103,6 +127,18 @@ class DetectionTab:
         ttk.Button(self.video_source_frame, text="Browse...",
                    command=self.browse_video).pack(side=LEFT, padx=5)
 
+        # Display rate (frames that are neither shown nor analyzed are not decoded)
+        display_rate_frame = ttk.Frame(self.settings_frame)
+        display_rate_frame.pack(fill=X, padx=10, pady=5)
+
+        ttk.Label(display_rate_frame, text="Display Rate:").pack(side=LEFT)
+        self.display_rate_var = StringVar(value="Source")
+        display_rate_dropdown = ttk.Combobox(display_rate_frame, textvariable=self.display_rate_var,
+                                             values=["Source", "15", "10", "5"], state="readonly", width=8)
+        display_rate_dropdown.pack(side=LEFT, padx=5)
+        display_rate_dropdown.bind("<<ComboboxSelected>>", self.on_display_rate_change)
+        ttk.Label(display_rate_frame, text="fps").pack(side=LEFT)
+
         # Start/Stop detection
         self.detection_button_frame = ttk.Frame(self.settings_frame)
         self.detection_button_frame.pack(fill=X, padx=10, pady=5)
@@ -147,6 +183,57 @@ class DetectionTab:
         ttk.Radiobutton(debug_frame, text="On", variable=self.debug_var, value="On").pack(side=LEFT)
         ttk.Radiobutton(debug_frame, text="Off", variable=self.debug_var, value="Off").pack(side=LEFT)
 
+        # ROI preprocessing
+        roi_frame = ttk.Frame(self.parking_settings_frame)
+        roi_frame.pack(fill=X, padx=5, pady=5)
+
+        self.roi_var = BooleanVar(value=self.app.roi_preprocessing)
+        ttk.Checkbutton(roi_frame, text="Process slot regions only",
+                        variable=self.roi_var, command=self.on_roi_toggle).pack(side=LEFT)
+
+        # Motion gating
+        gating_frame = ttk.Frame(self.parking_settings_frame)
+        gating_frame.pack(fill=X, padx=5, pady=5)
+
+        self.gating_var = BooleanVar(value=self.app.motion_gating)
+        ttk.Checkbutton(gating_frame, text="Re-evaluate changed slots only",
+                        variable=self.gating_var, command=self.on_gating_toggle).pack(side=LEFT)
+
+        # Adaptive sampling rate
+        sampling_frame = ttk.Frame(self.parking_settings_frame)
+        sampling_frame.pack(fill=X, padx=5, pady=5)
+
+        self.sampling_var = BooleanVar(value=self.app.adaptive_sampling)
+        ttk.Checkbutton(sampling_frame, text="Slow down when the lot is quiet",
+                        variable=self.sampling_var, command=self.on_sampling_toggle).pack(side=LEFT)
+
+        # Result cache for replays
+        cache_frame = ttk.Frame(self.parking_settings_frame)
+        cache_frame.pack(fill=X, padx=5, pady=5)
+
+        self.cache_var = BooleanVar(value=self.app.result_caching)
+        ttk.Checkbutton(cache_frame, text="Reuse cached results for replays",
+                        variable=self.cache_var, command=self.on_cache_toggle).pack(side=LEFT)
+
+        # Slot annotations as canvas items
+        canvas_overlay_frame = ttk.Frame(self.parking_settings_frame)
+        canvas_overlay_frame.pack(fill=X, padx=5, pady=5)
+
+        self.canvas_overlay_var = BooleanVar(value=self.app.canvas_overlays)
+        ttk.Checkbutton(canvas_overlay_frame, text="Draw slot overlays on the canvas",
+                        variable=self.canvas_overlay_var, command=self.on_canvas_overlay_toggle).pack(side=LEFT)
+
+        # Processing resolution
+        scale_frame = ttk.Frame(self.parking_settings_frame)
+        scale_frame.pack(fill=X, padx=5, pady=5)
+
+        ttk.Label(scale_frame, text="Processing Scale:").pack(side=LEFT)
+        self.scale_var = StringVar(value=str(self.app.processing_scale))
+        scale_dropdown = ttk.Combobox(scale_frame, textvariable=self.scale_var,
+                                      values=["1.0", "0.75", "0.5"], state="readonly", width=6)
+        scale_dropdown.pack(side=LEFT, padx=5)
+        scale_dropdown.bind("<<ComboboxSelected>>", self.on_scale_change)
+
         # Vehicle detection settings
         self.vehicle_settings_frame = ttk.LabelFrame(self.settings_frame,
                                                      text="Vehicle Detection Settings")
@@ -208,6 +295,17 @@ class DetectionTab:
         # Set up trace for live updates while dragging
         self.offset_var.trace_add("write", self.update_offset_display)
 
+        # Motion source for the traditional counter
+        motion_frame = ttk.Frame(self.vehicle_settings_frame)
+        motion_frame.pack(fill=X, padx=5, pady=5)
+
+        ttk.Label(motion_frame, text="Motion:").pack(side=LEFT)
+        self.motion_var = StringVar(value=self.app.motion_backend)
+        motion_dropdown = ttk.Combobox(motion_frame, textvariable=self.motion_var,
+                                       values=list(MOTION_BACKENDS), state="readonly", width=16)
+        motion_dropdown.pack(side=LEFT, padx=5)
+        motion_dropdown.bind("<<ComboboxSelected>>", self.on_motion_backend_change)
+
         # Reset counter button
         reset_frame = ttk.Frame(self.vehicle_settings_frame)
         reset_frame.pack(fill=X, padx=5, pady=5)
@@ -288,6 +386,9 @@ class DetectionTab:
         self.vehicles_label = ttk.Label(status_frame, text="Vehicles Counted: 0")
         self.vehicles_label.pack(anchor=W, padx=5, pady=2)
 
+        self.rate_label = ttk.Label(status_frame, text="Evaluation Rate: -")
+        self.rate_label.pack(anchor=W, padx=5, pady=2)
+
         # ML status label
         self.ml_status_label = ttk.Label(status_frame, text="ML Detection: Disabled",
                                          foreground="grey")
@@ -297,12 +398,32 @@ class DetectionTab:
         self.processing_time_label = ttk.Label(status_frame, text="Processing: 0 ms")
         self.processing_time_label.pack(anchor=W, padx=5, pady=2)
 
+        # Per-step parking preprocessing time
+        self.preprocess_time_label = ttk.Label(status_frame, text="Preprocessing: -")
+        self.preprocess_time_label.pack(anchor=W, padx=5, pady=2)
+
   
         # Initialize video settings
         self.running = False
         self.video_capture = None
+        self.frame_analyzer = None
+        self._stopping_analyzer = None  # Stopped analyzer whose worker was still busy
+        self.frame_scheduler = None
+        self.sampling_plan = None
+        self.index_loader = None
+        self.video_index = None
+        self._seeking = False
+        self.cached_video = None  # Video file whose results go through the result cache
+        self._layout_key = (None, None)  # (engine layout version, layout hash)
+
+        # Tk settings snapshot read by the analysis thread
+        self._debug_mode = False
+        self._ml_method = "Faster R-CNN"
+        self._positions = []  # Copy of app.posList, refreshed on the Tk thread
+        self._frame_size_request = None  # Frame size seen by the worker, applied on the Tk thread
         self.prev_frame = None
         self.frame_count = 0
+        self._reset_requested = False  # Set on the Tk thread, handled by the worker before its next frame
         self.frame_skip = 2
         self.last_processing_time = 0
 
@@ -382,6 +503,14 @@ class DetectionTab:
                                              fill=X, padx=10, pady=5, expand=False)
             self.parking_settings_frame.pack_forget()
 
+    def on_display_rate_change(self, event=None):
+        """Change how many frames per second are decoded and rendered for display"""
+        rate = self.display_rate_var.get()
+        self.app.display_fps = None if rate == "Source" else float(rate)
+        if self.sampling_plan is not None and self.video_capture is not None:
+            self.sampling_plan.set_display_rate(self.app.display_fps, self.video_capture.fps)
+        self.app.log_event(f"Display rate set to {rate}")
+
     def on_video_source_change(self, event=None):
         """Handle video source change"""
         if self.running:
@@ -423,6 +552,53 @@ class DetectionTab:
         else:
             self.stop_detection()
 
+    def on_roi_toggle(self):
+        """Switch between slot-region and full-frame preprocessing"""
+        self.app.roi_preprocessing = self.roi_var.get()
+        mode = "slot regions only" if self.app.roi_preprocessing else "full frame"
+        self.app.log_event(f"Parking preprocessing set to {mode}")
+
+    def on_gating_toggle(self):
+        """Switch motion-gated slot re-evaluation on or off"""
+        self.app.motion_gating = self.gating_var.get()
+        self.app.change_detector.reset()
+        state = "enabled" if self.app.motion_gating else "disabled"
+        self.app.log_event(f"Motion-gated slot re-evaluation {state}")
+
+    def on_sampling_toggle(self):
+        """Switch the activity-driven occupancy sampling rate on or off"""
+        self.app.adaptive_sampling = self.sampling_var.get()
+        self.app.rate_controller.reset()
+        state = "enabled" if self.app.adaptive_sampling else "disabled"
+        self.app.log_event(f"Adaptive occupancy sampling {state}")
+
+    def on_cache_toggle(self):
+        """Switch replaying from the result cache on or off"""
+        self.app.result_caching = self.cache_var.get()
+        state = "enabled" if self.app.result_caching else "disabled"
+        self.app.log_event(f"Result cache {state} (takes effect on the next start)")
+
+    def on_canvas_overlay_toggle(self):
+        """Switch between canvas item and burned-in slot annotations"""
+        self.app.canvas_overlays = self.canvas_overlay_var.get()
+        if not self.app.canvas_overlays:
+            self.canvas_overlay.clear()
+        mode = "canvas items" if self.app.canvas_overlays else "drawn into the frame"
+        self.app.log_event(f"Slot overlays {mode}")
+
+    def on_motion_backend_change(self, event=None):
+        """Switch between frame differencing and a background-subtraction model"""
+        self.app.motion_backend = self.motion_var.get()
+        self.app.motion_engine = create_motion_engine(self.app.motion_backend)
+        self.app.log_event(f"Vehicle motion source set to {self.app.motion_backend}")
+
+    def on_scale_change(self, event=None):
+        """Change the resolution the parking pipeline runs at"""
+        self.app.processing_scale = float(self.scale_var.get())
+        self.app.occupancy_engine.set_scale(self.app.processing_scale)
+        self.app.change_detector.reset()
+        self.app.log_event(f"Parking processing scale set to {self.app.processing_scale:g}")
+
     def toggle_simultaneous_mode(self):
         """Toggle simultaneous detection mode"""
         simultaneous_enabled = self.simultaneous_var.get()
@@ -458,7 +634,7 @@ class DetectionTab:
         """Open a dialog to select video sources for parking and vehicle detection"""
         selection_dialog = Toplevel(self.parent)
         selection_dialog.title("Select Video Sources")
-        selection_dialog.geometry("400x300")
+        selection_dialog.geometry("400x330")
         selection_dialog.grab_set()  # Make dialog modal
 
         # Create frames
@@ -495,6 +671,11 @@ class DetectionTab:
         ttk.Button(vehicle_frame, text="Browse...",
                    command=lambda: self.browse_video_for_dialog(vehicle_combobox)).pack(pady=5)
 
+        # Run every feed in its own worker process
+        process_var = BooleanVar(value=True)
+        ttk.Checkbutton(main_frame, text="Run each feed in its own process",
+                        variable=process_var).pack(anchor=W)
+
         # Buttons
         button_frame = ttk.Frame(main_frame)
         button_frame.pack(fill=X, pady=10)
@@ -506,7 +687,8 @@ class DetectionTab:
                    command=lambda: self.start_simultaneous_detection(
                        parking_source_var.get(),
                        vehicle_source_var.get(),
-                       selection_dialog
+                       selection_dialog,
+                       process_var.get()
                    )).pack(side=RIGHT, padx=5)
 
     def browse_video_for_dialog(self, combobox):
@@ -536,7 +718,7 @@ class DetectionTab:
         self.simultaneous_var.set(False)
         dialog.destroy()
 
-    def start_simultaneous_detection(self, parking_source, vehicle_source, dialog):
+    def start_simultaneous_detection(self, parking_source, vehicle_source, dialog, use_processes=False):
         """Start the simultaneous detection in separate windows"""
         from ui.detection_dialog import DetectionDialog
 
@@ -547,8 +729,10 @@ class DetectionTab:
                 return
 
             # Create the detection dialogs
-            self.parking_dialog = DetectionDialog(self.parent, self.app, "parking", parking_source)
-            self.vehicle_dialog = DetectionDialog(self.parent, self.app, "vehicle", vehicle_source)
+            self.parking_dialog = DetectionDialog(self.parent, self.app, "parking", parking_source,
+                                                  use_process=use_processes)
+            self.vehicle_dialog = DetectionDialog(self.parent, self.app, "vehicle", vehicle_source,
+                                                  use_process=use_processes)
 
             # Close the selection dialog
             dialog.destroy()
@@ -578,6 +762,14 @@ class DetectionTab:
     def start_detection(self):
         """Start video detection"""
         try:
+            # Never run two analysis threads on the shared detection state
+            if self._stopping_analyzer is not None:
+                if not self._stopping_analyzer.stop():
+                    messagebox.showwarning("Busy", "The previous analysis is still finishing a frame. "
+                                                   "Try again in a moment.")
+                    return
+                self._stopping_analyzer = None
+
             # Get selected video source
             video_source = self.video_source_var.get()
 
@@ -585,20 +777,47 @@ class DetectionTab:
             if video_source == "Webcam":
                 video_source = 0
 
-            # Open video capture
-            self.video_capture = cv2.VideoCapture(video_source)
+            # Open video capture, decoded on a reader thread into a small buffer;
+            # frames the sampling plan does not need are skipped without decoding
+            self.sampling_plan = SamplingPlan()
+            self.video_capture = FrameGrabber(video_source, plan=self.sampling_plan)
+            self.sampling_plan.set_display_rate(self.app.display_fps, self.video_capture.fps)
 
             # Check if opened successfully
             if not self.video_capture.isOpened():
                 messagebox.showerror("Error", f"Failed to open video source: {video_source}")
+                self.video_capture.release()
+                self.video_capture = None
                 return
+            self.video_capture.start()
+
+            # Scale the slots to the video before the worker sees the first frame
+            width = int(self.video_capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(self.video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            if width > 0 and height > 0:
+                self._frame_size_request = (width, height)
+            self.sync_frame_size()
 
             # Update UI
             self.running = True
             self.detection_button_var.set("Stop Detection")
 
-            # Start frame processing
-            self.process_frame()
+            # Analyze frames on a worker thread and poll for finished ones
+            self._debug_mode = self.debug_var.get() == "On"
+            self._ml_method = self.ml_method_var.get()
+            self.frame_scheduler = DeadlineScheduler(self.video_capture.fps)
+            self.frame_analyzer = FrameAnalyzer(self.video_capture, self.analyze_frame,
+                                                scheduler=self.frame_scheduler).start()
+
+            # Index recorded videos in the background for seeking
+            if isinstance(video_source, str) and os.path.isfile(video_source):
+                self.index_loader = VideoIndexLoader(video_source).start()
+
+                # Serve frames analyzed before from the result cache
+                if self.app.result_caching:
+                    self.cached_video = video_source
+
+            self.poll_analysis()
 
             # Update app current video
             self.app.current_video = video_source
@@ -617,6 +836,9 @@ class DetectionTab:
                     self.app.current_reference_image = ref_image
                     self.app.load_parking_positions(ref_image)
 
+            # Hand the loaded slots to the worker
+            self.sync_frame_size()
+
         except Exception as e:
             self.app.log_event(f"Error starting detection: {str(e)}")
             messagebox.showerror("Error", f"Failed to start detection: {str(e)}")
@@ -626,17 +848,70 @@ class DetectionTab:
         self.running = False
         self.detection_button_var.set("Start Detection")
 
-        # Release video capture
-        if self.video_capture:
-            self.video_capture.release()
-            self.video_capture = None
-
-        # Clear previous frame
+        # Stop the analysis thread before its frame source goes away; a worker still
+        # busy with a frame releases the source itself once it is done
+        capture, self.video_capture = self.video_capture, None
+        if self.frame_analyzer is not None:
+            if not self.frame_analyzer.stop(on_exit=capture.release if capture else None):
+                self._stopping_analyzer = self.frame_analyzer
+                self._reset_requested = True
+                self.app.log_event("Analysis still finishing a frame; the video is released when it is done")
+            self.frame_analyzer = None
+        elif capture is not None:
+            capture.release()
+
+        # Write out cached results
+        if self.cached_video is not None:
+            self.cached_video = None
+            self.app.result_cache.flush()
+            self.app.log_event(f"Result cache: {self.app.result_cache.describe()}")
+
+        # Remove canvas slot overlays
+        self.canvas_overlay.clear()
+
+        # Drop the seek bar
+        if self.index_loader is not None:
+            self.index_loader.cancel()
+            self.index_loader = None
+        self.video_index = None
+        self.seek_scale.state(["disabled"])
+        self.seek_var.set(0.0)
+        self.seek_time_label.config(text="--:-- / --:--")
+
+        # Clear previous frame, the learned background and the vehicles in view
+        # (left to the next analysis run if the worker is still busy)
+        if not self._reset_requested:
+            self.reset_motion_state()
+
+    def reset_motion_state(self):
+        """Clear the previous frame, the learned background, the vehicles in view and the frame count"""
+        self._reset_requested = False
         self.prev_frame = None
-
-        # Reset frame count
+        if self.app.motion_engine is not None:
+            self.app.motion_engine.reset()
+        self.app.matches.reset()
         self.frame_count = 0
 
+    def sync_frame_size(self):
+        """
+        Apply a frame size reported by the worker and refresh its slot snapshot (Tk thread only)
+
+        Rescaling replaces app.posList and logs to the Log tab, so it cannot run
+        on the analysis thread; the worker only records the size it saw.
+        """
+        size = self._frame_size_request
+        if size is not None:
+            self._frame_size_request = None
+            if size != (self.app.image_width, self.app.image_height):
+                self.app.image_width, self.app.image_height = size
+
+                # Scale parking positions if needed (only for parking detection)
+                if self.app.detection_mode == "parking":
+                    self.app.scale_positions_to_current_dimensions()
+
+        if not same_layout(self.app.posList, self._positions):
+            self._positions = list(self.app.posList)
+
     def update_threshold(self, event=None):
         """Update parking threshold value"""
         self.app.parking_threshold = self.threshold_var.get()
@@ -658,7 +933,7 @@ class DetectionTab:
     def reset_counter(self):
         """Reset vehicle counter"""
         self.app.vehicle_counter = 0
-        self.app.matches = []
+        self.app.matches.reset()
         if hasattr(self.app, 'vehicle_tracker') and self.app.vehicle_tracker:
             self.app.vehicle_tracker.reset_count()
         self.update_status_info(
@@ -729,181 +1004,221 @@ class DetectionTab:
         self.occupied_label.config(text=f"Occupied Spaces: {occupied_spaces}")
         self.vehicles_label.config(text=f"Vehicles Counted: {vehicle_count}")
 
-        # Update process_frame method (around line 573)
-
-    def process_frame(self):
-        """Process a video frame"""
-        if not self.running or not self.video_capture:
-            return
-
-        try:
-            start_time = time.time()
-
-            # Read frame from video
-            ret, img = self.video_capture.read()
-
-            # Check if frame was read successfully
-            if not ret:
-                # For video files, this means end of video
-                if isinstance(self.video_source_var.get(), str) and not self.video_source_var.get() == "Webcam":
-                    self.app.log_event("End of video reached")
-                    self.stop_detection()
-                else:
-                    # For webcam, this could be a temporary error
-                    self.parent.after(100, self.process_frame)
-                return
-
-            # Resize frame for display if needed
-            original_height, original_width = img.shape[:2]
-            if original_width != self.app.image_width or original_height != self.app.image_height:
-                self.app.image_width = original_width
-                self.app.image_height = original_height
-
-                # Scale parking positions if needed (only for parking detection)
-                if self.app.detection_mode == "parking":
-                    self.app.scale_positions_to_current_dimensions()
-
-            # Process the frame based on detection mode
-            processed_img = None
-
-            # Ensure dimensions are correctly updated before scaling
-            if self.app.current_reference_image in self.app.reference_dimensions:
-                ref_width, ref_height = self.app.reference_dimensions[self.app.current_reference_image]
-                if ref_width != original_width or ref_height != original_height:
-                    self.app.log_event(
-                        f"Updating dimensions from {ref_width}x{ref_height} to {original_width}x{original_height}")
-
-            if self.app.detection_mode == "parking":
-                # Convert to grayscale and blur for processing
-                imgGray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-                imgBlur = cv2.GaussianBlur(imgGray, (3, 3), 1)
-                imgThreshold = cv2.adaptiveThreshold(imgBlur, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                                     cv2.THRESH_BINARY_INV, 25, 16)
-                imgProcessed = cv2.medianBlur(imgThreshold, 5)
-
-                # Apply dilation and erosion to clean up
-                kernel = np.ones((3, 3), np.uint8)
-                imgProcessed = cv2.dilate(imgProcessed, kernel, iterations=1)
-                imgProcessed = cv2.erode(imgProcessed, kernel, iterations=1)
-
-                # Get scaled positions for current frame size
-                scaled_positions = self.app.posList.copy()
-
-                # Get image dimensions to compute scale factors
-                img_height, img_width = img.shape[:2]
-
-                # Calculate scale factors if using small processing image
-                processing_img = img.copy()
-                width_scale = 1.0
-                height_scale = 1.0
-
-                # Process with scaled positions and threshold
-                debug_mode = hasattr(self, 'debug_var') and self.debug_var.get() == "On"
-                processed_small_img, free_spaces, occupied_spaces, total_spaces = process_parking_spaces(
-                    imgProcessed, processing_img.copy(), scaled_positions,
-                    int(self.app.parking_threshold * width_scale), debug=debug_mode
+        # Current occupancy evaluation rate
+        if self.app.detection_mode == "parking" and self.app.adaptive_sampling:
+            self.rate_label.config(text=f"Evaluation Rate: {self.app.rate_controller.describe()}")
+        else:
+            self.rate_label.config(text="Evaluation Rate: every frame")
+
+    def analyze_frame(self, img):
+        """
+        Analyze one frame on the FrameAnalyzer worker thread
+
+        Must not touch Tk widgets or variables: settings come from the snapshot
+        taken in poll_analysis and log messages go through log_from_worker.
+
+        Returns:
+            Frame to display, or None
+        """
+        # stop_detection may drop the source while this frame is still being analyzed
+        source = self.video_capture
+        if source is None:
+            return None
+
+        # Apply a seek or stop requested on the Tk thread before touching the motion state
+        if self._reset_requested:
+            self.reset_motion_state()
+
+        # A new frame size is applied (and the slots rescaled) by poll_analysis
+        original_height, original_width = img.shape[:2]
+        if original_width != self.app.image_width or original_height != self.app.image_height:
+            self._frame_size_request = (original_width, original_height)
+
+        # Process the frame based on detection mode
+        processed_img = None
+
+        # Ensure dimensions are correctly updated before scaling
+        if self.app.current_reference_image in self.app.reference_dimensions:
+            ref_width, ref_height = self.app.reference_dimensions[self.app.current_reference_image]
+            if ref_width != original_width or ref_height != original_height:
+                self.log_from_worker(
+                    f"Updating dimensions from {ref_width}x{ref_height} to {original_width}x{original_height}")
+
+        if self.app.detection_mode == "parking":
+            # Every decoded frame is evaluated (carrying forward is cheap)
+            self.sampling_plan.analysis_every = self.sampling_plan.display_every
+
+            # Get scaled positions for current frame size
+            scaled_positions = self._positions
+            threshold = int(self.app.parking_threshold)
+            engine = self.app.occupancy_engine
+            engine.set_scale(self.app.processing_scale)
+            previous = self.app.occupancy_result
+
+            # Replays read the frame's result from the cache
+            cached = None
+            cache = self.bind_result_cache(parking_settings(
+                threshold, self.current_layout_key(scaled_positions, img.shape), engine.scale,
+                self.app.motion_gating, self.app.adaptive_sampling))
+            if cache is not None:
+                cached = cache.get_slots(source.frame_index, len(scaled_positions))
+
+            # Lower the evaluation rate while the scene is quiet
+            sample = True
+            if self.app.adaptive_sampling and cached is None:
+                sample = self.app.rate_controller.should_evaluate(img)
+
+            # Find the slots whose pixels changed since they were last evaluated
+            changed = None
+            if cached is None and sample and self.app.motion_gating:
+                slots, valid = engine.layout(scaled_positions, img.shape)
+                changed = self.app.change_detector.changed_slots(img, slots, valid, engine.layout_version)
+
+            if cached is not None:
+                imgProcessed = None
+                occupancy = engine.restore(scaled_positions, img.shape, cached[0], cached[1], threshold)
+            elif engine.is_current(previous, threshold) and (
+                    not sample or (changed is not None and not changed.any())):
+                # Skipped frame or static lot: carry every slot forward without preprocessing
+                imgProcessed = None
+                occupancy = engine.carry_forward(previous)
+            else:
+                # Filter only the regions around the (changed) slots unless disabled
+                tiles = None
+                if self.app.roi_preprocessing:
+                    slot_mask = changed if engine.is_current(previous, threshold) else None
+                    tiles = engine.roi_tiles(scaled_positions, img.shape, slot_mask)
+
+                # Downscale to the processing resolution (no-op at scale 1.0)
+                small_img = engine.prepare_frame(img)
+
+                # Grayscale, blur, threshold, dilate and erode
+                imgProcessed = self.app.parking_preprocessor.process(small_img, tiles=tiles)
+
+                # Re-decide the changed slots, carry the others forward; the
+                # engine scales slots and threshold to the processing size
+                occupancy = engine.evaluate(imgProcessed, scaled_positions, threshold,
+                                            changed=changed, previous=previous,
+                                            frame_shape=img.shape)
+
+            # Only evaluated frames are cached: which frames adaptive sampling skips
+            # depends on timing, so their carried-forward states are not reproducible
+            if cache is not None and cached is None and sample:
+                cache.put_slots(source.frame_index, occupancy.counts, occupancy.free)
+            self.app.occupancy_result = occupancy
+
+            debug_mode = self._debug_mode
+            if self.app.canvas_overlays and not debug_mode:
+                # The raw frame goes to the display; render_frame adds the canvas items
+                processed_img = img
+                free_spaces = occupancy.free_spaces
+                occupied_spaces = occupancy.occupied_spaces
+                total_spaces = occupancy.total_spaces
+            else:
+                # Draw the result on the full-resolution frame
+                processed_img, free_spaces, occupied_spaces, total_spaces = process_parking_spaces(
+                    imgProcessed, img.copy(), scaled_positions,
+                    threshold, debug=debug_mode,
+                    result=occupancy, overlay=self.app.slot_overlay
                 )
 
-                # Scale back up for display if needed
-                processed_img = cv2.resize(processed_small_img, (self.app.image_width, self.app.image_height))
-
-                # Update app state
-                self.app.free_spaces = free_spaces
-                self.app.occupied_spaces = occupied_spaces
-                self.app.total_spaces = total_spaces
-
-                # Update allocation data
-                self.update_parking_data_for_allocation(imgProcessed)
+            # Update app state
+            self.app.free_spaces = free_spaces
+            self.app.occupied_spaces = occupied_spaces
+            self.app.total_spaces = total_spaces
+
+            # Update allocation data
+            self.update_parking_data_for_allocation(occupancy)
+
+        elif self.app.detection_mode == "vehicle":
+            # Initialize the frame if needed (a motion engine keeps its own background instead)
+            motion = self.app.motion_engine
+            if motion is None and (self.prev_frame is None or self.frame_count == 0):
+                self.prev_frame = img.copy()
+                self.frame_count = 1
+
+                # Nothing to compare against yet
+                return None
+
+            self.frame_count += 1
+
+            # Adjust frame skip rate for vehicle detection
+            self.frame_skip = 8 if self.app.use_ml_detection else 4
+
+            # Only frame_skip-th frames need decoding for sampled ML detection
+            sampled_ml = (self.app.use_ml_detection and self.app.ml_detector and
+                          self._ml_method != "YOLO + DeepSORT")
+            self.sampling_plan.analysis_every = self.frame_skip if sampled_ml else 1
+
+            # Check if we should use ML detection
+            if self.app.use_ml_detection and self.app.ml_detector:
+                try:
+                    # Check if we're using YOLO + DeepSORT
+                    if self._ml_method == "YOLO + DeepSORT" and hasattr(self.app, 'vehicle_tracker'):
+                        # Process with tracking
+                        processed_img, new_matches, new_vehicle_counter = process_ml_detections_with_tracking(
+                            img.copy(),
+                            self.app.vehicle_tracker,
+                            self.app.line_height,
+                            self.app.offset,
+                            self.app.vehicle_counter,
+                            self.app.ml_detector.classes if hasattr(self.app.ml_detector, 'classes') else []
+                        )
 
-            elif self.app.detection_mode == "vehicle":
-                # Initialize the frame if needed
-                if self.prev_frame is None or self.frame_count == 0:
-                    self.prev_frame = img.copy()
-                    self.frame_count = 1
+                        # Update app state (DeepSORT keeps its own tracks)
+                        new_matches = self.app.matches
+                        self.app.vehicle_counter = new_vehicle_counter
 
-                    # Schedule next frame and return
-                    self.parent.after(30, self.process_frame)
-                    return
+                        # Update the processed image
+                        img = processed_img
+                    else:
+                        # Only run ML detection on certain frames to improve performance
+                        if source.for_analysis:
+                            # Use cached detections on replays, otherwise our safe detection method
+                            cache = self.bind_result_cache(detector_settings(
+                                self._ml_method, self.app.ml_confidence, (original_width, original_height)))
+                            detections = None
+                            if cache is not None:
+                                detections = cache.get_detections(source.frame_index)
+                            if detections is None:
+                                detections = self.safe_ml_detection(img)
+                                if cache is not None:
+                                    cache.put_detections(source.frame_index, detections)
 
-                self.frame_count += 1
-
-                # Adjust frame skip rate for vehicle detection
-                self.frame_skip = 8 if self.app.use_ml_detection else 4
-
-                # Check if we should use ML detection
-                if self.app.use_ml_detection and self.app.ml_detector:
-                    try:
-                        # Check if we're using YOLO + DeepSORT
-                        ml_method = getattr(self, 'ml_method_var', None)
-                        if ml_method and ml_method.get() == "YOLO + DeepSORT" and hasattr(self.app, 'vehicle_tracker'):
-                            # Process with tracking
-                            processed_img, new_matches, new_vehicle_counter = process_ml_detections_with_tracking(
-                                img.copy(),
-                                self.app.vehicle_tracker,
-                                self.app.line_height,
-                                self.app.offset,
-                                self.app.vehicle_counter,
-                                self.app.ml_detector.classes if hasattr(self.app.ml_detector, 'classes') else []
-                            )
-
-                            # Update app state
-                            self.app.matches = new_matches
-                            self.app.vehicle_counter = new_vehicle_counter
-
-                            # Update the processed image
-                            img = processed_img
+                            # Store for use in skipped frames
+                            self.last_detections = detections
                         else:
-                            # Only run ML detection on certain frames to improve performance
-                            if self.frame_count % self.frame_skip == 0:
-                                # Use our safe detection method
-                                detections = self.safe_ml_detection(img)
+                            # Use the last known detections for in-between frames
+                            detections = self.last_detections if hasattr(self,
+                                                                         'last_detections') and self.last_detections is not None else []
+
+                        # Check if we have valid detections to process
+                        if not isinstance(detections, list):
+                            raise TypeError(f"Expected list of detections but got {type(detections)}")
 
-                                # Store for use in skipped frames
-                                self.last_detections = detections
-                            else:
-                                # Use the last known detections for in-between frames
-                                detections = self.last_detections if hasattr(self,
-                                                                             'last_detections') and self.last_detections is not None else []
-
-                            # Check if we have valid detections to process
-                            if not isinstance(detections, list):
-                                raise TypeError(f"Expected list of detections but got {type(detections)}")
-
-                            # Process the ML detections
-                            processed_img, new_matches, new_vehicle_counter = process_ml_detections(
-                                img.copy(),
-                                detections,
-                                self.app.line_height,
-                                self.app.offset,
-                                self.app.matches,
-                                self.app.vehicle_counter,
-                                self.app.ml_detector.classes if hasattr(self.app.ml_detector, 'classes') else []
-                            )
-
-                            # Update app state
-                            self.app.matches = new_matches
-                            self.app.vehicle_counter = new_vehicle_counter
-
-                            # Update the processed image
-                            img = processed_img
-
-                    except Exception as e:
-                        print(f"ML detection error: {str(e)}")
-                        self.app.log_event(f"ML detection error: {str(e)}")
-
-                        # Fallback to traditional method
-                        processed_img, new_matches, new_vehicle_counter = detect_vehicles_traditional(
+                        # Process the ML detections
+                        processed_img, new_matches, new_vehicle_counter = process_ml_detections(
                             img.copy(),
-                            self.prev_frame,
+                            detections,
                             self.app.line_height,
-                            self.app.min_contour_width,
-                            self.app.min_contour_height,
                             self.app.offset,
                             self.app.matches,
-                            self.app.vehicle_counter
+                            self.app.vehicle_counter,
+                            self.app.ml_detector.classes if hasattr(self.app.ml_detector, 'classes') else []
                         )
-                else:
-                    # Use traditional vehicle detection
+
+                        # Update app state
+                        self.app.matches = new_matches
+                        self.app.vehicle_counter = new_vehicle_counter
+
+                        # Update the processed image
+                        img = processed_img
+
+                except Exception as e:
+                    print(f"ML detection error: {str(e)}")
+                    self.log_from_worker(f"ML detection error: {str(e)}")
+
+                    # Fallback to traditional method
                     processed_img, new_matches, new_vehicle_counter = detect_vehicles_traditional(
                         img.copy(),
                         self.prev_frame,
@@ -912,123 +1227,220 @@ class DetectionTab:
                         self.app.min_contour_height,
                         self.app.offset,
                         self.app.matches,
-                        self.app.vehicle_counter
+                        self.app.vehicle_counter,
+                        motion=motion
                     )
+            else:
+                # Use traditional vehicle detection
+                processed_img, new_matches, new_vehicle_counter = detect_vehicles_traditional(
+                    img.copy(),
+                    self.prev_frame,
+                    self.app.line_height,
+                    self.app.min_contour_width,
+                    self.app.min_contour_height,
+                    self.app.offset,
+                    self.app.matches,
+                    self.app.vehicle_counter,
+                    motion=motion
+                )
 
-                # Update app state
-                self.app.matches = new_matches
-                self.app.vehicle_counter = new_vehicle_counter
+            # Update app state
+            self.app.matches = new_matches
+            self.app.vehicle_counter = new_vehicle_counter
 
-            # Use the original image if no processing was done
-            if processed_img is None:
-                processed_img = img.copy()
+        # Use the original image if no processing was done
+        if processed_img is None:
+            processed_img = img.copy()
 
-            # Update the previous frame for the next iteration
+        # Update the previous frame for the next iteration (only frame differencing needs it)
+        if self.app.detection_mode == "vehicle" and self.app.motion_engine is None:
             self.prev_frame = img.copy()
+        else:
+            self.prev_frame = None
 
-            # Convert to RGB for display
-            img_rgb = cv2.cvtColor(processed_img, cv2.COLOR_BGR2RGB)
+        return processed_img
 
-            # Convert to PIL format
-            img_pil = Image.fromarray(img_rgb)
+    def bind_result_cache(self, settings):
+        """Point the result cache at the current video and settings; None when caching is off"""
+        if self.cached_video is None:
+            return None
 
-            # Reuse ImageTk object if possible
-            if not hasattr(self, 'img_tk') or self.img_tk is None:
-                self.img_tk = ImageTk.PhotoImage(image=img_pil)
-            else:
-                # Create a new PhotoImage (can't update existing one)
-                self.img_tk = ImageTk.PhotoImage(image=img_pil)
+        try:
+            self.app.result_cache.bind(self.cached_video, settings)
+            return self.app.result_cache
+        except Exception as e:
+            self.log_from_worker(f"Result cache disabled: {str(e)}")
+            self.cached_video = None
+            return None
+
+    def current_layout_key(self, positions, frame_shape):
+        """Hash of the slot layout, recomputed only when the engine's layout changes"""
+        engine = self.app.occupancy_engine
+        engine.layout(positions, frame_shape)
+        version, key = self._layout_key
+        if version != engine.layout_version:
+            key = layout_key(positions)
+            self._layout_key = (engine.layout_version, key)
+        return key
+
+    def log_from_worker(self, message):
+        """Log a message from the analysis thread (delivered on the Tk thread)"""
+        if self.frame_analyzer is not None:
+            self.frame_analyzer.post_message(message)
+        else:
+            self.app.log_event(message)
 
-            # Display the image
-            if hasattr(self, 'image_label'):
-                self.image_label.configure(image=self.img_tk)
-                self.image_label.image = self.img_tk
-            else:
-                self.image_label = Label(self.video_canvas, image=self.img_tk)
-                self.image_label.pack(fill=BOTH, expand=True)
-                self.image_label.image = self.img_tk
-
-            # Update status information
-            self.update_status_info(
-                self.app.total_spaces,
-                self.app.free_spaces,
-                self.app.occupied_spaces,
-                self.app.vehicle_counter
-            )
+    def poll_analysis(self):
+        """Show finished frames and status from the analysis thread (Tk thread only)"""
+        analyzer = self.frame_analyzer
+        if not self.running or analyzer is None:
+            return
 
-            # Update allocation tab less frequently (every ~10 seconds at 30fps)
-            if hasattr(self.app, 'allocation_tab'):
-                # Assuming ~30fps, update every 300 frames (10 seconds)
-                if self.frame_count % 300 == 0:
-                    self.app.allocation_tab.update_visualization()
-                    self.app.allocation_tab.update_statistics()
-
-            # Calculate and display processing time
-            processing_time = (time.time() - start_time) * 1000  # Convert to ms
-            self.last_processing_time = processing_time
-            self.processing_time_label.config(text=f"Processing: {processing_time:.1f} ms")
-
-            # Schedule next frame processing with better delay
-            if self.app.detection_mode == "parking" or not self.app.use_ml_detection:
-                self.parent.after(30, self.process_frame)  # 30ms delay for standard processing
+        try:
+            # Snapshot the Tk settings the worker reads
+            self._debug_mode = self.debug_var.get() == "On"
+            self._ml_method = self.ml_method_var.get()
+            self.sync_frame_size()
+
+            for message in analyzer.pop_messages():
+                self.app.log_event(message)
+
+            if analyzer.error is not None:
+                raise analyzer.error
+
+            # Enable seeking once the video index is available
+            if self.video_index is None and self.index_loader is not None and self.index_loader.ready:
+                self.video_index = self.index_loader.index
+                self.seek_scale.configure(to=max(self.video_index.duration, 0.001))
+                self.seek_scale.state(["!disabled"])
+                self.app.log_event(f"Video index ready: {self.video_index.frame_count} frames, "
+                                   f"{len(self.video_index.keyframes)} keyframes")
+
+            processed_img = analyzer.get_latest()
+            if processed_img is None:
+                if analyzer.finished:
+                    # For video files, this means end of video
+                    self.app.log_event("End of video reached")
+                    self.stop_detection()
+                    return
             else:
-                self.parent.after(40, self.process_frame)  # 40ms delay for ML processing
+                self.render_frame(processed_img)
+
+            # Schedule the next poll; the analysis keeps running meanwhile
+            self.parent.after(15, self.poll_analysis)
 
         except Exception as e:
             self.app.log_event(f"Error processing frame: {str(e)}")
             messagebox.showerror("Error", f"Error processing video frame: {str(e)}")
             self.stop_detection()
 
-    def update_parking_data_for_allocation(self, img_pro):
-        """Update parking data for allocation system"""
+    def on_seek_drag(self, value=None):
+        """Scrub: jump to the keyframe before the slider position (no decoding forward)"""
+        if self.video_index is None or self.video_capture is None:
+            return
+
+        self._seeking = True
+        seconds = float(self.seek_var.get())
+        self.seek_to(self.video_index.seek_target(seconds, exact=False))
+
+    def on_seek_release(self, event=None):
+        """Finish scrubbing at the exact frame under the slider"""
+        if self.video_index is None or self.video_capture is None:
+            return
+
+        seconds = float(self.seek_var.get())
+        self.seek_to(self.video_index.seek_target(seconds, exact=True))
+        self._seeking = False
+
+    def seek_to(self, frame):
+        """Continue detection from a frame of the recorded video"""
+        self.video_capture.seek(frame)
+        if self.frame_scheduler is not None:
+            self.frame_scheduler.reset()
+
+        # The worker owns the motion state; it resets it before the next frame
+        self._reset_requested = True
+
+    def update_seek_bar(self):
+        """Move the seek bar to the frame on screen"""
+        if self.video_index is None or self._seeking:
+            return
+
+        current = self.video_index.time_of(max(self.video_capture.frame_index, 0))
+        self.seek_var.set(current)
+        self.seek_time_label.config(
+            text=f"{self.format_time(current)} / {self.format_time(self.video_index.duration)}")
+
+    @staticmethod
+    def format_time(seconds):
+        """Format seconds as [h:]mm:ss"""
+        minutes, secs = divmod(int(seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+        return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes:02d}:{secs:02d}"
+
+    def render_frame(self, processed_img):
+        """Display a finished frame and refresh the status labels"""
+        # Update allocation tab less frequently (every ~10 seconds at 30fps)
+        if hasattr(self.app, 'allocation_tab'):
+            # Assuming ~30fps, update every 300 frames (10 seconds)
+            if self.frame_count % 300 == 0:
+                self.app.allocation_tab.update_visualization()
+                self.app.allocation_tab.update_statistics()
+
+        # Nothing to draw while the tab is hidden or above the display rate
+        if not self.display_surface.ready(self.app.display_fps):
+            return
+
+        # Blit into the reused PhotoImage
+        self.display_surface.show(processed_img)
+
+        # Slot annotations as canvas items, updated only where a slot changed
+        if self.app.canvas_overlays and self.app.detection_mode == "parking" and not self._debug_mode:
+            self.canvas_overlay.update(self.app.occupancy_result, self.display_surface.transform)
+        elif self.canvas_overlay.active:
+            self.canvas_overlay.clear()
+
+        # Update status information
+        self.update_status_info(
+            self.app.total_spaces,
+            self.app.free_spaces,
+            self.app.occupied_spaces,
+            self.app.vehicle_counter
+        )
+
+        # Keep the seek bar in step with playback
+        self.update_seek_bar()
+
+        # Display the analysis time of the last frame
+        processing_time = self.frame_analyzer.last_analysis_ms
+        self.last_processing_time = processing_time
+        self.processing_time_label.config(
+            text=f"Processing: {processing_time:.1f} ms, {self.frame_scheduler.describe()} "
+                 f"({self.video_capture.describe()}, undisplayed {self.frame_analyzer.dropped}; "
+                 f"{self.display_surface.describe()})")
+        if self.app.detection_mode == "parking":
+            self.preprocess_time_label.config(
+                text=f"Preprocessing: {self.app.parking_preprocessor.describe()}")
+
+    def update_parking_data_for_allocation(self, occupancy):
+        """Update parking data for allocation system from this frame's OccupancyResult"""
         try:
             # Make sure app has parking_manager
             if not hasattr(self.app, 'parking_manager'):
-                self.app.log_event("No parking manager found")
+                self.log_from_worker("No parking manager found")
                 return
 
-            # Create parking_data if it doesn't exist in parking_manager
-            if not hasattr(self.app.parking_manager, 'parking_data'):
-                self.app.parking_manager.parking_data = {}
-
-            # Update parking spaces data
-            for i, (x, y, w, h) in enumerate(self.app.posList):
-                # Convert coordinates to integers to fix the "slice indices must be integers" error
-                x, y, w, h = int(x), int(y), int(w), int(h)
-
-                # Ensure coordinates are within image bounds
-                if (y >= 0 and y + h < img_pro.shape[0] and x >= 0 and x + w < img_pro.shape[1]):
-                    # Get crop of parking space
-                    img_crop = img_pro[y:y + h, x:x + w]
-                    count = cv2.countNonZero(img_crop)
-                    is_occupied = count >= self.app.parking_threshold
-
-                    # Generate section based on position (cast to int to avoid float division issues)
-                    section = "A" if x < int(img_pro.shape[1] / 2) else "B"
-                    section += "1" if y < int(img_pro.shape[0] / 2) else "2"
-
-                    # Full space ID
-                    space_id = f"S{i + 1}-{section}"
-
-                    # Update or create parking space data
-                    if space_id not in self.app.parking_manager.parking_data:
-                        self.app.parking_manager.parking_data[space_id] = {
-                            'position': (x, y, w, h),
-                            'occupied': is_occupied,
-                            'vehicle_id': None,
-                            'last_state_change': datetime.now(),
-                            'distance_to_entrance': x + y,  # Simple distance estimation
-                            'section': section
-                        }
-                    else:
-                        # Just update occupancy status
-                        self.app.parking_manager.parking_data[space_id]['occupied'] = is_occupied
+            # Keep the slot table in step with the layout, then apply this frame's
+            # occupancy to the slots inside the frame
+            slot_table = self.app.parking_manager.slot_table
+            slot_table.sync(self._positions, occupancy.frame_shape)
+            slot_table.update_occupancy(occupancy.occupied, where=occupancy.valid)
 
             # Only log updates occasionally to reduce console spam
             if self.frame_count % 100 == 0:  # Log every 100 frames
-                self.app.log_event(f"Updated parking data for {len(self.app.posList)} spaces")
+                self.log_from_worker(f"Updated parking data for {len(self._positions)} spaces")
         except Exception as e:
-            self.app.log_event(f"Error updating parking allocation data: {str(e)}")
+            self.log_from_worker(f"Error updating parking allocation data: {str(e)}")
 
     def safe_ml_detection(self, img):
         """Safely perform ML detection with error handling and fallback"""
@@ -1037,8 +1449,7 @@ class DetectionTab:
                 return []
 
             # Check if we're using the tracker or regular detector
-            ml_method = getattr(self, 'ml_method_var', None)
-            if ml_method and ml_method.get() == "YOLO + DeepSORT" and hasattr(self.app, 'vehicle_tracker'):
+            if self._ml_method == "YOLO + DeepSORT" and hasattr(self.app, 'vehicle_tracker'):
                 # For YOLO+DeepSORT, we don't need to do anything here
                 # The detections will be handled in process_ml_detections_with_tracking
                 return []
@@ -335,28 +335,24 @@ class ParkingAllocationTab:
     def _allocate_vehicle_thread(self):
         """Thread-safe vehicle allocation"""
         try:
-            # Get parking data from parking manager
-            parking_data = {}
-            if hasattr(self.app, 'parking_manager'):
-                with threading.Lock():  # Use lock for thread safety
-                    parking_data = self.app.parking_manager.parking_data.copy()
+            # Get the slot table from the parking manager
+            slot_table = self.app.parking_manager.slot_table if hasattr(self.app, 'parking_manager') else None
 
-            if not parking_data:
+            if slot_table is None or len(slot_table) == 0:
                 self.queue_function(lambda: messagebox.showerror(
                     "Error", "No parking data available. Setup parking spaces first."))
                 return
 
-            # Check if there are free spaces
-            free_spaces = {space_id: data for space_id, data in parking_data.items()
-                           if not data.get('occupied', True)}
-
-            if not free_spaces:
+            # Check if there are free spaces (or free groups)
+            group_data = self.app.parking_manager.group_data
+            if not self._has_free_space(slot_table, group_data):
                 self.queue_function(lambda: messagebox.showinfo(
                     "No Free Spaces", "No free parking spaces available."))
                 return
 
             # Get vehicle parameters (capture current values)
-            vehicle_id = f"V{self.next_vehicle_id}"
+            vehicle_number = self.next_vehicle_id
+            vehicle_id = f"V{vehicle_number}"
             vehicle_size = self.vehicle_size.get()
             preferred_section = None if self.preferred_section.get() == "Any" else self.preferred_section.get()
             weight = self.load_balancing_weight.get()
@@ -366,17 +362,13 @@ class ParkingAllocationTab:
                 self.allocation_engine.load_balancing_weight = weight
 
             # Perform allocation
-            best_space_id, score = self.allocation_engine.allocate_parking(
-                parking_data, vehicle_size, preferred_section)
+            best_index, score = self.allocation_engine.allocate_from_table(
+                slot_table, vehicle_size, preferred_section, groups=group_data)
 
-            if best_space_id:
+            if best_index is not None:
                 # Update parking data
-                if best_space_id in parking_data:
-                    # Update data in thread-safe manner
-                    with threading.Lock():
-                        if hasattr(self.app, 'parking_manager'):
-                            self.app.parking_manager.parking_data[best_space_id]['occupied'] = True
-                            self.app.parking_manager.parking_data[best_space_id]['vehicle_id'] = vehicle_id
+                best_space_id = self._assign_space(slot_table, group_data, best_index, vehicle_number)
+                if best_space_id is not None:
 
                     # Store allocation
                     self.allocated_vehicles[vehicle_id] = best_space_id
@@ -393,7 +385,7 @@ class ParkingAllocationTab:
                     self.queue_function(self.update_statistics)
                 else:
                     self.queue_function(lambda: messagebox.showerror(
-                        "Allocation Error", f"Space {best_space_id} not found in parking data."))
+                        "Allocation Error", f"Space {best_index} not found in parking data."))
             else:
                 self.queue_function(lambda: messagebox.showinfo(
                     "Allocation Failed", "Could not find a suitable parking space."))
@@ -402,17 +394,42 @@ class ParkingAllocationTab:
             self.queue_function(lambda: messagebox.showerror(
                 "Error", f"Allocation error: {str(e)}"))
 
+    def _has_free_space(self, slot_table, group_data):
+        """True if a slot or a group of slots can still be allocated"""
+        if len(slot_table.free_indices()) > 0:
+            return True
+        return any(data.get('is_group', False) and not data['occupied'] for data in group_data.values())
+
+    def _assign_space(self, slot_table, group_data, best, vehicle_number):
+        """
+        Mark the space chosen by allocate_from_table as taken
+
+        Returns:
+            The space ID, or None if the space no longer exists
+        """
+        if isinstance(best, str):
+            group = group_data.get(best)
+            if group is None:
+                return None
+            group['occupied'] = True
+            group['vehicle_id'] = f"V{vehicle_number}"
+            group['last_state_change'] = datetime.now()
+            return best
+
+        if best >= len(slot_table):
+            return None
+        slot_table.assign_vehicle(best, vehicle_number)
+        return slot_table.space_id(best)
+
     def _perform_allocation(self, vehicle_size, preferred_section, weight):
         """Worker function to perform allocation without freezing UI"""
         try:
-            # Get parking data
-            parking_data = self.app.parking_manager.parking_data if hasattr(self.app, 'parking_manager') else {}
+            # Get the slot table
+            slot_table = self.app.parking_manager.slot_table if hasattr(self.app, 'parking_manager') else None
 
-            # Check if there are free spaces
-            free_spaces = {space_id: data for space_id, data in parking_data.items()
-                           if not data.get('occupied', True)}
-
-            if not free_spaces:
+            # Check if there are free spaces (or free groups)
+            group_data = self.app.parking_manager.group_data if slot_table is not None else {}
+            if slot_table is None or not self._has_free_space(slot_table, group_data):
                 # Use queue_function to show message in main thread
                 self.queue_function(
                     lambda: messagebox.showinfo("No Free Spaces", "No free parking spaces available.")
@@ -420,22 +437,22 @@ class ParkingAllocationTab:
                 return
 
             # Get vehicle parameters - use the passed parameters, not UI variables
-            vehicle_id = f"V{self.next_vehicle_id}"
+            vehicle_number = self.next_vehicle_id
+            vehicle_id = f"V{vehicle_number}"
 
             # Set load balancing weight safely
             if hasattr(self.allocation_engine, 'load_balancing_weight'):
                 self.allocation_engine.load_balancing_weight = weight
 
             # Perform allocation
-            best_space_id, score = self.allocation_engine.allocate_parking(
-                parking_data, vehicle_size, preferred_section)
+            best_index, score = self.allocation_engine.allocate_from_table(
+                slot_table, vehicle_size, preferred_section, groups=group_data)
 
             # Schedule UI updates and messages in the main thread
-            if best_space_id:
+            if best_index is not None:
                 # Update data structures first
-                if best_space_id in parking_data:
-                    parking_data[best_space_id]['occupied'] = True
-                    parking_data[best_space_id]['vehicle_id'] = vehicle_id
+                best_space_id = self._assign_space(slot_table, group_data, best_index, vehicle_number)
+                if best_space_id is not None:
 
                     # Store allocation safely with mutex if needed
                     self.allocated_vehicles[vehicle_id] = best_space_id
@@ -453,7 +470,7 @@ class ParkingAllocationTab:
                 else:
                     self.queue_function(
                         lambda: messagebox.showerror("Allocation Error",
-                                                     f"Space {best_space_id} not found in parking data.")
+                                                     f"Space {best_index} not found in parking data.")
                     )
             else:
                 self.queue_function(
@@ -500,12 +517,18 @@ class ParkingAllocationTab:
             vehicle_id = random.choice(list(self.allocated_vehicles.keys()))
             space_id = self.allocated_vehicles[vehicle_id]
 
-            # Update parking data in thread-safe manner
-            with threading.Lock():
-                if hasattr(self.app, 'parking_manager'):
-                    if space_id in self.app.parking_manager.parking_data:
-                        self.app.parking_manager.parking_data[space_id]['occupied'] = False
-                        self.app.parking_manager.parking_data[space_id]['vehicle_id'] = None
+            # Update parking data (the slot table locks itself)
+            if hasattr(self.app, 'parking_manager'):
+                group = self.app.parking_manager.group_data.get(space_id)
+                if group is not None:
+                    group['occupied'] = False
+                    group['vehicle_id'] = None
+                    group['last_state_change'] = datetime.now()
+                else:
+                    slot_table = self.app.parking_manager.slot_table
+                    index = slot_table.index_of(space_id)
+                    if index is not None:
+                        slot_table.release(index)
 
             # Remove from allocated vehicles
             del self.allocated_vehicles[vehicle_id]
@@ -527,10 +550,11 @@ class ParkingAllocationTab:
             return
 
         # Reset parking data
-        parking_data = self.app.parking_manager.parking_data if hasattr(self.app, 'parking_manager') else {}
-        for space_id in parking_data:
-            parking_data[space_id]['occupied'] = False
-            parking_data[space_id]['vehicle_id'] = None
+        if hasattr(self.app, 'parking_manager'):
+            self.app.parking_manager.slot_table.release_all()
+            for data in self.app.parking_manager.group_data.values():
+                data['occupied'] = False
+                data['vehicle_id'] = None
 
         # Clear allocated vehicles
         self.allocated_vehicles = {}
@@ -594,25 +618,11 @@ class ParkingAllocationTab:
 
     def ensure_parking_data(self):
         """Ensure we have proper parking data to visualize"""
-        if hasattr(self.app, 'parking_manager') and not hasattr(self.app.parking_manager, 'parking_data'):
-            self.app.parking_manager.parking_data = {}
-
+        if hasattr(self.app, 'parking_manager') and len(self.app.parking_manager.slot_table) == 0:
             # Initialize from positions
             if hasattr(self.app, 'posList') and self.app.posList:
-                for i, (x, y, w, h) in enumerate(self.app.posList):
-                    space_id = f"S{i + 1}"
-                    section = "A" if x < self.app.image_width / 2 else "B"
-                    section += "1" if y < self.app.image_height / 2 else "2"
-                    full_space_id = f"{space_id}-{section}"
-
-                    self.app.parking_manager.parking_data[full_space_id] = {
-                        'position': (x, y, w, h),
-                        'occupied': True,  # Default to occupied
-                        'vehicle_id': None,
-                        'last_state_change': datetime.now(),
-                        'distance_to_entrance': x + y,
-                        'section': section
-                    }
+                self.app.parking_manager.slot_table.sync(
+                    self.app.posList, (self.app.image_height, self.app.image_width))
 
     def cleanup(self):
         """Clean up resources before closing"""
@@ -7,11 +7,14 @@ from tkinter import LEFT
 from tkinter import ttk, NSEW, W, E, LEFT, RIGHT, ACTIVE, DISABLED
 from utils.media_paths import get_reference_image_path
 from utils.resource_manager import save_parking_positions
+from utils.slot_geometry import is_polygon, scale_slot, shift_slot, slot_bounds, slot_contains
 from ui.parking_allocation_tab import ParkingAllocationTab
 
 # Import statements...
 
 class SetupTab:
+    POLYGON_CLOSE_DISTANCE = 10  # Pixels from the first corner that close a polygon
+
     def __init__(self, parent, app):
         self.parent = parent
         self.app = app
@@ -43,7 +46,8 @@ class SetupTab:
         ttk.Label(self.setup_control_frame, text="Parking Space Setup",
                   font=("Arial", 12, "bold")).grid(row=0, column=0, columnspan=2, sticky=W, padx=5)
 
-        ttk.Label(self.setup_control_frame, text="Left-click and drag to draw spaces. Right-click to delete spaces.",
+        ttk.Label(self.setup_control_frame, text="Left-click and drag to draw spaces. Right-click to delete spaces.\n"
+                                                 "Polygon mode: click each corner, then the first corner to close.",
                   font=("Arial", 10)).grid(row=0, column=2, columnspan=3, sticky=W, padx=5)
 
         # Drawing mode frame
@@ -56,6 +60,8 @@ class SetupTab:
         # Drawing mode buttons
         ttk.Radiobutton(drawing_mode_frame, text="Draw Box",
                         variable=self.drawing_mode, value="draw").pack(side=LEFT, padx=5)
+        ttk.Radiobutton(drawing_mode_frame, text="Draw Polygon",
+                        variable=self.drawing_mode, value="polygon").pack(side=LEFT, padx=5)
         ttk.Radiobutton(drawing_mode_frame, text="Select Multiple",
                         variable=self.drawing_mode, value="select").pack(side=LEFT, padx=5)
 
@@ -152,6 +158,9 @@ class SetupTab:
         self.space_groups = {}  # Dictionary mapping group_id to list of space indices
         self.next_group_id = 1  # Start group IDs at 1
 
+        # Corners of the polygon space being drawn
+        self.polygon_points = []
+
     def on_mouse_wheel(self, event):
         """Handle mouse wheel scrolling with improved functionality"""
         # Get the scroll direction based on platform
@@ -236,15 +245,13 @@ class SetupTab:
             self.setup_canvas.delete("parking_space")
 
             # Draw each parking space - limit processing to visible spaces
-            for i, (x, y, w, h) in enumerate(self.app.posList):
-                self.setup_canvas.create_rectangle(
-                    x, y, x + w, y + h,
-                    outline="magenta", width=2,
-                    tags=("parking_space", f"space_{i}")
-                )
+            for i, pos in enumerate(self.app.posList):
+                self.create_slot_outline(pos, ("parking_space", f"space_{i}"),
+                                         outline="magenta", width=2)
 
                 # Add space number (only if we have less than 50 spaces to avoid performance issues)
                 if len(self.app.posList) < 50:
+                    x, y, w, h = slot_bounds(pos)
                     self.setup_canvas.create_text(
                         x + w / 2, y + h / 2,
                         text=str(i + 1),
@@ -254,14 +261,34 @@ class SetupTab:
         except Exception as e:
             self.app.log_event(f"Error drawing parking spaces: {str(e)}")
 
+    def create_slot_outline(self, slot, tags, **options):
+        """Draw a rectangle or polygon parking space on the setup canvas"""
+        if is_polygon(slot):
+            coords = [coord for point in slot for coord in point]
+            return self.setup_canvas.create_polygon(*coords, fill="", tags=tags, **options)
+
+        x, y, w, h = slot
+        return self.setup_canvas.create_rectangle(x, y, x + w, y + h, tags=tags, **options)
+
     # Modify on_mouse_down to handle both drawing and selection modes
     def on_mouse_down(self, event):
         """Handle mouse down event for drawing parking spaces or selecting multiple spaces"""
-        self.drawing = True
         # Adjust coordinates for canvas scroll position
         self.start_x = self.setup_canvas.canvasx(event.x)
         self.start_y = self.setup_canvas.canvasy(event.y)
 
+        # Polygon corners are placed by single clicks, not by dragging
+        if self.drawing_mode.get() == "polygon":
+            self.drawing = False
+            self.add_polygon_point(self.start_x, self.start_y)
+            return
+
+        # Drop an unfinished polygon when switching to another mode
+        if self.polygon_points:
+            self.cancel_polygon()
+
+        self.drawing = True
+
         # Different behavior based on mode
         if self.drawing_mode.get() == "draw":
             # Create a new rectangle for drawing a parking space
@@ -348,12 +375,8 @@ class SetupTab:
 
                     # Draw the newly added parking space immediately
                     last_idx = len(self.app.posList) - 1
-                    x, y, w, h = self.app.posList[last_idx]
-                    self.setup_canvas.create_rectangle(
-                        x, y, x + w, y + h,
-                        outline="magenta", width=2,
-                        tags=("parking_space", f"space_{last_idx}")
-                    )
+                    self.create_slot_outline(self.app.posList[last_idx], ("parking_space", f"space_{last_idx}"),
+                                             outline="magenta", width=2)
 
                     # Schedule the allocation update for later to prevent UI freeze
                     self.parent.after(100, self.update_allocation_data)
@@ -373,8 +396,9 @@ class SetupTab:
             sx1, sy1, sx2, sy2 = selection_coords
 
             # Check each parking space
-            for i, (x, y, w, h) in enumerate(self.app.posList):
-                # Calculate parking space corners
+            for i, pos in enumerate(self.app.posList):
+                # Calculate parking space corners (bounding box for polygons)
+                x, y, w, h = slot_bounds(pos)
                 px1, py1, px2, py2 = x, y, x + w, y + h
 
                 # Check if parking space intersects with selection box
@@ -392,6 +416,60 @@ class SetupTab:
             self.setup_canvas.delete("selection_box")
             self.selection_box = None
 
+    def add_polygon_point(self, x, y):
+        """Add a corner to the polygon being drawn, closing it when the first corner is clicked again"""
+        points = self.polygon_points
+        if (len(points) >= 3 and abs(x - points[0][0]) <= self.POLYGON_CLOSE_DISTANCE and
+                abs(y - points[0][1]) <= self.POLYGON_CLOSE_DISTANCE):
+            self.finish_polygon()
+            return
+
+        points.append((x, y))
+
+        # Draw the corner and the edge from the previous corner
+        self.setup_canvas.create_oval(x - 3, y - 3, x + 3, y + 3, outline="green", fill="green",
+                                      tags="current_polygon")
+        if len(points) > 1:
+            px, py = points[-2]
+            self.setup_canvas.create_line(px, py, x, y, fill="green", width=2, tags="current_polygon")
+
+    def finish_polygon(self):
+        """Add the drawn polygon as a parking space"""
+        try:
+            polygon = tuple((int(px), int(py)) for px, py in self.polygon_points)
+            self.cancel_polygon()
+
+            # Add to posList first (display dimensions)
+            self.app.posList.append(polygon)
+
+            # Add to original_posList (reference dimensions)
+            if not hasattr(self.app, 'original_posList'):
+                self.app.original_posList = []
+            if (hasattr(self.app, 'reference_dimensions') and
+                    self.app.current_reference_image in self.app.reference_dimensions):
+                ref_width, ref_height = self.app.reference_dimensions[self.app.current_reference_image]
+                self.app.original_posList.append(
+                    scale_slot(polygon, ref_width / self.app.image_width, ref_height / self.app.image_height))
+            else:
+                self.app.original_posList.append(polygon)
+
+            # Update total spaces
+            self.app.total_spaces = len(self.app.posList)
+            self.app.occupied_spaces = self.app.total_spaces
+            self.app.update_status_info()
+
+            # Draw the new space and update allocation data later
+            last_idx = len(self.app.posList) - 1
+            self.create_slot_outline(polygon, ("parking_space", f"space_{last_idx}"), outline="magenta", width=2)
+            self.parent.after(100, self.update_allocation_data)
+        except Exception as e:
+            self.app.log_event(f"Error adding polygon space: {str(e)}")
+
+    def cancel_polygon(self):
+        """Discard the polygon being drawn"""
+        self.polygon_points = []
+        self.setup_canvas.delete("current_polygon")
+
     def highlight_selected_spaces(self):
         """Highlight the selected parking spaces"""
         # Remove any existing highlights
@@ -400,13 +478,9 @@ class SetupTab:
         # Highlight each selected space
         for i in self.selected_spaces:
             if i < len(self.app.posList):
-                x, y, w, h = self.app.posList[i]
                 # Create highlight with different color and dash pattern
-                self.setup_canvas.create_rectangle(
-                    x, y, x + w, y + h,
-                    outline="cyan", width=3, dash=(5, 3),
-                    tags=("space_highlight", f"highlight_{i}")
-                )
+                self.create_slot_outline(self.app.posList[i], ("space_highlight", f"highlight_{i}"),
+                                         outline="cyan", width=3, dash=(5, 3))
 
     def clear_selection(self):
         """Clear the current selection"""
@@ -427,18 +501,15 @@ class SetupTab:
 
         # Store group information in the parking manager
         if hasattr(self.app, 'parking_manager'):
-            # Make sure parking_data exists
-            if not hasattr(self.app.parking_manager, 'parking_data'):
-                self.app.parking_manager.parking_data = {}
-
             # Create a group entry in the allocation system
             section = "G"  # Special section for groups
 
             # Generate metadata for the group
-            min_x = min(self.app.posList[i][0] for i in self.selected_spaces)
-            min_y = min(self.app.posList[i][1] for i in self.selected_spaces)
-            max_x = max(self.app.posList[i][0] + self.app.posList[i][2] for i in self.selected_spaces)
-            max_y = max(self.app.posList[i][1] + self.app.posList[i][3] for i in self.selected_spaces)
+            bounds = [slot_bounds(self.app.posList[i]) for i in self.selected_spaces]
+            min_x = min(x for x, y, w, h in bounds)
+            min_y = min(y for x, y, w, h in bounds)
+            max_x = max(x + w for x, y, w, h in bounds)
+            max_y = max(y + h for x, y, w, h in bounds)
 
             # Group dimensions
             group_x = min_x
@@ -446,8 +517,8 @@ class SetupTab:
             group_width = max_x - min_x
             group_height = max_y - min_y
 
-            # Create group entry in parking data
-            self.app.parking_manager.parking_data[group_id] = {
+            # Create group entry in the parking manager
+            self.app.parking_manager.group_data[group_id] = {
                 'position': (group_x, group_y, group_width, group_height),
                 'is_group': True,
                 'occupied': False,
@@ -482,10 +553,11 @@ class SetupTab:
                 continue
 
             # Get the bounding box for this group
-            min_x = min(self.app.posList[i][0] for i in space_indices)
-            min_y = min(self.app.posList[i][1] for i in space_indices)
-            max_x = max(self.app.posList[i][0] + self.app.posList[i][2] for i in space_indices)
-            max_y = max(self.app.posList[i][1] + self.app.posList[i][3] for i in space_indices)
+            bounds = [slot_bounds(self.app.posList[i]) for i in space_indices]
+            min_x = min(x for x, y, w, h in bounds)
+            min_y = min(y for x, y, w, h in bounds)
+            max_x = max(x + w for x, y, w, h in bounds)
+            max_y = max(y + h for x, y, w, h in bounds)
 
             # Draw a bounding box around the group
             self.setup_canvas.create_rectangle(
@@ -555,9 +627,14 @@ class SetupTab:
         x = self.setup_canvas.canvasx(event.x)
         y = self.setup_canvas.canvasy(event.y)
 
+        # Right-click cancels a polygon that is still being drawn
+        if self.polygon_points:
+            self.cancel_polygon()
+            return
+
         # Check if click is inside any parking space
-        for i, (x1, y1, w, h) in enumerate(self.app.posList):
-            if x1 <= x <= x1 + w and y1 <= y <= y1 + h:
+        for i, pos in enumerate(self.app.posList):
+            if slot_contains(pos, x, y):
                 # Remove from the list
                 self.app.posList.pop(i)
 
@@ -573,8 +650,12 @@ class SetupTab:
     def shift_all_spaces(self, dx, dy):
         """Shift all parking spaces by dx, dy"""
         for i in range(len(self.app.posList)):
-            x, y, w, h = self.app.posList[i]
-            self.app.posList[i] = (x + dx, y + dy, w, h)
+            self.app.posList[i] = shift_slot(self.app.posList[i], dx, dy)
+
+        # Positions were edited in place, so drop the cached slot layout
+        self.app.occupancy_engine.invalidate()
+        if hasattr(self.app, 'parking_manager'):
+            self.app.parking_manager.slot_table.invalidate()
 
         # Redraw spaces
         self.draw_parking_spaces()
@@ -614,22 +695,8 @@ class SetupTab:
 
         # Update the parking manager and allocation systems
         if hasattr(self.app, 'parking_manager'):
-            # Generate section based on position
-            section = "A" if scaled_x < image_width / 2 else "B"
-            section += "1" if scaled_y < image_height / 2 else "2"
-
-            space_id = f"S{len(self.app.posList)}-{section}"
-
-            # Create with occupied=True by default
-            self.app.parking_manager.parking_data[space_id] = {
-                'position': (scaled_x, scaled_y, w, h),
-                'occupied': True,  # Set to TRUE by default
-                'vehicle_id': None,
-                'last_state_change': datetime.now(),
-                'distance_to_entrance': scaled_x + scaled_y,
-                'section': section,
-                'first_processed': False  # Mark as not yet processed by detection
-            }
+            # New slots start occupied until detection processes them
+            self.app.parking_manager.slot_table.sync(self.app.posList, (image_height, image_width))
 
         # Update counters
         self.app.total_spaces = len(self.app.posList)
@@ -665,13 +732,7 @@ class SetupTab:
                     f"to reference {ref_width}x{ref_height}")
 
                 # Scale all positions back to reference dimensions
-                reference_positions = []
-                for x, y, w, h in self.app.posList:
-                    ref_x = int(x * width_scale)
-                    ref_y = int(y * height_scale)
-                    ref_w = int(w * width_scale)
-                    ref_h = int(h * height_scale)
-                    reference_positions.append((ref_x, ref_y, ref_w, ref_h))
+                reference_positions = [scale_slot(pos, width_scale, height_scale) for pos in self.app.posList]
 
                 # Store the reference positions as the original positions
                 self.app.original_posList = reference_positions.copy()
@@ -744,8 +805,8 @@ class SetupTab:
                 self.app.parking_manager.posList = []
 
                 # Also clear any parking data
-                if hasattr(self.app.parking_manager, 'parking_data'):
-                    self.app.parking_manager.parking_data = {}
+                self.app.parking_manager.slot_table.clear()
+                self.app.parking_manager.group_data = {}
 
             # Delete all parking position files for the current reference image
             if self.app.current_reference_image:
@@ -879,35 +940,9 @@ class SetupTab:
                 from models.parking_manager import ParkingManager
                 self.app.parking_manager = ParkingManager(config_dir=self.app.config_dir, log_dir=self.app.log_dir)
 
-            # Make sure parking_data exists
-            if not hasattr(self.app.parking_manager, 'parking_data'):
-                self.app.parking_manager.parking_data = {}
-
-            # Clear existing data to rebuild from scratch
-            self.app.parking_manager.parking_data.clear()  # Use clear() instead of reassigning
-
-            # Import datetime class
-            from datetime import datetime
-
-            # For each parking space in posList, create an entry in parking_data
-            for i, (x, y, w, h) in enumerate(self.app.posList):
-                # Generate section based on position
-                section = "A" if x < self.app.image_width / 2 else "B"
-                section += "1" if y < self.app.image_height / 2 else "2"
-
-                # Create space ID
-                space_id = f"S{i + 1}-{section}"
-
-                # Add to parking_data
-                self.app.parking_manager.parking_data[space_id] = {
-                    'position': (x, y, w, h),
-                    'occupied': True,  # Default to occupied
-                    'vehicle_id': None,
-                    'last_state_change': datetime.now(),
-                    'distance_to_entrance': x + y,  # Simple distance estimation
-                    'section': section,
-                    'first_processed': False  # Mark as not yet processed by detection
-                }
+            # Rebuild the slot table from scratch (every space starts occupied)
+            self.app.parking_manager.slot_table.reset(
+                self.app.posList, (self.app.image_height, self.app.image_width))
 
             # Update the UI elements if the application has the allocation tab
             if hasattr(self.app, 'allocation_tab'):
@@ -64,6 +64,13 @@ class StatsTab:
 
     def record_current_stats(self, total_spaces=None, free_spaces=None, occupied_spaces=None, vehicle_counter=None):
         """Record current statistics to the stats view"""
+        # Prefer the latest per-frame occupancy result when no values are given
+        occupancy = getattr(self.app, 'occupancy_result', None)
+        if occupancy is not None and total_spaces is None and free_spaces is None:
+            total_spaces = occupancy.total_spaces
+            free_spaces = occupancy.free_spaces
+            occupied_spaces = occupancy.occupied_spaces
+
         # Use provided values or get from app
         if total_spaces is None:
             total_spaces = self.app.total_spaces
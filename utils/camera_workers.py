@@ -0,0 +1,342 @@
+"""
+Per-camera worker processes with shared-memory frame transport
+
+Each CameraWorker runs one feed in its own process: the process owns the
+VideoCapture and all analysis state and writes annotated frames plus the
+per-slot occupancy into a SharedFrameRing. The UI process maps the ring and
+copies the newest frame out without pickling, so feeds scale with cores
+instead of sharing one GIL.
+"""
+import multiprocessing
+import queue
+import time
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+
+# Header fields stored per ring slot (int64 each)
+SEQ, FRAME_INDEX, FREE, OCCUPIED, TOTAL, TIMESTAMP_US, VEHICLES = range(7)
+HEADER_FIELDS = 7
+
+
+class SharedFrameRing:
+    """
+    Fixed-size ring of frames and occupancy arrays in one shared memory block.
+
+    Layout: an int64 header (write sequence, then HEADER_FIELDS per slot)
+    followed by one frame and one occupancy vector per slot. The writer marks a
+    slot with SEQ = -1 while filling it; readers check SEQ before and after the
+    copy and retry if the writer lapped them.
+    """
+
+    def __init__(self, shape, slot_count, ring_size=3, name=None, create=False):
+        self.shape = tuple(shape)
+        self.slot_count = slot_count
+        self.ring_size = ring_size
+
+        self.frame_bytes = int(np.prod(self.shape))
+        self.entry_bytes = self.frame_bytes + max(1, slot_count)
+        header_bytes = 8 * (1 + HEADER_FIELDS * ring_size)
+        size = header_bytes + self.entry_bytes * ring_size
+
+        if create:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            _untrack(self.shm)
+        self.name = self.shm.name
+        self.owner = create
+
+        buf = self.shm.buf
+        self._write_seq = np.ndarray((1,), dtype=np.int64, buffer=buf, offset=0)
+        self._headers = np.ndarray((ring_size, HEADER_FIELDS), dtype=np.int64, buffer=buf, offset=8)
+        self._frames = []
+        self._occupancy = []
+        for i in range(ring_size):
+            offset = header_bytes + i * self.entry_bytes
+            self._frames.append(np.ndarray(self.shape, dtype=np.uint8, buffer=buf, offset=offset))
+            self._occupancy.append(np.ndarray((max(1, slot_count),), dtype=np.uint8, buffer=buf,
+                                              offset=offset + self.frame_bytes))
+
+        if create:
+            self._write_seq[0] = 0
+            self._headers[:] = 0
+
+    @property
+    def sequence(self):
+        """Sequence number of the newest complete frame (0 before the first one)"""
+        return int(self._write_seq[0])
+
+    def write(self, frame, occupied=None, frame_index=0, free=0, occupied_count=0, total=0, vehicles=0):
+        """Publish a frame and its occupancy (writer process only)"""
+        seq = self.sequence + 1
+        i = seq % self.ring_size
+        header = self._headers[i]
+
+        header[SEQ] = -1
+        np.copyto(self._frames[i], frame)
+        if occupied is not None and self.slot_count:
+            self._occupancy[i][:len(occupied)] = occupied
+        header[FRAME_INDEX] = frame_index
+        header[FREE] = free
+        header[OCCUPIED] = occupied_count
+        header[TOTAL] = total
+        header[VEHICLES] = vehicles
+        header[TIMESTAMP_US] = int(time.time() * 1e6)
+        header[SEQ] = seq
+        self._write_seq[0] = seq
+
+    def read(self, out=None, after=0):
+        """
+        Copy the newest frame newer than sequence 'after'
+
+        Args:
+            out: Optional preallocated frame array to copy into
+            after: Sequence number the caller already has
+
+        Returns:
+            tuple: (seq, frame, info) or None if there is no newer frame
+        """
+        for _ in range(3):
+            seq = self.sequence
+            if seq <= after:
+                return None
+
+            i = seq % self.ring_size
+            header = self._headers[i]
+            if header[SEQ] != seq:
+                continue
+
+            frame = out if out is not None else np.empty(self.shape, dtype=np.uint8)
+            np.copyto(frame, self._frames[i])
+            occupied = self._occupancy[i][:self.slot_count].astype(bool)
+            info = {
+                'frame_index': int(header[FRAME_INDEX]),
+                'free': int(header[FREE]),
+                'occupied': int(header[OCCUPIED]),
+                'total': int(header[TOTAL]),
+                'vehicles': int(header[VEHICLES]),
+                'timestamp': int(header[TIMESTAMP_US]) / 1e6,
+                'slots_occupied': occupied
+            }
+
+            # The writer did not reuse the slot while we were copying
+            if header[SEQ] == seq:
+                return seq, frame, info
+        return None
+
+    def close(self):
+        """Unmap the block (and free it if this side created it)"""
+        self._write_seq = self._headers = None
+        self._frames = []
+        self._occupancy = []
+        try:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+        except Exception as e:
+            print(f"Error closing shared frame ring: {str(e)}")
+
+
+def _untrack(shm):
+    """Keep a reader from unlinking a block it did not create when it exits"""
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+
+def _camera_process(camera_id, source, detection_type, pos_list, settings, status_queue, stop_event):
+    """Worker process: capture, analyze and publish one feed until stopped"""
+    from models.occupancy_engine import OccupancyEngine
+    from models.change_detector import SlotChangeDetector
+    from models.motion_engine import create_motion_engine
+    from models.centroid_tracker import CentroidTracker
+    from utils.image_processor import ParkingPreprocessor, process_parking_spaces, detect_vehicles_traditional
+    from utils.frame_scheduler import DeadlineScheduler
+    from utils.overlay import SlotOverlayCompositor
+
+    cap = cv2.VideoCapture(source)
+    ring = None
+    try:
+        if not cap.isOpened():
+            status_queue.put(('error', camera_id, f"Failed to open video source: {source}"))
+            return
+
+        live = isinstance(source, int)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        threshold = int(settings.get('threshold', 500))
+
+        scheduler = DeadlineScheduler(fps)
+        engine = OccupancyEngine(scale=settings.get('processing_scale', 1.0))
+        detector = SlotChangeDetector() if settings.get('motion_gating', True) else None
+        preprocessor = ParkingPreprocessor(erode=True)
+        overlay = SlotOverlayCompositor()
+        occupancy = None
+        motion = create_motion_engine(settings.get('motion_backend'))
+        prev_frame = None
+        matches = CentroidTracker()
+        vehicle_counter = 0
+
+        frame_index = -1
+        while not stop_event.is_set():
+            ret, img = cap.read()
+            if not ret:
+                if live:
+                    time.sleep(0.1)
+                    continue
+                status_queue.put(('ended', camera_id, None))
+                break
+            frame_index += 1
+
+            # Play files at their own frame rate and skip frames when behind
+            frame_time = time.monotonic() if live else frame_index / scheduler.target_fps
+            delay = scheduler.delay(frame_time)
+            if delay is None:
+                continue
+            if delay > 0 and stop_event.wait(delay):
+                break
+            start_time = time.perf_counter()
+
+            if ring is None:
+                ring = SharedFrameRing(img.shape, len(pos_list), create=True)
+                status_queue.put(('ready', camera_id, (ring.name, img.shape, len(pos_list), ring.ring_size)))
+
+            if detection_type == "parking":
+                changed = None
+                if detector is not None:
+                    slots, valid = engine.layout(pos_list, img.shape)
+                    changed = detector.changed_slots(img, slots, valid, engine.layout_version)
+
+                if changed is not None and not changed.any() and engine.is_current(occupancy, threshold):
+                    occupancy = engine.carry_forward(occupancy)
+                else:
+                    tiles = None
+                    if settings.get('roi_preprocessing', True):
+                        slot_mask = changed if engine.is_current(occupancy, threshold) else None
+                        tiles = engine.roi_tiles(pos_list, img.shape, slot_mask)
+                    img_pro = preprocessor.process(engine.prepare_frame(img), tiles=tiles)
+                    occupancy = engine.evaluate(img_pro, pos_list, threshold, changed=changed,
+                                                previous=occupancy, frame_shape=img.shape)
+
+                display, free, occupied, total = process_parking_spaces(
+                    None, img, pos_list, threshold, result=occupancy, overlay=overlay)
+                ring.write(display, occupancy.occupied, frame_index, free, occupied, total)
+            else:
+                display = img
+                if prev_frame is not None or motion is not None:
+                    display, matches, vehicle_counter = detect_vehicles_traditional(
+                        img, prev_frame,
+                        settings.get('line_height', 400),
+                        settings.get('min_contour_width', 40),
+                        settings.get('min_contour_height', 40),
+                        settings.get('offset', 10),
+                        matches, vehicle_counter, motion=motion)
+                prev_frame = img if motion is None else None
+                ring.write(display, frame_index=frame_index, vehicles=vehicle_counter)
+
+            scheduler.record(time.perf_counter() - start_time)
+
+    except Exception as e:
+        status_queue.put(('error', camera_id, str(e)))
+    finally:
+        cap.release()
+        if ring is not None:
+            # Give the UI a moment to stop reading before the block goes away
+            stop_event.wait(1.0)
+            ring.close()
+
+
+class CameraWorker:
+    """
+    UI-side handle of one camera worker process
+    """
+
+    def __init__(self, camera_id, source, detection_type="parking", pos_list=None, settings=None):
+        """
+        Args:
+            camera_id: Name used in status messages
+            source: Video path or camera index
+            detection_type: "parking" or "vehicle"
+            pos_list: Slot positions at the feed's frame size (parking only)
+            settings: Dict of detection settings (threshold, processing_scale,
+                roi_preprocessing, motion_gating, line_height, min_contour_width,
+                min_contour_height, offset)
+        """
+        self.camera_id = camera_id
+        self.source = source
+        self.detection_type = detection_type
+        self.pos_list = list(pos_list or [])
+        self.settings = dict(settings or {})
+
+        self._status_queue = multiprocessing.Queue()
+        self._stop_event = multiprocessing.Event()
+        self._process = None
+        self.ring = None
+        self._last_seq = 0
+        self._frame = None
+
+        self.error = None
+        self.ended = False
+
+    def start(self):
+        """Start the worker process"""
+        self._process = multiprocessing.Process(
+            target=_camera_process,
+            args=(self.camera_id, self.source, self.detection_type, self.pos_list,
+                  self.settings, self._status_queue, self._stop_event),
+            name=f"camera-{self.camera_id}", daemon=True)
+        self._process.start()
+        return self
+
+    def _drain_status(self):
+        """Handle messages from the worker"""
+        while True:
+            try:
+                kind, _, payload = self._status_queue.get_nowait()
+            except queue.Empty:
+                return
+
+            if kind == 'ready':
+                name, shape, slot_count, ring_size = payload
+                self.ring = SharedFrameRing(shape, slot_count, ring_size, name=name)
+                self._frame = np.empty(shape, dtype=np.uint8)
+            elif kind == 'error':
+                self.error = payload
+            elif kind == 'ended':
+                self.ended = True
+
+    def latest(self):
+        """
+        Newest annotated frame and its info, or None if nothing new arrived
+
+        The returned frame is a buffer reused by the next call.
+        """
+        self._drain_status()
+        if self.ring is None:
+            return None
+
+        result = self.ring.read(out=self._frame, after=self._last_seq)
+        if result is None:
+            return None
+
+        self._last_seq, frame, info = result
+        return frame, info
+
+    @property
+    def alive(self):
+        return self._process is not None and self._process.is_alive()
+
+    def stop(self, timeout=3.0):
+        """Stop the worker, then unmap its ring once nothing writes to it"""
+        self._stop_event.set()
+        if self._process is not None:
+            self._process.join(timeout)
+            if self._process.is_alive():
+                self._process.terminate()
+                self._process.join(timeout)
+            self._process = None
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
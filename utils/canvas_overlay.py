@@ -0,0 +1,114 @@
+"""
+Slot annotations drawn as Tk Canvas items above the video image
+"""
+import numpy as np
+
+TAG = "slot_overlay"
+FREE_COLOR = "#00ff00"
+OCCUPIED_COLOR = "#ff0000"
+LABEL_COLOR = "#00ffff"
+FONT = ("Arial", 9, "bold")
+
+
+class CanvasSlotOverlay:
+    """
+    Vector version of the slot annotations of the live view.
+
+    Outlines, IDs and counts are created as Canvas items once per layout and
+    display transform (like SetupTab.draw_parking_spaces does for setup);
+    each frame only itemconfigs the slots whose state or count changed, so
+    frame analysis no longer draws into the pixels and the raw frame can go
+    straight to the display surface.
+    """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+
+        self._key = None  # (layout version, transform) the items were created for
+        self._outlines = []
+        self._counts_text = []
+        self._free = None
+        self._counts = None
+
+        # Counters
+        self.rebuilds = 0
+        self.updated_items = 0
+
+    @property
+    def active(self):
+        """True while overlay items are on the canvas"""
+        return self._key is not None
+
+    def _to_canvas(self, points, transform):
+        """Map frame coordinates to canvas coordinates"""
+        sx, sy, ox, oy = transform
+        return [coord for x, y in points for coord in (x * sx + ox, y * sy + oy)]
+
+    def _build(self, result, transform):
+        """Create the items of every slot"""
+        self.canvas.delete(TAG)
+        self._outlines = [None] * len(result.slots)
+        self._counts_text = [None] * len(result.slots)
+        sx, sy, ox, oy = transform
+
+        for i in np.flatnonzero(result.valid):
+            x, y, w, h = (int(v) for v in result.slots[i])
+            color = FREE_COLOR if result.free[i] else OCCUPIED_COLOR
+
+            if i in result.polygons:
+                coords = self._to_canvas(result.polygons[i].reshape(-1, 2), transform)
+                self._outlines[i] = self.canvas.create_polygon(*coords, fill="", outline=color, width=2, tags=TAG)
+            else:
+                coords = self._to_canvas([(x, y), (x + w, y + h)], transform)
+                self._outlines[i] = self.canvas.create_rectangle(*coords, outline=color, width=2, tags=TAG)
+
+            self.canvas.create_text(x * sx + ox + 5, y * sy + oy + 4, text=str(i), anchor="nw",
+                                    fill=LABEL_COLOR, font=FONT, tags=TAG)
+            self._counts_text[i] = self.canvas.create_text(
+                x * sx + ox + 2, (y + h) * sy + oy - 2, text=str(int(result.counts[i])), anchor="sw",
+                fill=color, font=FONT, tags=TAG)
+
+        self._free = result.free.copy()
+        self._counts = result.counts.copy()
+        self.canvas.tag_raise(TAG)
+        self.rebuilds += 1
+
+    def update(self, result, transform):
+        """
+        Show an OccupancyResult over the image
+
+        Args:
+            result: OccupancyResult of the displayed frame
+            transform: DisplaySurface.transform of the displayed frame
+        """
+        if result is None or transform is None:
+            return
+
+        key = (result.layout_version, transform)
+        if key != self._key or len(self._free) != len(result.free):
+            self._key = key
+            self._build(result, transform)
+        else:
+            # Recolour slots whose state flipped and relabel changed counts
+            flipped = result.valid & (result.free != self._free)
+            for i in np.flatnonzero(flipped):
+                color = FREE_COLOR if result.free[i] else OCCUPIED_COLOR
+                self.canvas.itemconfig(self._outlines[i], outline=color)
+                self.canvas.itemconfig(self._counts_text[i], fill=color)
+
+            relabel = result.valid & (result.counts != self._counts)
+            for i in np.flatnonzero(relabel):
+                self.canvas.itemconfig(self._counts_text[i], text=str(int(result.counts[i])))
+
+            self.updated_items += int(np.count_nonzero(flipped)) * 2 + int(np.count_nonzero(relabel))
+            self._free = result.free.copy()
+            self._counts = result.counts.copy()
+
+    def clear(self):
+        """Remove every overlay item"""
+        self.canvas.delete(TAG)
+        self._key = None
+        self._outlines = []
+        self._counts_text = []
+        self._free = None
+        self._counts = None
@@ -0,0 +1,201 @@
+"""
+Reusable Tk image surface for showing video frames on a Canvas
+"""
+import time
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+
+
+class DisplaySurface:
+    """
+    Shows BGR frames on a Canvas through one PhotoImage that is updated in place.
+
+    A PhotoImage and an RGBA conversion buffer are allocated once per display
+    size; every frame is converted into the buffer and pasted into the
+    existing PhotoImage, so no Tk image objects are created or released while
+    the video plays.
+
+    It is also the render stage of the live views: ready() holds frames back
+    while the canvas is hidden or the display rate cap is reached, and with
+    fit_to_canvas each frame is resized once, straight to the canvas size.
+    """
+
+    def __init__(self, canvas, fit_to_canvas=True, max_fps=None):
+        """
+        Args:
+            canvas: Tk Canvas to draw on
+            fit_to_canvas: Scale frames to fit the canvas (keeping the aspect ratio);
+                otherwise the canvas requests the frame size, like a Label would
+            max_fps: Default display rate cap for ready() (None shows every frame)
+        """
+        self.canvas = canvas
+        self.fit_to_canvas = fit_to_canvas
+        self.max_fps = max_fps
+
+        self._photo = None
+        self._item = None
+        self._rgba = None  # Conversion buffer, shared with _image
+        self._image = None  # PIL view of _rgba (PIL maps 4-byte pixels without copying)
+        self._size = None  # (width, height) of the current PhotoImage
+        self._center = None
+        self._frame_size = None  # (width, height) of the last frame shown
+
+        # Cached resize target: (frame size, canvas size) -> display size, interpolation
+        self._fit_key = None
+        self._fit_size = None
+        self._interpolation = cv2.INTER_AREA
+        self._scaled = None  # Resized frame buffer
+
+        self._last_shown = 0.0
+
+        # Counters
+        self.frames_shown = 0
+        self.allocations = 0  # PhotoImages created (once per display size)
+        self.skipped_hidden = 0  # Frames not rendered because the canvas was hidden
+        self.skipped_rate = 0  # Frames not rendered because of the display rate cap
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def transform(self):
+        """
+        Mapping from frame to canvas coordinates of the last frame shown
+
+        Returns:
+            tuple: (scale_x, scale_y, offset_x, offset_y), or None before the first frame
+        """
+        if self._frame_size is None or self._center is None:
+            return None
+        width, height = self._size
+        return (width / self._frame_size[0], height / self._frame_size[1],
+                self._center[0] - width // 2, self._center[1] - height // 2)
+
+    @property
+    def visible(self):
+        """True if the canvas is mapped (its tab is selected and its window is not minimized)"""
+        try:
+            return bool(self.canvas.winfo_viewable())
+        except Exception:
+            return False
+
+    def ready(self, max_fps=-1, now=None):
+        """
+        Check whether the next frame should be rendered
+
+        Args:
+            max_fps: Display rate cap; -1 uses the surface default, None or 0 means no cap
+            now: Current time.monotonic() (for testing)
+
+        Returns:
+            bool: False while the canvas is hidden or the last frame was shown too recently
+        """
+        if not self.visible:
+            self.skipped_hidden += 1
+            return False
+
+        if max_fps == -1:
+            max_fps = self.max_fps
+        if max_fps:
+            now = time.monotonic() if now is None else now
+            if now - self._last_shown < 1.0 / max_fps:
+                self.skipped_rate += 1
+                return False
+        return True
+
+    def _canvas_size(self):
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        if width <= 1 or height <= 1:
+            return None
+        return width, height
+
+    def _display_size(self, width, height):
+        """Size to show a frame at, recomputed only when the frame or canvas size changes"""
+        if not self.fit_to_canvas:
+            return width, height
+
+        canvas_size = self._canvas_size()
+        key = ((width, height), canvas_size)
+        if key != self._fit_key:
+            self._fit_key = key
+            if canvas_size is None:
+                self._fit_size = (width, height)
+            else:
+                scale = min(canvas_size[0] / width, canvas_size[1] / height)
+                self._fit_size = (max(1, int(width * scale)), max(1, int(height * scale)))
+            self._interpolation = cv2.INTER_AREA if self._fit_size[0] < width else cv2.INTER_LINEAR
+        return self._fit_size
+
+    def _allocate(self, width, height):
+        """Create the PhotoImage and conversion buffer for a display size"""
+        self._rgba = np.empty((height, width, 4), dtype=np.uint8)
+        self._image = Image.frombuffer("RGBA", (width, height), self._rgba, "raw", "RGBA", 0, 1)
+        self._photo = ImageTk.PhotoImage("RGBA", (width, height))
+        self._size = (width, height)
+        self.allocations += 1
+
+        if self._item is None:
+            self._item = self.canvas.create_image(0, 0, image=self._photo, anchor="center")
+        else:
+            self.canvas.itemconfig(self._item, image=self._photo)
+
+        if not self.fit_to_canvas:
+            self.canvas.configure(width=width, height=height)
+        self._center = None
+
+    def _place(self):
+        """Keep the image centred in the canvas"""
+        width, height = self._canvas_size() or self._size
+
+        center = (width // 2, height // 2)
+        if center != self._center:
+            self.canvas.coords(self._item, *center)
+            self._center = center
+
+    def show(self, frame):
+        """Display a BGR (or grayscale) frame"""
+        height, width = frame.shape[:2]
+        self._frame_size = (width, height)
+        display_size = self._display_size(width, height)
+        if self._size != display_size:
+            self._allocate(*display_size)
+
+        # Resize once, straight to the display size
+        if display_size != (width, height):
+            if self._scaled is None or self._scaled.shape[:2] != (display_size[1], display_size[0]) or \
+                    self._scaled.shape[2:] != frame.shape[2:]:
+                self._scaled = np.empty((display_size[1], display_size[0]) + frame.shape[2:], dtype=frame.dtype)
+            cv2.resize(frame, display_size, dst=self._scaled, interpolation=self._interpolation)
+            frame = self._scaled
+
+        # Convert into the shared buffer and blit it into the existing PhotoImage
+        code = cv2.COLOR_GRAY2RGBA if frame.ndim == 2 else cv2.COLOR_BGR2RGBA
+        cv2.cvtColor(frame, code, dst=self._rgba)
+        self._photo.paste(self._image)
+
+        self._place()
+        self._last_shown = time.monotonic()
+        self.frames_shown += 1
+
+    def describe(self):
+        """Short render counter text for the UI"""
+        size = f"{self._size[0]}x{self._size[1]}" if self._size else "-"
+        return (f"shown {self.frames_shown} at {size}, hidden {self.skipped_hidden}, "
+                f"over rate {self.skipped_rate}")
+
+    def clear(self):
+        """Remove the image from the canvas and free the surface"""
+        if self._item is not None:
+            self.canvas.delete(self._item)
+        self._item = None
+        self._photo = None
+        self._image = None
+        self._rgba = None
+        self._scaled = None
+        self._size = None
+        self._center = None
+        self._frame_size = None
+        self._fit_key = None
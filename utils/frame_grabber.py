@@ -0,0 +1,254 @@
+"""
+Threaded video capture with a bounded frame buffer
+"""
+import threading
+import time
+from collections import deque
+import cv2
+
+# Full-buffer policies
+DROP_OLDEST = "drop_oldest"  # Discard the oldest queued frame (live cameras)
+BLOCK = "block"  # Pause the reader until the consumer catches up (video files)
+
+
+class SamplingPlan:
+    """
+    Which source frames need to be decoded.
+
+    Every analysis_every-th frame is analyzed and every display_every-th frame
+    is shown; all other frames are only advanced over with grab(), which skips
+    the decode and colour conversion of retrieve().
+    """
+
+    def __init__(self, analysis_every=1, display_every=1):
+        self.analysis_every = max(1, int(analysis_every))
+        self.display_every = max(1, int(display_every))
+
+    def set_display_rate(self, display_fps, source_fps):
+        """Show about display_fps frames per second (None or 0 shows every frame)"""
+        if display_fps and source_fps and source_fps > 0:
+            self.display_every = max(1, int(round(source_fps / display_fps)))
+        else:
+            self.display_every = 1
+
+    def for_analysis(self, index):
+        return index % self.analysis_every == 0
+
+    def for_display(self, index):
+        return index % self.display_every == 0
+
+    def wants(self, index):
+        """True if the frame has to be decoded"""
+        return self.for_analysis(index) or self.for_display(index)
+
+
+class FrameGrabber:
+    """
+    Reads frames on a dedicated thread into a bounded ring buffer.
+
+    Decoding overlaps with processing, and a slow UI frame no longer stalls
+    the capture. Exposes the cv2.VideoCapture calls the detection views use
+    (isOpened, read, get, release) so it can stand in for a capture object.
+    """
+
+    def __init__(self, source, capacity=4, policy=None, late_after=0.5, retry_delay=0.1, plan=None):
+        """
+        Args:
+            source: Video path, camera index or an opened cv2.VideoCapture
+            capacity: Maximum number of queued frames
+            policy: DROP_OLDEST or BLOCK; defaults to DROP_OLDEST for cameras
+                and BLOCK for files
+            late_after: Seconds after capture at which a consumed frame counts as late
+            retry_delay: Seconds to wait before retrying a failed camera read
+            plan: Optional SamplingPlan; frames it does not want are grabbed but not decoded
+        """
+        self.capture = source if isinstance(source, cv2.VideoCapture) else cv2.VideoCapture(source)
+        self.live = isinstance(source, int)
+        self.capacity = max(1, capacity)
+        self.policy = policy or (DROP_OLDEST if self.live else BLOCK)
+        self.late_after = late_after
+        self.retry_delay = retry_delay
+        self.plan = plan
+
+        self._frames = deque()
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread = None
+        self._seek_to = None  # Frame requested by seek(), handled by the reader thread
+
+        # Counters
+        self.captured = 0
+        self.dropped = 0
+        self.late = 0
+        self.skipped_decodes = 0  # Frames advanced over with grab() only
+        self.finished = False  # Set when a file source reaches its end
+
+        # Source frame rate (0 if the backend does not report one)
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) if self.capture.isOpened() else 0.0
+
+        # Timestamp and index of the last frame returned by read()
+        self.timestamp = None
+        self.frame_index = -1
+        self.for_analysis = True
+
+    def isOpened(self):
+        return self.capture is not None and self.capture.isOpened()
+
+    def start(self):
+        """Start the reader thread"""
+        if self._thread is None and self.isOpened():
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name="FrameGrabber", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        """Reader thread: decode frames into the buffer until stopped or out of frames"""
+        index = 0
+        while not self._stop:
+            # Reposition the capture if a seek was requested
+            with self._cond:
+                target, self._seek_to = self._seek_to, None
+            if target is not None:
+                self.capture.set(cv2.CAP_PROP_POS_FRAMES, target)
+                index = target
+
+            # Advance without decoding frames the plan does not need
+            if self.plan is not None and not self.plan.wants(index):
+                if self.capture.grab():
+                    self.skipped_decodes += 1
+                    index += 1
+                    continue
+                ret, frame = False, None
+            else:
+                ret, frame = self.capture.read()
+            timestamp = time.monotonic()
+
+            if not ret:
+                if self.live:
+                    # Cameras can fail temporarily
+                    time.sleep(self.retry_delay)
+                    continue
+
+                # End of file, unless a seek arrived meanwhile
+                with self._cond:
+                    if self._seek_to is None:
+                        self.finished = True
+                        self._cond.notify_all()
+                        return
+                continue
+
+            with self._cond:
+                if len(self._frames) >= self.capacity:
+                    if self.policy == BLOCK:
+                        while (len(self._frames) >= self.capacity and not self._stop and
+                               self._seek_to is None):
+                            self._cond.wait()
+                    else:
+                        self._frames.popleft()
+                        self.dropped += 1
+
+                if self._stop:
+                    break
+                if self._seek_to is not None:
+                    continue  # Frame from before the seek
+
+                self._frames.append((frame, timestamp, index))
+                self.captured += 1
+                self._cond.notify_all()
+            index += 1
+
+        with self._cond:
+            self.finished = True
+            self._cond.notify_all()
+
+    def read(self, timeout=1.0):
+        """
+        Take the next frame from the buffer
+
+        Args:
+            timeout: Seconds to wait for a frame (None waits until one arrives)
+
+        Returns:
+            tuple: (ret, frame) like cv2.VideoCapture.read(); ret is False when no
+            frame arrived in time or the source has ended (see finished)
+        """
+        self.start()
+
+        with self._cond:
+            if not self._frames and not self.finished:
+                self._cond.wait_for(lambda: self._frames or self.finished, timeout)
+
+            if not self._frames:
+                return False, None
+
+            frame, timestamp, index = self._frames.popleft()
+            self._cond.notify_all()
+
+        if time.monotonic() - timestamp > self.late_after:
+            self.late += 1
+
+        self.timestamp = timestamp
+        self.frame_index = index
+        self.for_analysis = self.plan is None or self.plan.for_analysis(index)
+        return True, frame
+
+    def seek(self, frame):
+        """Continue reading at a frame number (file sources)"""
+        if self.live:
+            return
+
+        with self._cond:
+            self._seek_to = max(0, int(frame))
+            self._frames.clear()
+            restart = self.finished
+            self.finished = False
+            self._cond.notify_all()
+
+        # Restart the reader if it already stopped at the end of the file
+        if restart and self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            self.start()
+
+    @property
+    def frame_time(self):
+        """Source time of the last frame in seconds: position in a file, capture time for cameras"""
+        if self.live or not self.fps or self.fps <= 0:
+            return self.timestamp
+        return self.frame_index / self.fps
+
+    @property
+    def ended(self):
+        """True once a file source has ended and every frame has been consumed"""
+        with self._cond:
+            return self.finished and not self._frames
+
+    @property
+    def queued(self):
+        """Number of frames waiting in the buffer"""
+        return len(self._frames)
+
+    def get(self, prop):
+        """Forward a property query to the underlying capture"""
+        return self.capture.get(prop)
+
+    def describe(self):
+        """Short counter text for the UI"""
+        return (f"queued {self.queued}, dropped {self.dropped}, late {self.late}, "
+                f"not decoded {self.skipped_decodes}")
+
+    def release(self):
+        """Stop the reader thread and release the capture"""
+        with self._cond:
+            self._stop = True
+            self._frames.clear()
+            self._cond.notify_all()
+
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
@@ -0,0 +1,198 @@
+"""
+Utilities for deciding which frames get processed
+"""
+import time
+from collections import deque
+import cv2
+import numpy as np
+
+
+class ActivityRateController:
+    """
+    Adaptive occupancy sampling rate driven by scene activity.
+
+    Measures global motion on a thumbnail of every frame (well under a
+    millisecond of work) and lets occupancy evaluation run at full rate while the scene is
+    moving, dropping to quiet_rate once it has been still for hold_time seconds.
+    """
+
+    def __init__(self, quiet_rate=1.0, active_rate=None, motion_threshold=2.0, hold_time=3.0,
+                 thumbnail_size=(64, 36), rate_window=5.0):
+        self.quiet_rate = quiet_rate  # Evaluations per second while the lot is quiet
+        self.active_rate = active_rate  # None means every frame while there is motion
+        self.motion_threshold = motion_threshold  # Mean gray-level change that counts as motion
+        self.hold_time = hold_time  # Seconds to stay at full rate after the last motion
+        self.thumbnail_size = thumbnail_size
+        self.rate_window = rate_window  # Seconds of evaluations the reported rate covers
+
+        self.motion_level = 0.0
+        self.active = True
+        self._prev_thumb = None
+        self._last_motion = None
+        self._last_eval = None
+        self._eval_times = deque()
+
+    def reset(self):
+        """Start again at full rate"""
+        self._prev_thumb = None
+        self._last_motion = None
+        self._last_eval = None
+        self._eval_times.clear()
+        self.active = True
+
+    def measure(self, img):
+        """Return the mean absolute change of the frame thumbnail since the previous frame"""
+        thumb = cv2.resize(img, self.thumbnail_size, interpolation=cv2.INTER_AREA)
+        if thumb.ndim == 3:
+            thumb = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+
+        if self._prev_thumb is None or self._prev_thumb.shape != thumb.shape:
+            level = float('inf')  # Treat the first frame as motion
+        else:
+            level = float(np.mean(cv2.absdiff(thumb, self._prev_thumb)))
+
+        self._prev_thumb = thumb
+        self.motion_level = level
+        return level
+
+    def should_evaluate(self, img, now=None):
+        """
+        Measure scene motion and decide whether occupancy is evaluated for this frame
+
+        Args:
+            img: BGR frame
+            now: Timestamp in seconds (defaults to time.monotonic())
+
+        Returns:
+            bool: True if the frame should be evaluated
+        """
+        now = time.monotonic() if now is None else now
+
+        if self.measure(img) > self.motion_threshold:
+            self._last_motion = now
+        self.active = self._last_motion is not None and now - self._last_motion < self.hold_time
+
+        rate = self.active_rate if self.active else self.quiet_rate
+        if rate is not None and self._last_eval is not None and now - self._last_eval < 1.0 / rate:
+            return False
+
+        self._last_eval = now
+        self._eval_times.append(now)
+        while now - self._eval_times[0] > self.rate_window:
+            self._eval_times.popleft()
+        return True
+
+    @property
+    def current_rate(self):
+        """Achieved evaluation rate in Hz over the recent evaluations"""
+        if len(self._eval_times) < 2:
+            return 0.0
+
+        span = self._eval_times[-1] - self._eval_times[0]
+        return (len(self._eval_times) - 1) / span if span > 0 else 0.0
+
+    def describe(self):
+        """Short status text for the UI"""
+        state = "active" if self.active else "quiet"
+        return f"{self.current_rate:.1f} Hz ({state})"
+
+
+class DeadlineScheduler:
+    """
+    Paces a frame loop to the source frame rate.
+
+    Each frame gets a deadline from its source timestamp (frame index / FPS for
+    files, capture time for cameras) relative to when the loop started. Work
+    on a frame starts early enough for the measured processing latency to end
+    at its deadline; a frame that would still finish more than max_lag seconds
+    late is skipped so the loop catches up instead of drifting.
+    """
+
+    def __init__(self, source_fps=None, default_fps=25.0, max_lag=None, latency_smoothing=0.2,
+                 rate_window=2.0, resync_after=2.0):
+        self.default_fps = default_fps
+        self.max_lag = max_lag  # None means one frame period
+        self.latency_smoothing = latency_smoothing  # EWMA weight of the newest latency
+        self.rate_window = rate_window  # Seconds of frames the achieved FPS covers
+        self.resync_after = resync_after  # Lag in seconds after which the clock is rebased
+
+        self.target_fps = default_fps
+        self.set_source_fps(source_fps)
+
+        self.latency = 0.0  # Smoothed processing time in seconds
+        self.processed = 0
+        self.skipped = 0
+        self._base = None  # (wall clock, source time) of the first frame
+        self._done_times = deque()
+
+    def set_source_fps(self, fps):
+        """Use the source's CAP_PROP_FPS, falling back to default_fps when it is missing or bogus"""
+        if fps is None or not np.isfinite(fps) or fps <= 0 or fps > 240:
+            fps = self.default_fps
+        self.target_fps = float(fps)
+
+    @property
+    def period(self):
+        return 1.0 / self.target_fps
+
+    def reset(self):
+        """Restart the clock (e.g. after a seek or pause)"""
+        self._base = None
+        self._done_times.clear()
+
+    def delay(self, frame_time, now=None):
+        """
+        Decide when to process a frame
+
+        Args:
+            frame_time: Source timestamp of the frame in seconds
+            now: Monotonic time (defaults to time.monotonic())
+
+        Returns:
+            float: Seconds to wait before processing, or None to skip the frame
+        """
+        now = time.monotonic() if now is None else now
+        if self._base is None:
+            self._base = (now + self.latency, frame_time)
+
+        deadline = self._base[0] + (frame_time - self._base[1])
+        start_at = deadline - self.latency
+        lag = now - start_at
+
+        if lag > self.resync_after:
+            # Far behind (stall, breakpoint, slow seek): rebase instead of skipping everything
+            self._base = (now + self.latency, frame_time)
+            return 0.0
+
+        max_lag = self.period if self.max_lag is None else self.max_lag
+        if lag > max_lag:
+            self.skipped += 1
+            return None
+
+        return max(0.0, -lag)
+
+    def record(self, latency, now=None):
+        """Report the processing time of a frame that was not skipped"""
+        now = time.monotonic() if now is None else now
+        if self.processed == 0:
+            self.latency = latency
+        else:
+            self.latency += self.latency_smoothing * (latency - self.latency)
+        self.processed += 1
+
+        self._done_times.append(now)
+        while now - self._done_times[0] > self.rate_window:
+            self._done_times.popleft()
+
+    @property
+    def achieved_fps(self):
+        """Processed frames per second over the recent window"""
+        if len(self._done_times) < 2:
+            return 0.0
+
+        span = self._done_times[-1] - self._done_times[0]
+        return (len(self._done_times) - 1) / span if span > 0 else 0.0
+
+    def describe(self):
+        """Short status text for the UI"""
+        return f"{self.achieved_fps:.1f}/{self.target_fps:.1f} fps, skipped {self.skipped}"
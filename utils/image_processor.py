@@ -1,35 +1,160 @@
+import time
 import cv2
 import numpy as np
-from PIL import Image, ImageTk
-
-
-def preprocess_frame_for_parking_detection(img):
-    """Preprocess a frame for parking space detection"""
-    # Convert to grayscale
-    imgGray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    # Apply Gaussian blur
-    imgBlur = cv2.GaussianBlur(imgGray, (3, 3), 1)
-    # Apply threshold
-    imgThreshold = cv2.adaptiveThreshold(imgBlur, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                         cv2.THRESH_BINARY_INV, 25, 16)
-    # Apply blur again to smooth edges
-    imgBlur = cv2.medianBlur(imgThreshold, 5)
-    # Dilate to fill in holes
-    kernel = np.ones((3, 3), np.uint8)
-    imgDilate = cv2.dilate(imgBlur, kernel, iterations=1)
-    return imgDilate
-
-
-def process_parking_spaces(img_pro, img, pos_list, threshold, debug=False):
-    """Process and mark parking spaces in the image - optimized version"""
-    space_counter = 0
-    
+from models.occupancy_engine import OccupancyEngine
+from models.centroid_tracker import CentroidTracker
+
+
+# Structuring element shared by the dilate/erode steps
+PARKING_KERNEL = np.ones((3, 3), np.uint8)
+
+# Filter chain steps, in order, as reported by ParkingPreprocessor.timings
+PARKING_STEPS = ("gray", "blur", "threshold", "median", "dilate", "erode")
+
+
+class ParkingPreprocessor:
+    """
+    Parking filter chain with reusable buffers.
+
+    Owns the intermediate images of the grayscale -> blur -> adaptive threshold
+    -> median -> dilate (-> erode) chain and passes them to OpenCV as dst, so a
+    stream of same-sized frames is processed without per-frame allocations.
+    Buffers are resized only when the frame size changes. The returned image is
+    one of these buffers and is overwritten by the next call, so an instance
+    must not be shared between threads.
+    """
+
+    def __init__(self, erode=False):
+        self.erode = erode
+        self._shape = None
+        self._buffers = {}
+        self._output = None
+
+        # Milliseconds spent per step on the last frame, and the frame count
+        self.timings = dict.fromkeys(PARKING_STEPS, 0.0)
+        self.frames = 0
+
+    def _allocate(self, shape):
+        """(Re)allocate the buffers for a frame size"""
+        size = shape[0] * shape[1]
+        self._buffers = {step: np.empty(size, dtype=np.uint8) for step in PARKING_STEPS}
+        self._output = np.zeros(shape, dtype=np.uint8)
+        self._shape = shape
+
+    def _views(self, height, width):
+        """Contiguous (height, width) views into the scratch buffers"""
+        size = height * width
+        return [self._buffers[step][:size].reshape(height, width) for step in PARKING_STEPS]
+
+    def _run_chain(self, img, timings, dst=None):
+        """Run the filter chain on an image (or tile) and return the result (dst if given)"""
+        gray, blur, thresh, median, dilate, out = self._views(*img.shape[:2])
+        if dst is None:
+            dst = out
+
+        t0 = time.perf_counter()
+        cv2.cvtColor(img, cv2.COLOR_BGR2GRAY, dst=gray)
+        t1 = time.perf_counter()
+        cv2.GaussianBlur(gray, (3, 3), 1, dst=blur)
+        t2 = time.perf_counter()
+        cv2.adaptiveThreshold(blur, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                              cv2.THRESH_BINARY_INV, 25, 16, dst=thresh)
+        t3 = time.perf_counter()
+        cv2.medianBlur(thresh, 5, dst=median)
+        t4 = time.perf_counter()
+        cv2.dilate(median, PARKING_KERNEL, dst=dilate if self.erode else dst, iterations=1)
+        t5 = time.perf_counter()
+        if self.erode:
+            cv2.erode(dilate, PARKING_KERNEL, dst=dst, iterations=1)
+        t6 = time.perf_counter()
+
+        for step, elapsed in zip(PARKING_STEPS, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4, t6 - t5)):
+            timings[step] += elapsed * 1000
+
+        return dst
+
+    def process(self, img, tiles=None):
+        """
+        Preprocess a frame for parking space detection
+
+        Args:
+            img: BGR frame
+            tiles: Optional (tile, core) boxes from OccupancyEngine.roi_tiles. When
+                given, the filter chain only runs inside the tiles and pixels
+                outside them are left at zero; slot pixels match the full-frame result.
+
+        Returns:
+            Binarized frame of the same size as img (reused on the next call)
+        """
+        shape = img.shape[:2]
+        if shape != self._shape:
+            self._allocate(shape)
+
+        timings = dict.fromkeys(PARKING_STEPS, 0.0)
+        if tiles is None:
+            self._run_chain(img, timings, dst=self._output)
+        else:
+            self._output.fill(0)
+            for (tx0, ty0, tx1, ty1), (cx0, cy0, cx1, cy1) in tiles:
+                tile_pro = self._run_chain(img[ty0:ty1, tx0:tx1], timings)
+                self._output[cy0:cy1, cx0:cx1] = tile_pro[cy0 - ty0:cy1 - ty0, cx0 - tx0:cx1 - tx0]
+
+        self.timings = timings
+        self.frames += 1
+        return self._output
+
+    def describe(self):
+        """Short per-step timing text for the UI"""
+        steps = PARKING_STEPS if self.erode else PARKING_STEPS[:-1]
+        return " / ".join(f"{step} {self.timings[step]:.1f}" for step in steps) + " ms"
+
+
+def preprocess_frame_for_parking_detection(img, tiles=None, erode=False):
+    """
+    Preprocess a frame for parking space detection
+
+    One-off helper; streaming callers should keep a ParkingPreprocessor so the
+    buffers are reused between frames.
+
+    Args:
+        img: BGR frame
+        tiles: Optional (tile, core) boxes from OccupancyEngine.roi_tiles
+        erode: Apply the final erode step used by the live detection views
+
+    Returns:
+        Binarized frame of the same size as img
+    """
+    return ParkingPreprocessor(erode=erode).process(img, tiles)
+
+
+def process_parking_spaces(img_pro, img, pos_list, threshold, debug=False, engine=None, result=None,
+                           overlay=None):
+    """
+    Process and mark parking spaces in the image - optimized version
+
+    If an OccupancyResult for this frame is passed in, it is drawn as-is and
+    no counting is done here. With a SlotOverlayCompositor the annotations come
+    from its cached layer (except in debug mode, which draws directly).
+    """
     # Create a copy of img only if needed for drawing
     if len(pos_list) > 0:
         img_display = img  # Use direct reference to avoid copy unless needed
     else:
         return img, 0, 0, 0  # Return early if no positions
-    
+
+    # Count every slot in one vectorized pass unless already done for this frame
+    if result is None:
+        if engine is None:
+            engine = OccupancyEngine()
+        result = engine.evaluate(img_pro, pos_list, threshold)
+    counts = result.counts
+    free_mask = result.free
+
+    # Composite the cached annotation layer
+    if overlay is not None and not debug:
+        overlay.draw(img_display, result)
+        return img_display, result.free_spaces, result.occupied_spaces, result.total_spaces
+
     # Precompute font and colors to avoid recreation
     font = cv2.FONT_HERSHEY_SIMPLEX
     green_color = (0, 255, 0)
@@ -42,87 +167,62 @@ def process_parking_spaces(img_pro, img, pos_list, threshold, debug=False):
         cv2.putText(img_display, f"Image size: {img_width}x{img_height}", (10, 20),
                     font, 0.5, yellow_color, 1)
 
-    for i, (x, y, w, h) in enumerate(pos_list):
-        # Ensure coordinates are within image bounds and are integers
-        if (y >= 0 and y + h < img_pro.shape[0] and x >= 0 and x + w < img_pro.shape[1]):
-            # Convert coordinates to integers to avoid the error
-            x, y, w, h = int(x), int(y), int(w), int(h)
-
-            # Add box number and coordinates in debug mode
-            if debug:
-                coord_text = f"Box {i}: ({x},{y})"
-                cv2.putText(img_display, coord_text, (x, y - 5),
-                            font, 0.4, yellow_color, 1)
-
-            # Only extract the crop we need
-            img_crop = img_pro[y:y + h, x:x + w]
-            
-            # Optimize counting - use sum instead of countNonZero for better performance
-            count = np.sum(img_crop > 0)
-
-            if count < threshold:
-                color = green_color  # Green for free
-                space_counter += 1
-            else:
-                color = red_color  # Red for occupied
-
-            # Draw ID number for each space
-            cv2.putText(img_display, str(i), (x + 5, y + 15),
-                        font, 0.5, yellow_color, 2)
-                        
-            # Draw rectangle and count
+    # Only draw slots that lie inside the image
+    for i in np.flatnonzero(result.valid):
+        x, y, w, h = (int(v) for v in result.slots[i])
+        count = int(counts[i])
+
+        # Add box number and coordinates in debug mode
+        if debug:
+            coord_text = f"Box {i}: ({x},{y})"
+            cv2.putText(img_display, coord_text, (x, y - 5),
+                        font, 0.4, yellow_color, 1)
+
+        color = green_color if free_mask[i] else red_color
+
+        # Draw ID number for each space
+        cv2.putText(img_display, str(i), (x + 5, y + 15),
+                    font, 0.5, yellow_color, 2)
+
+        # Draw outline and count
+        if i in result.polygons:
+            cv2.polylines(img_display, [result.polygons[i].reshape(-1, 1, 2)], True, color, 2)
+        else:
             cv2.rectangle(img_display, (x, y), (x + w, y + h), color, 2)
-            cv2.putText(img_display, str(count), (x, y + h - 3), font,
-                        0.5, color, 2)
+        cv2.putText(img_display, str(count), (x, y + h - 3), font,
+                    0.5, color, 2)
 
-    free_spaces = space_counter
-    total_spaces = len(pos_list)
-    occupied_spaces = total_spaces - free_spaces
+    free_spaces = result.free_spaces
+    total_spaces = result.total_spaces
+    occupied_spaces = result.occupied_spaces
 
     return img_display, free_spaces, occupied_spaces, total_spaces
 
 
 def detect_vehicles_traditional(current_frame, prev_frame, line_height, min_contour_width, min_contour_height, offset,
-                                matches, vehicles_count):
+                                matches, vehicles_count, motion=None):
     """
     Detect vehicles using traditional computer vision - optimized version
+
+    With a MotionEngine, blobs come from its background model and prev_frame
+    is not used (it may be None); otherwise the two frames are differenced.
+    matches is a CentroidTracker (or a legacy centroid list) and is returned
+    updated.
     """
     # Only create a copy of the frame if we need to draw on it
     display_frame = current_frame.copy()
 
-    # Calculate absolute difference between frames
-    d = cv2.absdiff(prev_frame, current_frame)
-    grey = cv2.cvtColor(d, cv2.COLOR_BGR2GRAY)
-
-    # Apply blur and threshold
-    blur = cv2.GaussianBlur(grey, (5, 5), 0)
-    ret, th = cv2.threshold(blur, 20, 255, cv2.THRESH_BINARY)
-
-    # Apply dilation and morphology operations
-    # Optimize by combining operations when possible
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2, 2))
-    closing = cv2.morphologyEx(cv2.dilate(th, np.ones((3, 3))), cv2.MORPH_CLOSE, kernel)
-
-    # Find contours - use EXTERNAL type for faster processing
-    contours, h = cv2.findContours(closing, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-    # Make a copy of matches only if needed (if we have contours)
-    if not contours:
-        # Draw detection line
-        cv2.line(display_frame, (0, line_height), (display_frame.shape[1], line_height), (0, 255, 0), 2)
-        cv2.putText(display_frame, f"Total Vehicle Detected: {vehicles_count}",
-                    (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 170, 0), 2)
-        return display_frame, matches, vehicles_count
+    if motion is not None:
+        boxes = motion.blobs(current_frame, min_contour_width, min_contour_height)
+    else:
+        boxes = frame_difference_boxes(current_frame, prev_frame)
 
-    matches_copy = matches.copy()
+    centroids = []
 
     # Draw detection line
     cv2.line(display_frame, (0, line_height), (display_frame.shape[1], line_height), (0, 255, 0), 2)
 
-    # Process each contour - reduce the number processed if there are too many
-    max_contours = 50  # Maximum contours to process for performance
-    for (i, c) in enumerate(contours[:max_contours]):
-        (x, y, w, h) = cv2.boundingRect(c)
+    for (x, y, w, h) in boxes:
         contour_valid = (w >= min_contour_width) and (h >= min_contour_height)
 
         if not contour_valid:
@@ -136,29 +236,74 @@ def detect_vehicles_traditional(current_frame, prev_frame, line_height, min_cont
         cy = y + h // 2
         centroid = (cx, cy)
 
-        # Add centroid to matches list
-        matches_copy.append(centroid)
+        # Add centroid for this frame's matching
+        centroids.append(centroid)
 
         # Draw centroid
         cv2.circle(display_frame, centroid, 5, (0, 255, 0), -1)
 
     # Count vehicles crossing the line
+    new_matches, new_vehicles_count = count_line_crossings(matches, centroids, line_height, offset,
+                                                           vehicles_count)
+
+    # Display vehicle count
+    cv2.putText(display_frame, f"Total Vehicle Detected: {new_vehicles_count}",
+                (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 170, 0), 2)
+
+    return display_frame, new_matches, new_vehicles_count
+
+
+def count_line_crossings(matches, centroids, line_height, offset, vehicles_count):
+    """
+    Count the vehicles of a frame that crossed the counting line
+
+    Args:
+        matches: CentroidTracker, or a legacy list of centroids not yet counted
+        centroids: (x, y) centroids detected in this frame
+
+    Returns:
+        tuple: (updated matches, new vehicle count)
+    """
+    if isinstance(matches, CentroidTracker):
+        return matches, vehicles_count + matches.update(centroids, line_height, offset)
+
     new_vehicles_count = vehicles_count
     new_matches = []
-
-    for (x, y) in matches_copy:
+    for (x, y) in list(matches or []) + list(centroids):
         # Check if centroid is near the line
         if line_height - offset < y < line_height + offset:
             new_vehicles_count += 1
         else:
             # Keep centroids that haven't crossed the line
             new_matches.append((x, y))
+    return new_matches, new_vehicles_count
 
-    # Display vehicle count
-    cv2.putText(display_frame, f"Total Vehicle Detected: {new_vehicles_count}",
-                (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 170, 0), 2)
 
-    return display_frame, new_matches, new_vehicles_count
+def frame_difference_boxes(current_frame, prev_frame, max_contours=50):
+    """
+    Bounding boxes of the regions that changed between two frames
+
+    Returns:
+        list: (x, y, w, h) of at most max_contours difference contours
+    """
+    # Calculate absolute difference between frames
+    d = cv2.absdiff(prev_frame, current_frame)
+    grey = cv2.cvtColor(d, cv2.COLOR_BGR2GRAY)
+
+    # Apply blur and threshold
+    blur = cv2.GaussianBlur(grey, (5, 5), 0)
+    ret, th = cv2.threshold(blur, 20, 255, cv2.THRESH_BINARY)
+
+    # Apply dilation and morphology operations
+    # Optimize by combining operations when possible
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2, 2))
+    closing = cv2.morphologyEx(cv2.dilate(th, np.ones((3, 3))), cv2.MORPH_CLOSE, kernel)
+
+    # Find contours - use EXTERNAL type for faster processing
+    contours, h = cv2.findContours(closing, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    # Reduce the number processed if there are too many
+    return [cv2.boundingRect(c) for c in contours[:max_contours]]
 
 
 def process_ml_detections(frame, detections, line_height, offset, matches, vehicles_count, class_names):
@@ -168,8 +313,7 @@ def process_ml_detections(frame, detections, line_height, offset, matches, vehic
     # Draw detection line
     cv2.line(display_frame, (0, line_height), (display_frame.shape[1], line_height), (0, 255, 0), 2)
 
-    # Make a deep copy of matches list
-    matches_copy = matches.copy() if matches is not None else []
+    centroids = []
 
     # Handle case where detections might be None
     if detections is None:
@@ -205,20 +349,14 @@ def process_ml_detections(frame, detections, line_height, offset, matches, vehic
                         (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
 
         # Add centroid
-        matches_copy.append(centroid)
+        centroids.append(centroid)
 
         # Draw centroid
         cv2.circle(display_frame, centroid, 5, (0, 0, 255), -1)
 
     # Count vehicles crossing the line
-    new_vehicles_count = vehicles_count
-    new_matches = []
-
-    for (x, y) in matches_copy:
-        if line_height - offset < y < line_height + offset:
-            new_vehicles_count += 1
-        else:
-            new_matches.append((x, y))
+    new_matches, new_vehicles_count = count_line_crossings(matches, centroids, line_height, offset,
+                                                           vehicles_count)
 
     # Display vehicle count
     cv2.putText(display_frame, f"Total Vehicle Detected: {new_vehicles_count}",
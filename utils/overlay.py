@@ -0,0 +1,193 @@
+"""
+Cached overlay layer for parking slot annotations
+"""
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+FREE_COLOR = (0, 255, 0)
+OCCUPIED_COLOR = (0, 0, 255)
+LABEL_COLOR = (255, 255, 0)
+LINE_COLOR = (0, 255, 0)
+
+
+class SlotOverlayCompositor:
+    """
+    Draws slot outlines, IDs and counts from a cached layer.
+
+    The annotations of the live view (see process_parking_spaces) are kept in
+    a premultiplied BGR layer with an alpha mask, so anti-aliased text blends
+    like text drawn on the frame. The whole layer is rendered once per layout;
+    after that only slots whose state or count label changed are cleared and
+    redrawn (together with the slots overlapping them), and every frame is
+    blended with the layer in one vectorized pass instead of a rectangle and
+    two putText calls per slot.
+    """
+
+    def __init__(self, font_scale=0.5, thickness=2, margin=2):
+        self.font_scale = font_scale
+        self.thickness = thickness
+        self.margin = margin  # Extra pixels around every region for anti-aliased edges
+
+        self._key = None  # (layout version, frame shape, line_y) the layer was built for
+        self.layer = None  # Annotations drawn on black (colour premultiplied by alpha)
+        self.alpha = None  # Coverage of the annotations, 0-255 per channel
+        self._inv_alpha = None  # 255 - alpha, the share of the frame that shows through
+        self._bounds = None  # (x0, y0, x1, y1) of the area the layer can draw into
+
+        # Per-slot state the layer currently shows
+        self._free = None
+        self._counts = None
+        self._regions = None  # (N, 4) x0, y0, x1, y1 of everything a slot draws
+        self._overlaps = None  # (N, N) slots whose regions intersect
+
+        # Counters
+        self.rebuilds = 0
+        self.redrawn_slots = 0
+
+    def invalidate(self):
+        """Rebuild the layer on the next frame"""
+        self._key = None
+
+    def _slot_regions(self, result):
+        """Bounding box of the outline, ID and count label of every slot"""
+        regions = np.zeros((len(result.slots), 4), dtype=np.intp)
+        pad = self.thickness + self.margin
+        height, width = result.frame_shape
+
+        for i in np.flatnonzero(result.valid):
+            x, y, w, h = (int(v) for v in result.slots[i])
+            x0, y0, x1, y1 = x - pad, y - pad, x + w + pad, y + h + pad
+
+            # ID label at the top left
+            (tw, th), base = cv2.getTextSize(str(i), FONT, self.font_scale, self.thickness)
+            x1 = max(x1, x + 5 + tw + pad)
+            y0 = min(y0, y + 15 - th - pad)
+            y1 = max(y1, y + 15 + base + pad)
+
+            # Count label at the bottom left (a count never exceeds the slot area)
+            digits = len(str(max(w * h, 10)))
+            (tw, th), base = cv2.getTextSize("8" * digits, FONT, self.font_scale, self.thickness)
+            x1 = max(x1, x + tw + pad)
+            y0 = min(y0, y + h - 3 - th - pad)
+            y1 = max(y1, y + h - 3 + base + pad)
+
+            regions[i] = (max(x0, 0), max(y0, 0), min(x1, width), min(y1, height))
+        return regions
+
+    def _build(self, result, line_y):
+        """Allocate the layer for a new layout and draw every slot"""
+        height, width = result.frame_shape
+        self.layer = np.zeros((height, width, 3), dtype=np.uint8)
+        self.alpha = np.zeros((height, width, 3), dtype=np.uint8)
+        self._regions = self._slot_regions(result)
+
+        # Only the part of the frame covered by slots (and the line) needs blending
+        r = self._regions
+        if line_y is not None:
+            self._bounds = (0, 0, width, height)
+        elif result.valid.any():
+            valid = r[result.valid]
+            self._bounds = (valid[:, 0].min(), valid[:, 1].min(), valid[:, 2].max(), valid[:, 3].max())
+        else:
+            self._bounds = (0, 0, 0, 0)
+
+        self._overlaps = ((r[:, None, 0] < r[None, :, 2]) & (r[None, :, 0] < r[:, None, 2]) &
+                          (r[:, None, 1] < r[None, :, 3]) & (r[None, :, 1] < r[:, None, 3]))
+        self._overlaps &= result.valid[:, None] & result.valid[None, :]
+
+        if line_y is not None:
+            self._draw_line(self.layer, self.alpha, 0, 0, line_y)
+
+        self._free = result.free.copy()
+        self._counts = result.counts.copy()
+        for i in np.flatnonzero(result.valid):
+            self._draw_slot(result, i)
+        self._inv_alpha = 255 - self.alpha
+
+        self.rebuilds += 1
+        self.redrawn_slots += int(np.count_nonzero(result.valid))
+
+    @staticmethod
+    def _draw_line(layer, alpha, x0, y0, line_y):
+        """Draw the counting line into (a region of) the layer; x0, y0 is the region origin"""
+        width = layer.shape[1] + x0
+        for target, color in ((layer, LINE_COLOR), (alpha, (255, 255, 255))):
+            cv2.line(target, (-x0, line_y - y0), (width - x0, line_y - y0), color, 2)
+
+    def _draw_slot(self, result, i, region=None):
+        """
+        Draw one slot into the layer and its coverage into the alpha mask
+
+        Args:
+            region: Optional (x0, y0, x1, y1) the drawing is clipped to
+        """
+        x0, y0, x1, y1 = region if region is not None else (0, 0, self.layer.shape[1], self.layer.shape[0])
+        x, y, w, h = (int(v) for v in result.slots[i])
+        x, y = x - x0, y - y0
+        color = FREE_COLOR if result.free[i] else OCCUPIED_COLOR
+        count = str(int(result.counts[i]))
+
+        for target, opaque in ((self.layer[y0:y1, x0:x1], False), (self.alpha[y0:y1, x0:x1], True)):
+            white = (255, 255, 255)
+            cv2.putText(target, str(i), (x + 5, y + 15), FONT, self.font_scale,
+                        white if opaque else LABEL_COLOR, self.thickness)
+            if i in result.polygons:
+                outline = result.polygons[i].reshape(-1, 1, 2) - np.array([x0, y0], dtype=result.polygons[i].dtype)
+                cv2.polylines(target, [outline], True, white if opaque else color, 2)
+            else:
+                cv2.rectangle(target, (x, y), (x + w, y + h), white if opaque else color, 2)
+            cv2.putText(target, count, (x, y + h - 3), FONT, self.font_scale,
+                        white if opaque else color, self.thickness)
+
+    def _update(self, result, line_y):
+        """Redraw the slots whose state or count changed since the layer was drawn"""
+        dirty = result.valid & ((result.free != self._free) | (result.counts != self._counts))
+        if not dirty.any():
+            return
+
+        # Clear each changed slot's region, then redraw it and every slot reaching into it in
+        # layer order, clipped to the region so pixels outside keep their stacking
+        for i in np.flatnonzero(dirty):
+            region = self._regions[i]
+            x0, y0, x1, y1 = region
+            self.layer[y0:y1, x0:x1] = 0
+            self.alpha[y0:y1, x0:x1] = 0
+            if line_y is not None and y0 - 2 <= line_y < y1 + 2:
+                self._draw_line(self.layer[y0:y1, x0:x1], self.alpha[y0:y1, x0:x1], x0, y0, line_y)
+
+            redraw = np.flatnonzero(self._overlaps[i])
+            for j in redraw:
+                self._draw_slot(result, j, region)
+            np.subtract(255, self.alpha[y0:y1, x0:x1], out=self._inv_alpha[y0:y1, x0:x1])
+            self.redrawn_slots += len(redraw)
+
+        self._free = result.free.copy()
+        self._counts = result.counts.copy()
+
+    def draw(self, img, result, line_y=None):
+        """
+        Draw the slot annotations of an OccupancyResult onto a frame (in place)
+
+        Args:
+            img: BGR frame at result.frame_shape
+            result: OccupancyResult of this frame
+            line_y: Optional y of a counting line to include in the layer
+
+        Returns:
+            The annotated img
+        """
+        key = (result.layout_version, tuple(img.shape[:2]), line_y)
+        if key != self._key or len(self._free) != len(result.free):
+            self._key = key
+            self._build(result, line_y)
+        else:
+            self._update(result, line_y)
+
+        # Blend: frame * (1 - alpha) + premultiplied layer, over the covered area only
+        x0, y0, x1, y1 = self._bounds
+        if x1 > x0 and y1 > y0:
+            roi = img[y0:y1, x0:x1]
+            cv2.multiply(roi, self._inv_alpha[y0:y1, x0:x1], dst=roi, scale=1 / 255)
+            cv2.add(roi, self.layer[y0:y1, x0:x1], dst=roi)
+        return img
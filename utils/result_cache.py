@@ -0,0 +1,259 @@
+"""
+On-disk cache of per-frame analysis results for replaying processed videos
+
+Results are stored in one SQLite file, keyed by a fingerprint of the video
+content, the frame index and a hash of every setting that affects the result
+(threshold, slot layout, processing scale, detector backend, confidence...).
+A replay with the same settings reads slot states and detection boxes back
+instead of re-running the preprocessing or the ML detector; any change of
+settings produces a different key, so stale results are never served.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import numpy as np
+
+DEFAULT_CACHE_PATH = os.path.join("cache", "analysis_results.sqlite")
+
+# Bytes read from the start, middle and end of a video for its fingerprint
+FINGERPRINT_SAMPLE = 1 << 20
+
+# Settings combinations kept per video; older ones are deleted
+MAX_RUNS_PER_VIDEO = 4
+
+# Columns of a stored detection: x1, y1, x2, y2, score, label
+DETECTION_FIELDS = 6
+
+
+def video_fingerprint(video_path, sample_bytes=FINGERPRINT_SAMPLE):
+    """
+    Content hash of a video file
+
+    Hashes the size and three samples of the file instead of the whole
+    recording, so it takes milliseconds even for long videos.
+    """
+    size = os.path.getsize(video_path)
+    digest = hashlib.sha1(str(size).encode())
+    with open(video_path, 'rb') as f:
+        for offset in (0, max(0, size // 2 - sample_bytes // 2), max(0, size - sample_bytes)):
+            f.seek(offset)
+            digest.update(f.read(sample_bytes))
+    return digest.hexdigest()
+
+
+def layout_key(pos_list):
+    """Hash of a slot layout (rectangles or polygons)"""
+    normalized = [[list(p) if isinstance(p, (list, tuple)) else p for p in pos] for pos in pos_list]
+    return hashlib.sha1(json.dumps(normalized).encode()).hexdigest()[:16]
+
+
+def parking_settings(threshold, layout, processing_scale=1.0, motion_gating=True, adaptive_sampling=False):
+    """Settings that decide the parking result of a frame"""
+    return {'mode': 'parking', 'threshold': int(threshold), 'layout': layout,
+            'scale': float(processing_scale), 'gating': bool(motion_gating),
+            'adaptive': bool(adaptive_sampling)}
+
+
+def detector_settings(backend, confidence, frame_size):
+    """Settings that decide the ML detections of a frame"""
+    return {'mode': 'vehicle', 'backend': str(backend), 'confidence': round(float(confidence), 4),
+            'size': list(frame_size)}
+
+
+class ResultCache:
+    """
+    Per-frame slot states and detection boxes of analyzed videos
+
+    bind() selects the video and settings; get_*/put_* then read and write
+    results by frame index. Writes are batched into one transaction per
+    batch_size frames. Safe to use from the analysis thread.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, batch_size=100):
+        self.path = path
+        self.batch_size = batch_size
+
+        self._conn = None  # Opened on first bind
+        self._lock = threading.Lock()
+        self._pending = {}  # Frame -> row waiting to be written
+
+        self.video_path = None
+        self.video_key = None
+        self.settings = None
+        self.settings_key = None
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        """Open the database and create the tables"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS runs (video TEXT, settings TEXT, params TEXT, "
+                "used REAL, PRIMARY KEY (video, settings))")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS frames (video TEXT, settings TEXT, frame INTEGER, "
+                "counts BLOB, free BLOB, detections BLOB, PRIMARY KEY (video, settings, frame)) "
+                "WITHOUT ROWID")
+            self._conn.commit()
+        return self._conn
+
+    def bind(self, video_path, settings):
+        """
+        Select the video and settings later lookups refer to
+
+        Cheap when nothing changed, so it can be called for every frame.
+        """
+        if video_path == self.video_path and settings == self.settings:
+            return
+
+        with self._lock:
+            self._flush_locked()
+            conn = self._connect()
+
+            if video_path != self.video_path:
+                self.video_key = video_fingerprint(video_path)
+                self.video_path = video_path
+
+            params = json.dumps(settings, sort_keys=True)
+            self.settings = dict(settings)
+            self.settings_key = hashlib.sha1(params.encode()).hexdigest()[:16]
+
+            conn.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, julianday('now'))",
+                         (self.video_key, self.settings_key, params))
+            self._prune_runs(conn)
+            conn.commit()
+
+    def _prune_runs(self, conn):
+        """Drop the results of the least recently used settings of this video"""
+        stale = conn.execute(
+            "SELECT settings FROM runs WHERE video = ? ORDER BY used DESC LIMIT -1 OFFSET ?",
+            (self.video_key, MAX_RUNS_PER_VIDEO)).fetchall()
+        for (settings_key,) in stale:
+            conn.execute("DELETE FROM frames WHERE video = ? AND settings = ?", (self.video_key, settings_key))
+            conn.execute("DELETE FROM runs WHERE video = ? AND settings = ?", (self.video_key, settings_key))
+
+    def _get(self, frame):
+        """Stored row of a frame for the bound video and settings, or None"""
+        if self.settings_key is None:
+            return None
+
+        with self._lock:
+            row = self._pending.get(frame)
+            if row is None:
+                row = self._conn.execute(
+                    "SELECT counts, free, detections FROM frames WHERE video = ? AND settings = ? AND frame = ?",
+                    (self.video_key, self.settings_key, frame)).fetchone()
+
+        if row is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return row
+
+    def _put(self, frame, counts=None, free=None, detections=None):
+        if self.settings_key is None:
+            return
+
+        with self._lock:
+            self._pending[frame] = (counts, free, detections)
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+
+    def get_slots(self, frame, slot_count):
+        """
+        Cached slot counts and free mask of a frame
+
+        Returns:
+            tuple: (counts, free) arrays, or None if the frame is not cached
+        """
+        row = self._get(frame)
+        if row is None or row[0] is None:
+            return None
+
+        counts = np.frombuffer(row[0], dtype=np.int32).astype(np.int64)
+        if len(counts) != slot_count:
+            return None
+        free = np.unpackbits(np.frombuffer(row[1], dtype=np.uint8), count=slot_count).astype(bool)
+        return counts, free
+
+    def put_slots(self, frame, counts, free):
+        """Store the slot counts and free mask of a frame"""
+        self._put(frame, counts=np.asarray(counts, dtype=np.int32).tobytes(),
+                  free=np.packbits(np.asarray(free, dtype=bool)).tobytes())
+
+    def get_detections(self, frame):
+        """
+        Cached ML detections of a frame
+
+        Returns:
+            list: [[x1, y1, x2, y2], score, label] entries, or None if the frame is not cached
+        """
+        row = self._get(frame)
+        if row is None or row[2] is None:
+            return None
+
+        boxes = np.frombuffer(row[2], dtype=np.float32).reshape(-1, DETECTION_FIELDS)
+        return [[[int(v) for v in box[:4]], float(box[4]), int(box[5])] for box in boxes]
+
+    def put_detections(self, frame, detections):
+        """Store the ML detections ([box, score, label, ...] entries) of a frame"""
+        boxes = np.empty((len(detections), DETECTION_FIELDS), dtype=np.float32)
+        for i, detection in enumerate(detections):
+            box, score, label = detection[:3]
+            boxes[i, :4] = box[:4]
+            boxes[i, 4] = score
+            boxes[i, 5] = label
+        self._put(frame, detections=boxes.tobytes())
+
+    def _flush_locked(self):
+        if not self._pending or self._conn is None:
+            self._pending.clear()
+            return
+
+        rows = [(self.video_key, self.settings_key, frame) + values for frame, values in self._pending.items()]
+        try:
+            self._conn.executemany("INSERT OR REPLACE INTO frames VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error writing result cache: {str(e)}")
+        self._pending.clear()
+
+    def flush(self):
+        """Write pending results to disk"""
+        with self._lock:
+            self._flush_locked()
+
+    def clear(self):
+        """Delete every cached result"""
+        with self._lock:
+            self._pending.clear()
+            conn = self._connect()
+            conn.execute("DELETE FROM frames")
+            conn.execute("DELETE FROM runs")
+            conn.commit()
+            self.settings = self.settings_key = None
+
+    def describe(self):
+        """Short hit/miss text for the UI"""
+        total = self.hits + self.misses
+        rate = 100.0 * self.hits / total if total else 0.0
+        return f"cache hits {self.hits}/{total} ({rate:.0f}%)"
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self.video_path = self.video_key = None
+            self.settings = self.settings_key = None
@@ -0,0 +1,101 @@
+"""
+Helpers for parking slot shapes
+
+A slot in posList is either an axis-aligned rectangle (x, y, w, h) or a
+polygon given as a tuple of (x, y) points, e.g. ((10, 5), (70, 15), (60, 100), (0, 90))
+for an angled stall.
+"""
+import cv2
+import numpy as np
+
+
+def is_polygon(slot):
+    """Check whether a slot is a polygon (tuple of points) rather than (x, y, w, h)"""
+    return len(slot) > 0 and isinstance(slot[0], (tuple, list, np.ndarray))
+
+
+def slot_points(slot):
+    """Return the outline of a slot as an (N, 2) int32 array"""
+    if is_polygon(slot):
+        return np.round(np.asarray(slot, dtype=np.float64)).astype(np.int32).reshape(-1, 2)
+
+    x, y, w, h = (int(v) for v in slot)
+    return np.array([(x, y), (x + w, y), (x + w, y + h), (x, y + h)], dtype=np.int32)
+
+
+def slot_bounds(slot):
+    """Return the integer bounding box (x, y, w, h) of a slot"""
+    if is_polygon(slot):
+        return cv2.boundingRect(slot_points(slot))
+
+    return tuple(int(v) for v in slot)
+
+
+def layout_bounds(pos_list):
+    """Return the bounding boxes of a whole layout as an (N, 4) int32 array of x, y, w, h"""
+    if len(pos_list) == 0:
+        return np.empty((0, 4), dtype=np.int32)
+
+    if not any(is_polygon(slot) for slot in pos_list):
+        # int() truncation, matching the original per-slot conversion
+        return np.asarray(pos_list, dtype=np.float64).reshape(-1, 4).astype(np.int32)
+
+    return np.array([slot_bounds(slot) for slot in pos_list], dtype=np.int32).reshape(-1, 4)
+
+
+def same_layout(pos_list, snapshot):
+    """
+    Check that a slot list still holds the slots of a snapshot taken with list(pos_list)
+
+    Catches in-place edits (pop + append, item replacement) that keep the list
+    object and its length; unchanged items are matched by identity first.
+    """
+    if snapshot is None or len(pos_list) != len(snapshot):
+        return False
+    return all(slot is old or slot == old for slot, old in zip(pos_list, snapshot))
+
+
+def scale_slot(slot, width_scale, height_scale):
+    """Scale a slot to another frame size, keeping its shape type"""
+    if is_polygon(slot):
+        return tuple((int(px * width_scale), int(py * height_scale)) for px, py in slot)
+
+    x, y, w, h = slot
+    return int(x * width_scale), int(y * height_scale), int(w * width_scale), int(h * height_scale)
+
+
+def shift_slot(slot, dx, dy):
+    """Move a slot by (dx, dy), keeping its shape type"""
+    if is_polygon(slot):
+        return tuple((px + dx, py + dy) for px, py in slot)
+
+    x, y, w, h = slot
+    return x + dx, y + dy, w, h
+
+
+def slot_contains(slot, px, py):
+    """Check whether a point lies inside a slot"""
+    if is_polygon(slot):
+        return cv2.pointPolygonTest(slot_points(slot).reshape(-1, 1, 2), (float(px), float(py)), False) >= 0
+
+    x, y, w, h = slot
+    return x <= px <= x + w and y <= py <= y + h
+
+
+def is_valid_slot(slot):
+    """Check that a loaded slot is a positive rectangle or a polygon with at least 3 points"""
+    if is_polygon(slot):
+        return (len(slot) >= 3 and
+                all(len(p) == 2 and all(isinstance(c, (int, float)) and c >= 0 for c in p) for p in slot))
+
+    return (len(slot) == 4 and all(isinstance(c, (int, float)) for c in slot) and
+            slot[0] >= 0 and slot[1] >= 0 and slot[2] > 0 and slot[3] > 0)
+
+
+def draw_slot(img, slot, color, thickness=2):
+    """Draw a slot outline on an image"""
+    if is_polygon(slot):
+        cv2.polylines(img, [slot_points(slot).reshape(-1, 1, 2)], True, color, thickness)
+    else:
+        x, y, w, h = (int(v) for v in slot)
+        cv2.rectangle(img, (x, y), (x + w, y + h), color, thickness)
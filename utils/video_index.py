@@ -0,0 +1,218 @@
+"""
+Keyframe and timestamp index for recorded videos
+
+The index is built once by walking the file's packets (no decoding when the
+FFmpeg backend supports raw mode) and cached as JSON beside the video, e.g.
+media/videos/carPark.mp4.index.json. It maps timestamps to frame numbers and
+knows the keyframes, so the detection view can seek and scrub without
+decoding from the start of the recording.
+"""
+import bisect
+import json
+import os
+import threading
+import cv2
+import numpy as np
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".index.json"
+
+# Largest deviation (ms) from index * 1000 / fps for a video to count as constant frame rate
+CFR_TOLERANCE_MS = 2.0
+
+
+def index_path(video_path):
+    """Cache file that belongs to a video"""
+    return f"{video_path}{INDEX_SUFFIX}"
+
+
+class VideoIndex:
+    """
+    Frame timestamps and keyframe positions of one video file
+    """
+
+    def __init__(self, video_path, fps, frame_count, keyframes, timestamps_ms=None):
+        self.video_path = video_path
+        self.fps = fps
+        self.frame_count = frame_count
+        self.keyframes = list(keyframes)  # Sorted frame numbers; empty if unknown
+
+        # Per-frame timestamps, only kept for variable frame rate videos
+        self.timestamps_ms = None if timestamps_ms is None else np.asarray(timestamps_ms, dtype=np.float64)
+
+    @property
+    def duration(self):
+        """Length of the video in seconds"""
+        return self.time_of(self.frame_count) if self.frame_count else 0.0
+
+    def time_of(self, frame):
+        """Timestamp in seconds of a frame number"""
+        if self.timestamps_ms is not None and 0 <= frame < len(self.timestamps_ms):
+            return float(self.timestamps_ms[frame]) / 1000.0
+        return frame / self.fps if self.fps else 0.0
+
+    def frame_at(self, seconds):
+        """Frame number shown at a timestamp (O(1) for constant frame rate, O(log n) otherwise)"""
+        if self.frame_count <= 0:
+            return 0
+
+        if self.timestamps_ms is not None:
+            frame = int(np.searchsorted(self.timestamps_ms, seconds * 1000.0, side='right')) - 1
+        else:
+            frame = int(seconds * self.fps) if self.fps else 0
+        return min(max(frame, 0), self.frame_count - 1)
+
+    def keyframe_before(self, frame):
+        """Nearest keyframe at or before a frame (the frame itself if keyframes are unknown)"""
+        if not self.keyframes:
+            return frame
+
+        i = bisect.bisect_right(self.keyframes, frame) - 1
+        return self.keyframes[max(i, 0)]
+
+    def seek_target(self, seconds, exact=True):
+        """
+        Frame to position the capture at for a timestamp
+
+        Args:
+            seconds: Target time
+            exact: False snaps to the preceding keyframe, which needs no decoding
+                forward (fast scrubbing); True returns the exact frame
+        """
+        frame = self.frame_at(seconds)
+        return frame if exact else self.keyframe_before(frame)
+
+    # Building and caching
+
+    @classmethod
+    def build(cls, video_path, stop_event=None):
+        """
+        Walk the video once and build its index
+
+        Returns:
+            VideoIndex, or None if the file cannot be read
+        """
+        cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG)
+        try:
+            if not cap.isOpened():
+                return None
+
+            fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+
+            # Raw mode hands out encoded packets without decoding them
+            raw = cap.set(cv2.CAP_PROP_FORMAT, -1)
+
+            keyframes = []
+            timestamps = []
+            frame = 0
+            while cap.grab():
+                if stop_event is not None and stop_event.is_set():
+                    return None
+                if raw and cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                    keyframes.append(frame)
+                timestamps.append(cap.get(cv2.CAP_PROP_POS_MSEC))
+                frame += 1
+        finally:
+            cap.release()
+
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        if fps <= 0 and frame > 1 and timestamps[-1] > 0:
+            fps = (frame - 1) * 1000.0 / timestamps[-1]
+
+        # Constant frame rate videos are described by their fps alone
+        if fps > 0 and frame > 0:
+            expected = np.arange(frame) * 1000.0 / fps
+            if np.max(np.abs(timestamps - expected)) <= CFR_TOLERANCE_MS:
+                timestamps = None
+
+        return cls(video_path, fps, frame, keyframes, timestamps)
+
+    def to_dict(self):
+        stat = os.stat(self.video_path)
+        data = {
+            'version': INDEX_VERSION,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'fps': self.fps,
+            'frame_count': self.frame_count,
+            'keyframes': self.keyframes
+        }
+        if self.timestamps_ms is not None:
+            data['timestamps_ms'] = np.round(self.timestamps_ms, 3).tolist()
+        return data
+
+    def save(self):
+        """Write the index beside the video; returns False if that is not possible"""
+        try:
+            with open(index_path(self.video_path), 'w') as f:
+                json.dump(self.to_dict(), f)
+            return True
+        except Exception as e:
+            print(f"Error saving video index: {str(e)}")
+            return False
+
+    @classmethod
+    def load(cls, video_path):
+        """Load the cached index, or None if it is missing or the video changed"""
+        try:
+            with open(index_path(video_path)) as f:
+                data = json.load(f)
+
+            stat = os.stat(video_path)
+            if (data.get('version') != INDEX_VERSION or data.get('size') != stat.st_size or
+                    data.get('mtime') != stat.st_mtime):
+                return None
+
+            return cls(video_path, data['fps'], data['frame_count'], data['keyframes'],
+                       data.get('timestamps_ms'))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @classmethod
+    def load_or_build(cls, video_path, stop_event=None):
+        """Return the cached index, building and caching it first if needed"""
+        index = cls.load(video_path)
+        if index is None:
+            index = cls.build(video_path, stop_event)
+            if index is not None:
+                index.save()
+        return index
+
+
+class VideoIndexLoader:
+    """
+    Builds (or loads) a video index on a background thread
+    """
+
+    def __init__(self, video_path, on_ready=None):
+        """
+        Args:
+            video_path: Video file to index
+            on_ready: Optional callable(VideoIndex) run on the loader thread when done
+        """
+        self.video_path = video_path
+        self.on_ready = on_ready
+        self.index = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="VideoIndexLoader", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self.index = VideoIndex.load_or_build(self.video_path, self._stop)
+        except Exception as e:
+            print(f"Error building video index: {str(e)}")
+            self.index = None
+
+        if self.index is not None and self.on_ready and not self._stop.is_set():
+            self.on_ready(self.index)
+
+    @property
+    def ready(self):
+        return self.index is not None
+
+    def cancel(self):
+        self._stop.set()